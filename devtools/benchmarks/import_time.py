@@ -0,0 +1,44 @@
+"""Measure how long it takes to import `odbo` and to start the `odbo` command-line interface.
+
+Every statement is run in a fresh interpreter, and the best of `--repeat` runs is reported,
+after subtracting the startup time of an empty interpreter.
+
+Usage::
+
+    python devtools/benchmarks/import_time.py --repeat 20
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+STATEMENTS = [
+    "import odbo",
+    "import odbo._format_file_python",
+    "import odbo.__main__; odbo.__main__.configure_file2db_parser",
+    "import odbo.connection",
+]
+
+
+def time_statement(statement, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', statement], check=True)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+    baseline = time_statement("pass", args.repeat)
+    print("{:<60} {:>10}".format("statement", "time (ms)"))
+    for statement in STATEMENTS:
+        elapsed = time_statement(statement, args.repeat) - baseline
+        print("{:<60} {:>10.1f}".format(statement, elapsed * 1000))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
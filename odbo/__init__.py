@@ -1,10 +1,74 @@
-# flake8: noqa
-from .table import MySQLTable
-from .connection import MySQLConnection, get_tablename
-from .daemon import MySQLDaemon, start_database
+"""Load and save pandas DataFrames and CSV files into databases.
+
+Submodules are imported the first time that one of their attributes is accessed
+(:pep:`562`), so that ``import odbo`` and the ``odbo`` command-line interface do not
+pay for importing pandas, SQLAlchemy and kmtools until those are needed.
+"""
+import importlib
+
+#: Public attributes, mapped to the submodules which define them
+_LAZY_ATTRIBUTES = {
+    'MySQLTable': 'table',
+    'PostgresTable': 'table',
+    'SQLiteTable': 'table',
+    'MySQLConnection': 'connection',
+    'PostgresConnection': 'connection',
+    'SQLiteConnection': 'connection',
+    'HDF5Connection': 'connection',
+    'ParquetConnection': 'connection',
+    'get_tablename': 'connection',
+    'MySQLDaemon': 'daemon',
+    'PostgresDaemon': 'daemon',
+    'start_database': 'daemon',
+    'Partitioning': 'partitioning',
+    'LocalTransport': 'transport',
+    'SSHTransport': 'transport',
+    'ProgressBar': 'progress',
+    'LoadPlan': 'batch',
+    'CancellationToken': 'commands',
+}
+
+_SUBMODULES = [
+    '_format_file_bash',
+    '_format_file_python',
+    'batch',
+    'cache',
+    'commands',
+    'connection',
+    'daemon',
+    'ddl',
+    'dtypes',
+    'encoding',
+    'engines',
+    'estimate',
+    'partitioning',
+    'progress',
+    'readers',
+    'schema',
+    'snapshot',
+    'table',
+    'transport',
+    'validation',
+    'vcf',
+]
 
 __all__ = [
     '_format_file_python',
     '_format_file_bash',
 ]
-from . import *
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module('.' + _LAZY_ATTRIBUTES[name], __name__)
+        value = getattr(module, name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module('.' + name, __name__)
+    else:
+        raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES) | set(_SUBMODULES))
@@ -2,15 +2,23 @@ import argparse
 import logging
 import os.path as op
 
-from .connection import MySQLConnection
-
 logger = logging.getLogger(__name__)
 
 
 def _file2db(args):
+    from .connection import MySQLConnection
+    from .estimate import estimate_import
+    from .progress import ProgressBar
+
     if args.debug:
         logging.basicConfig(level=logging.DEBUG)
         logging.getLogger(op.dirname(__file__)).setLevel(logging.DEBUG)
+    if args.plan:
+        estimate = estimate_import(
+            op.abspath(args.file), sep=args.sep, skiprows=args.skiprows,
+            na_values=args.na_values)
+        print(estimate.format())
+        return
     db = MySQLConnection(
         connection_string=args.connection_string,
         # NOTEBOOK_NAME
@@ -22,6 +30,7 @@ def _file2db(args):
     db.import_file(
         file=op.abspath(args.file),
         # **vargs
+        progress_callback=ProgressBar() if args.progress else None,
         sep=args.sep, skiprows=args.skiprows, na_values=args.na_values,
     )
 
@@ -49,7 +58,16 @@ Examples:
     parser.add_argument('-d', '--db', dest='connection_string', required=True, help="""\
 If present, an sqlalchemy connection string to use to directly execute generated SQL \
 on a database.""")
-    parser.add_argument('-s', '--storage_host', type=str, default=None)
+    parser.add_argument('-s', '--storage_host', type=str, default=None, help="""\
+Host which stores the file. If present, the file is decompressed and formatted on that host \
+(over SSH), and only the formatted data is streamed to the database.""")
+    parser.add_argument('--progress', action='store_true', default=False, help="""\
+Show the progress of every stage of the import, with throughput and estimated time left, \
+on stderr.""")
+    parser.add_argument('--plan', action='store_true', default=False, help="""\
+Do not load the file. Instead, print estimates of the size of the table (for every storage \
+engine), of its indexes, and of the time taken to load it, from a sample of the file. \
+The database is not contacted.""")
     parser.add_argument('--debug', action='store_true', default=False)
     #
     parser.add_argument('--sep', type=str, default='\t')
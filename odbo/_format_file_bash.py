@@ -2,35 +2,62 @@
 
 - This script seems to run ~1.6 times faster than the `python` version.
 """
+import functools
 import logging
 import os
 import os.path as op
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
-from kmtools import system_tools
+from odbo._format_file_python import iter_line_blocks
+from odbo.commands import Command, run_command
+from odbo.validation import iter_count_lines
 
 logger = logging.getLogger(__name__)
 
+#: Number of bytes fed to the decompressor at a time, when reporting progress
+CHUNKSIZE = 1024 * 1024
+
+#: Maximum number of cached ``sed`` commands (one per combination of parameters)
+SED_COMMAND_CACHE_SIZE = 128
+
+#: Commands which decompress files with a given extension to stdout
+DECOMPRESS_EXECUTABLES = {
+    '.gz': 'gzip -dc',
+    '.bz2': 'bzip2 -dc',
+    '.xz': 'xz -dc',
+}
+
 
 def decompress(
-        infile, sep='\t', na_values=None, extra_substitutions=None, use_tmp=False, outfile=None):
+        infile, sep='\t', na_values=None, extra_substitutions=None, use_tmp=False, outfile=None,
+        progress=None, timeout=None, cancel=None, counter=None, quotechar=None):
     """Decompress `infile` to produce a file with name `${infile}.tmp`.
 
     Parameters
     ----------
     outfile : str | None
         The name of the (decompressed) output file. If None, use `${infile}.tmp`.
-    """
-    ext = op.splitext(infile)[-1]
-    if ext == '.gz':
-        executable = 'gzip -dc'
-    elif ext == '.bz2':
-        executable = 'bz2 -dc'
-    else:
-        executable = 'cat'
+    progress : odbo.progress.Progress | None
+        If given, `infile` is fed to the decompressor through its stdin, and the number of
+        bytes consumed so far is reported to `progress`.
+    timeout : float | None
+        Number of seconds after which the decompressor is killed.
+    cancel : odbo.commands.CancellationToken | None
+        Token which stops the decompressor.
+    counter : collections.Counter | None
+        If given, the output is written through Python, and the number of records written
+        is added to ``counter['lines']`` (see :func:`odbo.validation.iter_count_lines`
+        for `quotechar`). Nothing is counted if `infile` is not decompressed again.
 
-    if (executable.strip() == 'cat' and
-            (not na_values or na_values == ['\\N']) and
-            (not extra_substitutions)):
+    Raises
+    ------
+    odbo.commands.CancelledError
+        If the decompressor is stopped. The partial output file is removed, as it is
+        when the decompressor fails.
+    """
+    format_command = get_format_command(infile, sep, na_values, extra_substitutions)
+    if not format_command:
         logger.debug("No need to process input file '{}'".format(infile))
         return infile
 
@@ -45,27 +72,144 @@ def decompress(
             logger.debug("Removing...")
             os.remove(outfile)
 
-    sed_command = get_sed_command(sep, na_values, extra_substitutions)
-
-    system_command = (
-        "{executable} '{infile}' {sed_commad} > '{outfile}'".format(
-            executable=executable,
-            infile=infile,
-            sed_commad=('| ' + sed_command) if sed_command else '',
-            outfile=outfile,
-        )
-    )
-    logger.debug(system_command)
-    # NB: sed is CPU-bound, no need to do remotely
-    system_tools.run_command(system_command, shell=True)
+    if progress is None and counter is None:
+        system_command = "{} > '{}'".format(format_command, outfile)
+        logger.debug(system_command)
+        run_command(system_command, timeout, cancel, cleanup=[outfile])
+    else:
+        if progress is not None:
+            format_command = get_format_command(
+                infile, sep, na_values, extra_substitutions, from_stdin=True)
+        _run_to_file(
+            format_command, outfile, infile if progress is not None else None, progress,
+            counter, sep, quotechar, timeout, cancel)
     assert op.isfile(outfile)
     return outfile
 
 
+def _run_to_file(
+        format_command, outfile, infile=None, progress=None, counter=None, sep='\t',
+        quotechar=None, timeout=None, cancel=None, chunksize=CHUNKSIZE):
+    """Run shell pipeline `format_command`, writing its stdout to `outfile`.
+
+    If `infile` is given, it is fed into the stdin of the pipeline, and the number of bytes
+    consumed so far is reported to `progress`. If `counter` is given, the output is copied
+    to `outfile` by a thread, which counts the records on the way.
+    """
+    system_command = format_command
+    if counter is None:
+        system_command = "{} > '{}'".format(format_command, outfile)
+    logger.debug(system_command)
+    command = Command(
+        ['bash', '-c', 'set -o pipefail; ' + system_command], timeout, cancel,
+        cleanup=[outfile], stdin=subprocess.PIPE if infile is not None else None,
+        stdout=subprocess.PIPE if counter is not None else None)
+    with command, ThreadPoolExecutor(max_workers=1) as executor:
+        process = command.process
+        if counter is not None:
+            written = executor.submit(
+                _write_output, process.stdout, outfile, counter, sep, quotechar, chunksize)
+        if infile is not None:
+            try:
+                with open(infile, 'rb') as ifh:
+                    for data in iter(lambda: ifh.read(chunksize), b''):
+                        process.stdin.write(data)
+                        progress.update(len(data))
+            except BrokenPipeError:
+                # The pipeline failed (or was killed), which is reported below
+                pass
+            finally:
+                try:
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass
+        if counter is not None:
+            written.result()
+        returncode = process.wait()
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, system_command)
+    if progress is not None:
+        progress.finish()
+
+
+def _write_output(stdout, outfile, counter, sep, quotechar, chunksize):
+    """Copy blocks of lines from `stdout` to `outfile`, counting records in `counter`."""
+    try:
+        with open(outfile, 'wb') as ofh:
+            for block in iter_count_lines(
+                    iter_line_blocks(stdout, chunksize), counter, sep, quotechar):
+                ofh.write(block)
+    finally:
+        # The pipeline stops (with a broken pipe) if the output cannot be written
+        stdout.close()
+
+
+def get_format_command(
+        infile, sep='\t', na_values=None, extra_substitutions=None, from_stdin=False):
+    r"""Return a shell pipeline which writes decompressed and formatted `infile` to stdout.
+
+    Returns an empty string if `infile` does not have to be processed at all.
+    If `from_stdin` is True, the pipeline reads the contents of `infile` from its stdin.
+    The pipeline only needs ``gzip`` / ``bzip2`` / ``xz`` and ``sed``, so it can run on the
+    host which stores `infile` (see :mod:`odbo.transport`).
+
+    Examples
+    --------
+    >>> get_format_command('data.tsv', na_values=['\\N'])
+    ''
+    >>> get_format_command('data.tsv.gz', na_values=['\\N'])
+    "gzip -dc 'data.tsv.gz'"
+    """
+    executable = DECOMPRESS_EXECUTABLES.get(op.splitext(infile)[-1], 'cat')
+    sed_command = get_sed_command(sep, na_values, extra_substitutions)
+    if executable == 'cat' and not sed_command:
+        return ''
+    return "{executable}{infile}{sed_command}".format(
+        executable=executable,
+        infile='' if from_stdin else " '{}'".format(infile),
+        sed_command=(' | ' + sed_command) if sed_command else '')
+
+
+def get_sed_substitutions(file, extra_substitutions=None):
+    """Add the ``sed`` command which removes the meta-information lines of VCF files.
+
+    Examples
+    --------
+    >>> get_sed_substitutions('variants.vcf.gz', ['s/chr//'])
+    ['s/chr//', '/^##/d']
+    """
+    extra_substitutions = list(extra_substitutions) if extra_substitutions else []
+    if '.vcf' in op.basename(file).lower() and '/^##/d' not in extra_substitutions:
+        extra_substitutions.append('/^##/d')
+    return extra_substitutions
+
+
 def get_sed_command(sep='\t', na_values=None, extra_substitutions=None):
-    """."""
-    na_values = list(na_values) if na_values is not None else []
-    extra_substitutions = list(extra_substitutions) if extra_substitutions is not None else []
+    """Return the ``sed`` command which replaces `na_values` with '\\N'.
+
+    Commands are memoized on ``(sep, na_values, extra_substitutions)``.
+    """
+    key = (
+        sep,
+        tuple(na_values) if na_values is not None else (),
+        tuple(extra_substitutions) if extra_substitutions is not None else ())
+    try:
+        return _get_cached_sed_command(*key)
+    except TypeError:
+        # Unhashable substitutions
+        return _get_sed_command(*key)
+
+
+@functools.lru_cache(maxsize=SED_COMMAND_CACHE_SIZE)
+def _get_cached_sed_command(sep, na_values, extra_substitutions):
+    return _get_sed_command(sep, na_values, extra_substitutions)
+
+
+def _get_sed_command(sep, na_values, extra_substitutions):
+    from kmtools import system_tools
+
+    na_values = list(na_values)
+    extra_substitutions = list(extra_substitutions)
 
     if '\\N' in na_values:
         na_values.remove('\\N')
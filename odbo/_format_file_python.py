@@ -5,15 +5,30 @@
 """
 from __future__ import print_function
 
+import functools
 import logging
+import mmap
 import os
 import os.path as op
 import re
 
-from kmtools import system_tools
-
 logger = logging.getLogger(__name__)
 
+#: Number of bytes to read and format at a time
+CHUNKSIZE = 64 * 1024 * 1024
+
+#: Number of bytes of an uncompressed file to scan at a time, before copying or formatting them
+SCAN_CHUNKSIZE = 1024 * 1024
+
+#: Maximum number of cached formatters (one per combination of parameters)
+FORMATTER_CACHE_SIZE = 128
+
+#: Extensions of compressed files, which have to be read through a decompressor
+COMPRESSED_EXTENSIONS = ['.gz', '.bz2', '.xz']
+
+#: Substitution which removes the meta-information (``##``) lines of a VCF file
+VCF_HEADER_SUBSTITUTION = (re.compile(b'^##[^\n]*\n', re.MULTILINE), b'')
+
 
 def decompress(
         infile, sep='\t', na_values=None, extra_substitutions=None, use_tmp=False, outfile=None):
@@ -25,10 +40,9 @@ def decompress(
         The name of the (decompressed) output file. If None, use `${infile}.tmp`.
     """
     ext = op.splitext(infile)[-1]
-    SUPPORTED_EXTENSIONS = ['.gz', '.bz2']
 
     # File is not compressed, do nothing
-    if ((ext not in SUPPORTED_EXTENSIONS) and
+    if ((ext not in COMPRESSED_EXTENSIONS) and
             (not na_values or na_values == ['\\N']) and
             (not extra_substitutions)):
         logger.debug("No need to process input file '{}'".format(infile))
@@ -47,21 +61,228 @@ def decompress(
             os.remove(outfile)
 
     # Uncompress file, applying function `fn`
+    if ext not in COMPRESSED_EXTENSIONS:
+        logger.debug("Formatting file '{}' into '{}'...".format(infile, outfile))
+        format_uncompressed(infile, outfile, sep, na_values, extra_substitutions)
+        return outfile
     logger.debug("Uncompressing file '{}' into '{}'...".format(infile, outfile))
-    fn = get_csv_line_formatter(sep, na_values, extra_substitutions)
-    with system_tools.open_compressed(infile, 'rb') as ifh:
-        with open(outfile, 'wb') as ofh:
-            while True:
-                data = ifh.read(64 * 1024 * 1024)
-                if not data:
-                    break
-                ofh.write(fn(data))
+    with open(outfile, 'wb') as ofh:
+        for data in iter_decompress(infile, sep, na_values, extra_substitutions):
+            ofh.write(data)
     assert op.isfile(outfile)
     return outfile
 
 
+def iter_decompress(
+        infile, sep='\t', na_values=None, extra_substitutions=None, chunksize=CHUNKSIZE):
+    """Decompress and format `infile`, yielding blocks of complete lines.
+
+    Each block ends on a line boundary, so it can be streamed straight into a database
+    (e.g. ``COPY ... FROM STDIN``) without writing a temporary file.
+
+    Parameters
+    ----------
+    chunksize : int
+        Number of bytes to read from `infile` at a time.
+    """
+    from kmtools import system_tools
+
+    fn = get_csv_line_formatter(sep, na_values, extra_substitutions)
+    with system_tools.open_compressed(infile, 'rb') as ifh:
+        for data in iter_line_blocks(ifh, chunksize):
+            yield fn(data)
+
+
+def iter_line_blocks(ifh, chunksize):
+    r"""Read file object `ifh`, yielding blocks of complete lines of about `chunksize` bytes.
+
+    The last block does not end with a newline if the file does not.
+
+    Examples
+    --------
+    >>> import io
+    >>> list(iter_line_blocks(io.BytesIO(b'ab\ncd\nef'), 4))
+    [b'ab\n', b'cd\n', b'ef']
+    """
+    remainder = b''
+    while True:
+        data = ifh.read(chunksize)
+        if not data:
+            break
+        data = remainder + data
+        idx = data.rfind(b'\n') + 1
+        data, remainder = data[:idx], data[idx:]
+        if data:
+            yield data
+    if remainder:
+        yield remainder
+
+
+def format_uncompressed(
+        infile, outfile, sep='\t', na_values=None, extra_substitutions=None,
+        chunksize=SCAN_CHUNKSIZE):
+    """Format uncompressed file `infile` into `outfile`, rewriting only the blocks that change.
+
+    `infile` is memory-mapped and scanned in place, `chunksize` bytes (rounded up to
+    the end of a line) at a time. Blocks which contain no null values and no matches of
+    `extra_substitutions` are copied by the kernel (using ``copy_file_range`` or
+    ``sendfile``), so formatting a file which is already clean costs about as much
+    as copying it.
+    """
+    substitutions = get_csv_substitutions(sep, na_values, extra_substitutions)
+    is_dirty = _get_dirty_block_checker(sep, na_values, extra_substitutions)
+    with open(infile, 'rb') as ifh, open(outfile, 'wb', buffering=0) as ofh:
+        file_size = os.fstat(ifh.fileno()).st_size
+        if not file_size:
+            return
+        with mmap.mmap(ifh.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            clean_start = 0
+            for start, end in _iter_block_offsets(data, chunksize):
+                if not is_dirty(data, start, end):
+                    continue
+                _copy_range(ifh, ofh, data, clean_start, start)
+                block = data[start:end]
+                for RE, RE_OUT in substitutions:
+                    block = RE.sub(RE_OUT, block)
+                _write(ofh, block)
+                clean_start = end
+            _copy_range(ifh, ofh, data, clean_start, file_size)
+
+
+def _iter_block_offsets(data, chunksize):
+    """Yield ``(start, end)`` offsets of line-aligned blocks of about `chunksize` bytes."""
+    start = 0
+    while start < len(data):
+        end = data.find(b'\n', start + chunksize - 1) + 1 or len(data)
+        yield start, end
+        start = end
+
+
+def _get_dirty_block_checker(sep, na_values=None, extra_substitutions=None):
+    """Return a function which checks whether the formatter would change a block of data.
+
+    Fields are split on the separator, newlines and carriage returns with NumPy, which views
+    the memory-mapped file without copying it. Only fields as long as one of the null values
+    are compared with that value, which is much faster than running the regular expressions
+    which replace them. False positives only mean that a block is formatted needlessly.
+    """
+    na_values = [v.encode('utf-8') for v in (na_values or []) if v != '\\N']
+    extra_substitutions = list(extra_substitutions or [])
+    sep_b = sep.encode('utf-8')
+    if na_values and len(sep_b) != 1:
+        return lambda data, start, end: True
+
+    def is_dirty(data, start, end):
+        import numpy as np
+
+        block = np.frombuffer(data, dtype=np.uint8, count=end - start, offset=start)
+        return (
+            (bool(na_values) and _has_null_fields(block, ord(sep_b), na_values)) or
+            # Start at the preceding newline, to match patterns anchored at the start of a line
+            any(RE.search(data, max(start - 1, 0), end) for RE, _ in extra_substitutions)
+        )
+
+    return is_dirty
+
+
+def _has_null_fields(block, sep, na_values):
+    """Check whether any field in `block`, which starts at the start of a line, is a null value.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> block = np.frombuffer(b'a\\tb\\r\\nNA\\tc\\r\\n', dtype=np.uint8)
+    >>> _has_null_fields(block, ord('\\t'), [b'']), _has_null_fields(block, ord('\\t'), [b'NA'])
+    (False, True)
+    """
+    import numpy as np
+
+    is_delimiter = (block == sep) | (block == ord('\n')) | (block == ord('\r'))
+    delimiters = np.flatnonzero(is_delimiter)
+    starts = np.concatenate([[0], delimiters + 1])
+    ends = np.append(delimiters, len(block))
+    if len(block) and block[-1] == ord('\n'):
+        # Nothing follows the last newline
+        starts, ends = starts[:-1], ends[:-1]
+    lengths = ends - starts
+    for na_value in na_values:
+        idxs = np.flatnonzero(lengths == len(na_value))
+        if not na_value:
+            # The "field" between the characters of a "\r\n" line ending
+            idxs = idxs[(starts[idxs] == 0) | (block[starts[idxs] - 1] != ord('\r'))]
+        for offset, char in enumerate(na_value):
+            idxs = idxs[block[starts[idxs] + offset] == char]
+        if len(idxs):
+            return True
+    return False
+
+
+def _copy_range(ifh, ofh, data, start, end):
+    """Append bytes `start` to `end` of `ifh` to `ofh`, without copying them into user space.
+
+    Falls back to writing from the memory-mapped `data` if the kernel can not copy
+    between these files.
+    """
+    while start < end:
+        try:
+            if hasattr(os, 'copy_file_range'):
+                num_bytes = os.copy_file_range(ifh.fileno(), ofh.fileno(), end - start, start)
+            else:
+                num_bytes = os.sendfile(ofh.fileno(), ifh.fileno(), start, end - start)
+        except (OSError, AttributeError):
+            break
+        if not num_bytes:
+            break
+        start += num_bytes
+    if start < end:
+        _write(ofh, data[start:end])
+
+
+def _write(ofh, data):
+    """Write all of `data` into unbuffered file `ofh`."""
+    view = memoryview(data)
+    while view:
+        view = view[ofh.write(view):]
+
+
+class CSVLineFormatter:
+    r"""Replace null values with '\N' in blocks of complete lines.
+
+    Formatters are cheap to pickle: only their parameters are sent to worker processes,
+    where regular expressions are compiled once, by the memoized :func:`get_csv_substitutions`.
+
+    Examples
+    --------
+    >>> import pickle
+    >>> formatter = pickle.loads(pickle.dumps(CSVLineFormatter(',', ['', 'NA'])))
+    >>> formatter(b'NA,1,\n')
+    b'\\N,1,\\N\n'
+    """
+
+    def __init__(self, sep, na_values=None, extra_substitutions=None):
+        self.sep = sep
+        self.na_values = _as_tuple(na_values)
+        self.extra_substitutions = _as_tuple(extra_substitutions)
+        self.substitutions = get_csv_substitutions(sep, self.na_values, self.extra_substitutions)
+
+    def __repr__(self):
+        return 'CSVLineFormatter({!r}, {!r}, {!r})'.format(
+            self.sep, self.na_values, self.extra_substitutions)
+
+    def __reduce__(self):
+        return (get_csv_line_formatter, (self.sep, self.na_values, self.extra_substitutions))
+
+    def __call__(self, line):
+        for RE, RE_OUT in self.substitutions:
+            line = RE.sub(RE_OUT, line)
+        return line
+
+
 def get_csv_line_formatter(sep, na_values=None, extra_substitutions=None):
-    r""".
+    r"""Return a (cached) :class:`CSVLineFormatter`.
+
+    Formatters are memoized on ``(sep, na_values, extra_substitutions)``, so they can be
+    shared by all the files which are formatted in the same way.
 
     Examples
     --------
@@ -69,91 +290,118 @@ def get_csv_line_formatter(sep, na_values=None, extra_substitutions=None):
     >>> print(formatter(b"X,,X,\\N,N,\n,N,NA,NA,,").decode())
     \N,\N,\N,\N,N,\N
     \N,N,\N,\N,\N,\N
+    >>> formatter is get_csv_line_formatter(',', ('X', '', 'NA', '\\N'))
+    True
     """
-    na_values = list(na_values) if na_values is not None else []
-    extra_substitutions = list(extra_substitutions) if extra_substitutions is not None else []
-
-    if '\\N' in na_values:
-        na_values.remove('\\N')
-
-    if not na_values and not extra_substitutions:
-        # Nothing to sed
-        return lambda x: x
-
-    # # Header
-    # def rep_header(line):
-    #     if line[:2] == '##':
-    #         return ''
-    #     else:
-    #         return line
-
-    if not na_values or na_values == ['\\N']:
-        def rep_null(line):
-            return line
-    else:
-        rep_null = _get_rep_null(sep, na_values, extra_substitutions)
-
-    # Separator
-    if sep == '\t':
-        def rep_sep(line):
-            return line
-    else:
-        def rep_sep(line):
-            return line.replace(sep.encode('utf-8'), b'\t')
-
-    # Final function
-    def csv_line_formatter(line):
-        return rep_null(line)
-        # return rep_sep(rep_null(rep_header(line)))
-
-    return csv_line_formatter
-
-
-def _get_rep_null(sep, na_values, extra_substitutions):
-    """Returns a function which replaces `na_values` with '\\N'.
+    key = (sep, _as_tuple(na_values), _as_tuple(extra_substitutions))
+    try:
+        return _get_cached_csv_line_formatter(*key)
+    except TypeError:
+        # Unhashable substitutions
+        return CSVLineFormatter(*key)
+
+
+@functools.lru_cache(maxsize=FORMATTER_CACHE_SIZE)
+def _get_cached_csv_line_formatter(sep, na_values, extra_substitutions):
+    return CSVLineFormatter(sep, na_values, extra_substitutions)
+
+
+def get_csv_substitutions(sep, na_values=None, extra_substitutions=None):
+    """Return the ``(pattern, replacement)`` pairs applied by the formatter, in order.
+
+    A block of data is left unchanged by the formatter if none of the patterns match it.
+    Substitutions are memoized, so regular expressions are only compiled once for every
+    combination of `sep`, `na_values` and `extra_substitutions`.
     """
+    key = (sep, _as_tuple(na_values), _as_tuple(extra_substitutions))
+    try:
+        substitutions = _get_cached_csv_substitutions(*key)
+    except TypeError:
+        # Unhashable substitutions
+        substitutions = _get_csv_substitutions(*key)
+    return list(substitutions)
+
+
+@functools.lru_cache(maxsize=FORMATTER_CACHE_SIZE)
+def _get_cached_csv_substitutions(sep, na_values, extra_substitutions):
+    return _get_csv_substitutions(sep, na_values, extra_substitutions)
+
+
+def _get_csv_substitutions(sep, na_values, extra_substitutions):
+    na_values = [v for v in na_values if v != '\\N']
+    extra_substitutions = tuple(extra_substitutions)
+    if not na_values:
+        return extra_substitutions
+    return tuple(_get_null_substitutions(sep, na_values)) + extra_substitutions
+
+
+def _as_tuple(values):
+    """Turn (nested) lists of parameters into hashable tuples.
+
+    Examples
+    --------
+    >>> _as_tuple(None), _as_tuple(['', 'NA']), _as_tuple([['/^##/d']])
+    ((), ('', 'NA'), (('/^##/d',),))
+    """
+    if values is None:
+        return ()
+    return tuple(tuple(v) if isinstance(v, list) else v for v in values)
+
+
+def _get_null_substitutions(sep, na_values):
+    r"""Returns substitutions which replace `na_values` with '\N'.
+
+    Examples
+    --------
+    >>> line = b'a\t.\tc\n.\tb\t.\n'
+    >>> for RE, RE_OUT in _get_null_substitutions('\t', ['.']):
+    ...     line = RE.sub(RE_OUT, line)
+    >>> print(line.decode())
+    a   \N  c
+    \N  b   \N
+    """
+    from kmtools import system_tools
+
+    # Separators and null values are literal strings, not regular expressions
+    sep_re = re.escape(sep)
+    na_values_re = [re.escape(na_value) for na_value in na_values]
+
     RE1 = re.compile(
-        system_tools.format_unprintable(
-            '|'.join('{0}{1}{0}'.format(sep, na_value) for na_value in na_values))
+        '|'.join('{0}{1}{0}'.format(sep_re, na_value) for na_value in na_values_re)
         .encode('utf-8'))
     RE1_OUT = system_tools.format_unprintable('{0}{1}{0}'.format(sep, '\\N')).encode('utf-8')
 
     RE2 = re.compile(
-        system_tools.format_unprintable(
-            '|'.join('^{1}{0}'.format(sep, na_value) for na_value in na_values))
+        '|'.join('^{1}{0}'.format(sep_re, na_value) for na_value in na_values_re)
         .encode('utf-8'))
     RE2_OUT = system_tools.format_unprintable('{1}{0}'.format(sep, '\\N')).encode('utf-8')
 
     RE3 = re.compile(
-        system_tools.format_unprintable(
-            '|'.join('{0}{1}$'.format(sep, na_value) for na_value in na_values))
+        '|'.join('{0}{1}$'.format(sep_re, na_value) for na_value in na_values_re)
         .encode('utf-8'))
     RE3_OUT = system_tools.format_unprintable('{0}{1}'.format(sep, '\\N')).encode('utf-8')
 
+    # Factoring out the newline lets the regex engine scan for it quickly
     RE4 = re.compile(
-        system_tools.format_unprintable(
-            '|'.join('\r?\n{1}{0}'.format(sep, na_value) for na_value in na_values))
+        '(?:\r\n|\n)(?:{})'.format(
+            '|'.join('{1}{0}'.format(sep_re, na_value) for na_value in na_values_re))
         .encode('utf-8'))
     RE4_OUT = system_tools.format_unprintable('\n{1}{0}'.format(sep, '\\N')).encode('utf-8')
 
     RE5 = re.compile(
-        system_tools.format_unprintable(
-            '|'.join('{0}{1}\r?\n'.format(sep, na_value) for na_value in na_values))
+        '|'.join('{0}{1}\r?\n'.format(sep_re, na_value) for na_value in na_values_re)
         .encode('utf-8'))
     RE5_OUT = system_tools.format_unprintable('{0}{1}\n'.format(sep, '\\N')).encode('utf-8')
 
-    def rep_null(line):
-        line = RE1.sub(RE1_OUT, line)
-        line = RE1.sub(RE1_OUT, line)
-        line = RE2.sub(RE2_OUT, line)
-        line = RE3.sub(RE3_OUT, line)
-        line = RE4.sub(RE4_OUT, line)
-        line = RE5.sub(RE5_OUT, line)
-        for RE, RE_OUT in extra_substitutions:
-            line = RE.sub(RE_OUT, line)
-        return line
-
-    return rep_null
+    # RE1 is applied twice, to catch consecutive nulls which share a separator
+    return [
+        (RE1, RE1_OUT),
+        (RE1, RE1_OUT),
+        (RE2, RE2_OUT),
+        (RE3, RE3_OUT),
+        (RE4, RE4_OUT),
+        (RE5, RE5_OUT),
+    ]
 
 
 def main(infile, outfile, sep='\t', na_values=[], extra_substitutions=[]):
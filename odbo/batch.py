@@ -0,0 +1,271 @@
+"""Load a set of related files (e.g. all tables of one data release) into MySQL together.
+
+Every table is loaded into a staging schema first. Files are decompressed and their column
+types are inferred in a pool of processes, while tables are loaded and indexed in a pool
+of threads, which share the connection pool of the engine. Once all tables have been
+loaded, they are moved into the target schema with a single (atomic) ``RENAME TABLE``,
+so a failure leaves the target schema untouched.
+
+Examples
+--------
+Declare the tables, then load them all::
+
+    plan = LoadPlan(db)
+    plan.add('CosmicMutantExport.tsv.gz', index_commands=[('gene_name', False)])
+    plan.add('CosmicSample.tsv.gz', primary_key='sample_id')
+    tables = plan.run(num_processes=4, num_threads=4)
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from kmtools.db_tools import make_connection_string, parse_connection_string
+from kmtools.df_tools import get_tablename
+from odbo._format_file_bash import decompress, get_sed_substitutions
+from odbo.commands import CancellationToken
+from odbo.connection import (
+    MySQLConnection, _get_db_skiprows, _get_file_import_dtypes, _set_default_csv_opts)
+from odbo.engines import fetch_column
+from odbo.table import MySQLTable
+from odbo.validation import SAMPLE_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class LoadJob:
+    """A file to load into a table, as part of a :class:`LoadPlan`."""
+
+    def __init__(
+            self, file, tablename, index_commands=None, primary_key=None, dtypes=None,
+            extra_dtypes=None, extra_substitutions=None, optimize_dtypes=False, validate=False,
+            csv_opts=None):
+        self.file = file
+        self.tablename = tablename
+        self.index_commands = index_commands
+        self.primary_key = primary_key
+        self.dtypes = dtypes
+        self.extra_dtypes = extra_dtypes
+        self.extra_substitutions = extra_substitutions
+        self.optimize_dtypes = optimize_dtypes
+        self.validate = validate
+        self.csv_opts = csv_opts if csv_opts is not None else {}
+
+    def __repr__(self):
+        return 'LoadJob({!r}, {!r})'.format(self.file, self.tablename)
+
+
+class LoadPlan:
+    """A set of files to load into the database of `connection`, all or nothing.
+
+    Parameters
+    ----------
+    connection : MySQLConnection
+        Connection to the target schema.
+    staging_schema : str | None
+        Schema into which tables are loaded before they are published.
+        Defaults to ``{schema}__staging``. It must be on the same server as the target schema.
+    """
+
+    def __init__(self, connection, staging_schema=None):
+        self.connection = connection
+        self.db_schema = parse_connection_string(connection.connection_string)['db_schema']
+        self.staging_schema = (
+            staging_schema if staging_schema else '{}__staging'.format(self.db_schema))
+        self.old_schema = '{}__old'.format(self.db_schema)
+        self.jobs = []
+
+    def add(
+            self, file, tablename=None, index_commands=None, primary_key=None, dtypes=None,
+            extra_dtypes=None, extra_substitutions=None, optimize_dtypes=False, validate=False,
+            **csv_opts):
+        """Add file `file`, to be loaded into table `tablename`.
+
+        Parameters
+        ----------
+        index_commands : list | None
+            Indexes to create once the table has been loaded
+            (see :meth:`odbo.table.MySQLTable.create_indexes`).
+        primary_key : str | list | None
+            Column(s) of the primary key.
+        validate : bool
+            Whether to check the table against the formatted file
+            (see :meth:`odbo.MySQLConnection.validate_load`).
+
+        Other parameters are the same as for :meth:`odbo.MySQLConnection.import_file`.
+
+        Returns
+        -------
+        job : LoadJob
+        """
+        tablename = tablename if tablename else get_tablename(file)
+        if tablename in [job.tablename for job in self.jobs]:
+            raise ValueError("Table '{}' is already part of the plan!".format(tablename))
+        _set_default_csv_opts(csv_opts)
+        job = LoadJob(
+            file, tablename, index_commands=index_commands, primary_key=primary_key,
+            dtypes=dtypes, extra_dtypes=extra_dtypes,
+            extra_substitutions=get_sed_substitutions(file, extra_substitutions),
+            optimize_dtypes=optimize_dtypes, validate=validate, csv_opts=csv_opts)
+        self.jobs.append(job)
+        return job
+
+    def run(self, num_processes=4, num_threads=4, timeout=None, cancel=None):
+        """Load all files into the staging schema, and then publish all tables at once.
+
+        Parameters
+        ----------
+        num_processes : int
+            Number of processes decompressing files and inferring column types.
+        num_threads : int
+            Number of tables which are loaded and indexed at the same time.
+        timeout : float | None
+            Number of seconds that loading all files may take. Decompressors and ``mysql``
+            clients which are still running after that are killed, and nothing is published.
+        cancel : odbo.commands.CancellationToken | None
+            Token which stops the plan. Cancelling it kills running ``mysql`` clients,
+            while files which are being decompressed in worker processes are only stopped
+            at the deadline (see :class:`odbo.commands.CancellationToken`).
+
+        Returns
+        -------
+        tables : dict
+            :class:`odbo.table.MySQLTable` objects in the target schema, by table name.
+        """
+        staging = self._get_staging_connection()
+        cancel = CancellationToken(timeout, parent=cancel)
+        outfiles = []
+        try:
+            staged_tables = self._load_tables(
+                staging, num_processes, num_threads, outfiles, cancel)
+        except BaseException:
+            logger.error("Load plan failed, dropping staged tables...")
+            self._drop_tables(self.staging_schema, [job.tablename for job in self.jobs])
+            raise
+        finally:
+            for job, outfile in outfiles:
+                if outfile != job.file and os.path.isfile(outfile):
+                    os.remove(outfile)
+        self._publish(list(staged_tables))
+        return {
+            tablename: MySQLTable(
+                name=tablename, df=table.df, dtypes=table.dtypes, tempfile=None,
+                connection_string=self.connection.connection_string,
+                engine=self.connection.engine, datadir=self.connection.datadir)
+            for tablename, table in staged_tables.items()
+        }
+
+    def _get_staging_connection(self):
+        db_params = parse_connection_string(self.connection.connection_string)
+        db_params['db_schema'] = self.staging_schema
+        return MySQLConnection(
+            connection_string=make_connection_string(**db_params),
+            shared_folder=self.connection.shared_folder,
+            storage_host=None,
+            datadir=self.connection.datadir,
+            db_engine=self.connection.db_engine,
+            use_compression=self.connection.use_compression)
+
+    def _load_tables(self, staging, num_processes, num_threads, outfiles, cancel):
+        """Prepare files in processes, and load every file as soon as it is ready, in threads."""
+        futures = []
+        tables = {}
+        with ProcessPoolExecutor(num_processes) as processes, \
+                ThreadPoolExecutor(num_threads) as threads:
+            try:
+                prepared = {
+                    processes.submit(
+                        _prepare_file, job.file, job.dtypes, job.extra_dtypes,
+                        job.extra_substitutions, job.optimize_dtypes, job.csv_opts,
+                        cancel): job
+                    for job in self.jobs
+                }
+                futures.extend(prepared)
+                for future in as_completed(prepared):
+                    job = prepared[future]
+                    outfile, df, dtypes, not_null = future.result()
+                    outfiles.append((job, outfile))
+                    futures.append(threads.submit(
+                        _load_job, staging, job, outfile, df, dtypes, not_null, cancel))
+                for future in futures[len(prepared):]:
+                    table = future.result()
+                    tables[table.name] = table
+            except BaseException:
+                # Do not start any more work
+                for future in futures:
+                    future.cancel()
+                raise
+        return tables
+
+    def _publish(self, tablenames):
+        """Move `tablenames` from the staging schema to the target schema, atomically.
+
+        Tables which are replaced are moved out of the way in the same statement,
+        and dropped afterwards.
+        """
+        engine = self.connection.engine
+        existing_tables = set(fetch_column(
+            engine,
+            "SELECT table_name FROM information_schema.tables WHERE table_schema = :schema",
+            schema=self.db_schema))
+        replaced_tables = [t for t in tablenames if t in existing_tables]
+        renames = []
+        if replaced_tables:
+            engine.execute('CREATE DATABASE IF NOT EXISTS `{}`;'.format(self.old_schema))
+            self._drop_tables(self.old_schema, replaced_tables)
+            renames.extend(
+                '`{0}`.`{2}` TO `{1}`.`{2}`'.format(self.db_schema, self.old_schema, t)
+                for t in replaced_tables)
+        renames.extend(
+            '`{0}`.`{2}` TO `{1}`.`{2}`'.format(self.staging_schema, self.db_schema, t)
+            for t in tablenames)
+        logger.info("Publishing tables {}...".format(tablenames))
+        engine.execute('RENAME TABLE {};'.format(', '.join(renames)))
+        self._drop_tables(self.old_schema, replaced_tables)
+
+    def _drop_tables(self, schema, tablenames):
+        engine = self.connection.engine
+        for tablename in tablenames:
+            engine.execute('DROP TABLE IF EXISTS `{}`.`{}`;'.format(schema, tablename))
+
+
+def _prepare_file(
+        file, dtypes, extra_dtypes, extra_substitutions, optimize_dtypes, csv_opts, cancel=None):
+    """Decompress and format `file`, and infer its column types (runs in a worker process).
+
+    Returns
+    -------
+    outfile : str
+        Formatted file.
+    df : DataFrame
+        Empty DataFrame with the columns of the file.
+    dtypes : dict
+    not_null : list | None
+    """
+    outfile = decompress(
+        infile=file, sep=csv_opts['sep'], na_values=csv_opts['na_values'],
+        extra_substitutions=extra_substitutions, cancel=cancel)
+    df, dtypes, not_null = _get_file_import_dtypes(
+        outfile, dtypes, extra_dtypes, optimize_dtypes=optimize_dtypes, **csv_opts)
+    return outfile, df, dtypes, not_null
+
+
+def _load_job(staging, job, outfile, df, dtypes, not_null, cancel):
+    """Load formatted file `outfile` into the staging schema, and index it."""
+    csv_opts = job.csv_opts
+    cancel.check("Loading '{}'".format(job.file))
+    staging.create_db_table(job.tablename, df, dtypes, not_null=not_null)
+    load_warnings = staging.load_file_to_database(
+        outfile, job.tablename, csv_opts['sep'], csv_opts['quotechar'], csv_opts['quoting'],
+        _get_db_skiprows(csv_opts), cancel=cancel)
+    if job.validate:
+        staging.validate_load(
+            job.tablename, outfile, list(df.columns), dtypes, load_warnings,
+            _get_db_skiprows(csv_opts), SAMPLE_SIZE, csv_opts['sep'], csv_opts['quotechar'],
+            csv_opts['quoting']).check()
+    table = MySQLTable(
+        name=job.tablename, df=df, dtypes=dtypes, tempfile=None,
+        connection_string=staging.connection_string, engine=staging.engine,
+        datadir=staging.datadir)
+    if job.index_commands or job.primary_key is not None:
+        table.create_indexes(job.index_commands or [], job.primary_key)
+    return table
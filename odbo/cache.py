@@ -0,0 +1,155 @@
+"""Cache the results of queries in Parquet files, evicting the least recently used results.
+
+Packed MyISAM tables never change, so the results of a query against them can be reused
+until the table is replaced. Results are stored under a key which combines the query with
+the version of the table (e.g. its ``UPDATE_TIME`` and ``CHECKSUM``), so results cached
+for an older version of a table are never returned, and are evicted eventually.
+
+Examples
+--------
+>>> import tempfile
+>>> cache = QueryCache(tempfile.mkdtemp(), max_size=1024 * 1024)
+>>> key = get_cache_key('SELECT * FROM variants', version=('2018-01-01 00:00:00', 123))
+>>> cache.get(key) is None
+True
+>>> cache.put(key, pd.DataFrame({'a': [1, 2]}))
+True
+>>> cache.get(key)
+   a
+0  1
+1  2
+"""
+import hashlib
+import json
+import logging
+import os
+import os.path as op
+import tempfile
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+#: Default directory in which query results are cached
+CACHE_DIR = op.join(op.expanduser('~'), '.cache', 'odbo', 'queries')
+
+#: Default maximum size of the cache, in bytes
+CACHE_SIZE = 1024 ** 3
+
+
+class QueryCache:
+    """Results of queries, stored as Parquet files in `cache_dir`.
+
+    Parameters
+    ----------
+    cache_dir : str | None
+        Directory in which results are stored. Defaults to :data:`CACHE_DIR`.
+    max_size : int
+        Maximum total size of the cached results, in bytes. The least recently used
+        results are removed once the cache grows larger than that.
+    """
+
+    def __init__(self, cache_dir=None, max_size=CACHE_SIZE):
+        self.cache_dir = cache_dir if cache_dir is not None else CACHE_DIR
+        self.max_size = max_size
+
+    def __repr__(self):
+        return 'QueryCache({!r}, max_size={})'.format(self.cache_dir, self.max_size)
+
+    def _get_path(self, key):
+        return op.join(self.cache_dir, key + '.parquet')
+
+    def get(self, key):
+        """Return the DataFrame cached under `key`, or None."""
+        path = self._get_path(key)
+        try:
+            df = pd.read_parquet(path)
+        except (FileNotFoundError, OSError):
+            return None
+        try:
+            # Modification times keep track of when results were last used
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        logger.debug("Query results found in cache: '{}'.".format(path))
+        return df
+
+    def put(self, key, df):
+        """Cache `df` under `key`, and evict old results if the cache is too large.
+
+        Returns
+        -------
+        cached : bool
+            False if `df` could not be stored as Parquet (e.g. columns of mixed types).
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+        os.close(fd)
+        try:
+            df.to_parquet(tmp_path, index=False)
+        except Exception as e:
+            os.remove(tmp_path)
+            logger.warning("Could not cache query results: {!r}".format(e))
+            return False
+        # Other processes never see partly written results
+        os.replace(tmp_path, self._get_path(key))
+        self.evict()
+        return True
+
+    def evict(self, max_size=None):
+        """Remove the least recently used results until the cache is at most `max_size` bytes.
+
+        Returns
+        -------
+        removed : list
+            Keys of the removed results.
+        """
+        max_size = max_size if max_size is not None else self.max_size
+        entries = []
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith('.parquet'):
+                try:
+                    stat = os.stat(op.join(self.cache_dir, filename))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, filename))
+        total_size = sum(size for _, size, _ in entries)
+        removed = []
+        for _, size, filename in sorted(entries):
+            if total_size <= max_size:
+                break
+            try:
+                os.remove(op.join(self.cache_dir, filename))
+            except FileNotFoundError:
+                pass
+            total_size -= size
+            removed.append(op.splitext(filename)[0])
+        if removed:
+            logger.debug("Evicted {} query results from cache.".format(len(removed)))
+        return removed
+
+    def clear(self):
+        """Remove all cached results."""
+        return self.evict(max_size=0)
+
+
+def get_cache_key(sql_query, version, **params):
+    """Return a key identifying the results of `sql_query` against data of a given `version`.
+
+    Parameters
+    ----------
+    version : tuple
+        Anything (JSON serializable) that changes whenever the data changes.
+    params : dict
+        Parameters of the query, and anything else that identifies the data source
+        (e.g. the database server and schema).
+
+    Examples
+    --------
+    >>> get_cache_key('SELECT 1', (1, 2)) == get_cache_key('SELECT 1', (1, 2))
+    True
+    >>> get_cache_key('SELECT 1', (1, 2)) == get_cache_key('SELECT 1', (1, 3))
+    False
+    """
+    data = json.dumps([sql_query, version, params], sort_keys=True, default=str)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
@@ -0,0 +1,308 @@
+"""Run external commands (``mysql``, ``myisampack``, ``gzip``, ...) with timeouts and cancellation.
+
+Every command is started in a new process group. While the command runs, a watchdog thread
+checks its :class:`CancellationToken`, and kills the entire group (the shell, and every
+command in its pipeline) once the token is cancelled or its deadline passes. Outputs which
+the command leaves behind when it does not finish (e.g. half-written ``.tmp`` files) are
+removed, so a stuck stage frees its worker instead of holding it forever.
+
+Tokens can be linked: a token created with a `parent` is cancelled together with its parent,
+and inherits the deadline of its parent if that is earlier. A pool can therefore cancel
+all of its work with one token, while every stage still has its own timeout.
+
+Examples
+--------
+>>> run_command('echo hello')
+('hello', '', 0)
+>>> run_command('sleep 10', timeout=0.2)
+Traceback (most recent call last):
+...
+odbo.commands.DeadlineExceededError: Command 'sleep 10' did not finish within 0.2 seconds!
+>>> token = CancellationToken()
+>>> token.cancel()
+>>> run_command('sleep 10', cancel=token)
+Traceback (most recent call last):
+...
+odbo.commands.CancelledError: Command 'sleep 10' was cancelled!
+"""
+import logging
+import os
+import shlex
+import signal
+import subprocess
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+#: Number of seconds between two checks of whether a command should be stopped
+POLL_INTERVAL = 0.1
+
+#: Number of seconds that a process group has to exit after ``SIGTERM``, before ``SIGKILL``
+KILL_GRACE_PERIOD = 5.0
+
+
+class CancelledError(Exception):
+    """A command or a stage was stopped because its :class:`CancellationToken` was cancelled."""
+
+
+class DeadlineExceededError(CancelledError):
+    """A command or a stage was stopped because it did not finish before its deadline."""
+
+
+class CancellationToken:
+    """Tells long-running work that it should stop.
+
+    Parameters
+    ----------
+    timeout : float | None
+        Number of seconds after which the token cancels itself.
+    parent : CancellationToken | None
+        Token which cancels this token as well.
+
+    Notes
+    -----
+    Tokens can be sent to other processes (e.g. as arguments of
+    :class:`~concurrent.futures.ProcessPoolExecutor` tasks), but only their deadline
+    travels with them: calling :meth:`cancel` does not reach copies in other processes.
+    """
+
+    def __init__(self, timeout=None, parent=None):
+        self.timeout = timeout
+        self.deadline = time.time() + timeout if timeout is not None else None
+        if parent is not None and parent.deadline is not None and (
+                self.deadline is None or parent.deadline < self.deadline):
+            self.timeout = parent.timeout
+            self.deadline = parent.deadline
+        self.parent = parent
+        self._cancelled = threading.Event()
+
+    def __repr__(self):
+        return 'CancellationToken(cancelled={}, remaining={})'.format(
+            self.cancelled, self.remaining)
+
+    def __getstate__(self):
+        return {'timeout': self.timeout, 'deadline': self.deadline, 'parent': None}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Cancel this token, and every token linked to it."""
+        self._cancelled.set()
+
+    @property
+    def timed_out(self):
+        """Whether the deadline of the token has passed."""
+        return self.deadline is not None and time.time() >= self.deadline
+
+    @property
+    def cancelled(self):
+        """Whether work should stop, because the token was cancelled or has timed out."""
+        return (
+            self._cancelled.is_set() or self.timed_out or
+            (self.parent is not None and self.parent.cancelled))
+
+    @property
+    def remaining(self):
+        """Number of seconds left until the deadline, or None if there is no deadline."""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.time(), 0.0)
+
+    def check(self, description='Operation'):
+        """Raise an error if work should stop.
+
+        Raises
+        ------
+        DeadlineExceededError
+            If the deadline has passed.
+        CancelledError
+            If the token was cancelled.
+        """
+        if self.timed_out:
+            raise DeadlineExceededError(
+                "{} did not finish within {} seconds!".format(description, self.timeout))
+        if self.cancelled:
+            raise CancelledError("{} was cancelled!".format(description))
+
+
+class Command:
+    """Run a command in its own process group, stopping it when `cancel` is cancelled.
+
+    Parameters
+    ----------
+    args : str | list
+        The command. Strings are run by the shell if `shell` is True, and are split into
+        arguments otherwise.
+    timeout : float | None
+        Number of seconds that the command may run.
+    cancel : CancellationToken | None
+        Token which stops the command.
+    cleanup : list
+        Paths to remove, and functions to call, if the command (or the code using its
+        output) fails or is stopped.
+    popen_kwargs : dict
+        Other arguments of :class:`subprocess.Popen`.
+
+    Attributes
+    ----------
+    process : subprocess.Popen
+
+    Examples
+    --------
+    >>> with Command(['echo', 'hello'], stdout=subprocess.PIPE) as command:
+    ...     command.process.stdout.read()
+    b'hello\\n'
+    """
+
+    def __init__(
+            self, args, timeout=None, cancel=None, cleanup=(), shell=False, **popen_kwargs):
+        if isinstance(args, str) and not shell:
+            args = shlex.split(args)
+        self.args = args
+        self.token = CancellationToken(timeout, parent=cancel)
+        self.cleanup = list(cleanup)
+        self.shell = shell
+        self.popen_kwargs = popen_kwargs
+        self.process = None
+        self._stop_reason = None
+        self._finished = threading.Event()
+        self._watchdog = threading.Thread(target=self._watch, daemon=True)
+
+    def __repr__(self):
+        return 'Command({!r})'.format(self.args)
+
+    @property
+    def description(self):
+        return "Command '{}'".format(
+            self.args if isinstance(self.args, str) else ' '.join(self.args))
+
+    def __enter__(self):
+        self.token.check(self.description)
+        logger.debug("Running command {!r}...".format(self.args))
+        # A new session makes the command the leader of a process group,
+        # which is killed as a whole
+        self.process = subprocess.Popen(
+            self.args, shell=self.shell, start_new_session=True, **self.popen_kwargs)
+        self._watchdog.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            # The watchdog keeps running while we wait
+            self.process.wait()
+        self._finished.set()
+        self._watchdog.join()
+        if exc_type is not None or self._stop_reason is not None:
+            kill_process_group(self.process)
+            self.clean_up()
+        if self._stop_reason is not None:
+            # Errors caused by the killed command (e.g. a broken pipe) are not interesting
+            raise self._stop_reason
+        return False
+
+    def _watch(self):
+        while not self._finished.wait(POLL_INTERVAL):
+            if self.process.poll() is not None:
+                return
+            try:
+                self.token.check(self.description)
+            except CancelledError as e:
+                logger.warning("{} Stopping...".format(e))
+                self._stop_reason = e
+                kill_process_group(self.process)
+                return
+
+    def clean_up(self):
+        """Remove the partial outputs of the command.
+
+        Called automatically if the command is stopped, or if the code using it fails.
+        """
+        for item in self.cleanup:
+            try:
+                if callable(item):
+                    item()
+                else:
+                    os.remove(item)
+                    logger.debug("Removed partial output '{}'.".format(item))
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.error("Could not clean up after {}: {!r}".format(self.description, e))
+
+
+def kill_process_group(process, grace_period=KILL_GRACE_PERIOD):
+    """Stop every process in the group of `process` (``SIGTERM``, then ``SIGKILL``)."""
+    if process.poll() is not None:
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(grace_period)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+    except ProcessLookupError:
+        pass
+
+
+def run_command(system_command, timeout=None, cancel=None, cleanup=(), allowed_returncodes=(0, )):
+    """Run shell command `system_command`, and return its output.
+
+    Parameters
+    ----------
+    timeout, cancel, cleanup
+        See :class:`Command`.
+
+    Returns
+    -------
+    stdout : str
+    stderr : str
+    returncode : int
+
+    Raises
+    ------
+    subprocess.CalledProcessError
+        If the command fails.
+    CancelledError
+        If the command is stopped (:class:`DeadlineExceededError` if it timed out).
+    """
+    command = Command(
+        system_command, timeout, cancel, cleanup, shell=True, stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE, universal_newlines=True)
+    with command:
+        stdout, stderr = command.process.communicate()
+        if command.process.returncode not in allowed_returncodes:
+            # Partial outputs are removed on the way out
+            raise subprocess.CalledProcessError(
+                command.process.returncode, system_command, output=stdout, stderr=stderr)
+    return stdout.strip(), stderr.strip(), command.process.returncode
+
+
+def iter_command_output(
+        system_command, timeout=None, cancel=None, cleanup=(), allowed_returncodes=(0, )):
+    """Run `system_command` (without a shell), yielding the lines of its stdout and stderr.
+
+    Blank lines are skipped, and MySQL log prefixes are removed.
+
+    Raises
+    ------
+    subprocess.CalledProcessError
+        If the command fails.
+    CancelledError
+        If the command is stopped.
+    """
+    command = Command(
+        system_command, timeout, cancel, cleanup, stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT, universal_newlines=True)
+    with command:
+        for line in command.process.stdout:
+            line = line.strip()
+            if ' [Note] ' in line:
+                line = line.partition(' [Note] ')[-1]
+            if line:
+                yield line
+        if command.process.wait() not in allowed_returncodes:
+            raise subprocess.CalledProcessError(command.process.returncode, system_command)
@@ -1,18 +1,40 @@
 import csv
+import io
+import itertools
 import logging
 import os
 import os.path as op
-from collections import Counter
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
 
 import pandas as pd
 import sqlalchemy as sa
 
 from kmtools.db_tools import make_connection_string, parse_connection_string
 from kmtools.df_tools import format_columns, get_df_dtypes, get_file_dtypes, get_tablename
-from kmtools.system_tools import retry_database, run_command
-from odbo._format_file_bash import decompress
+from kmtools.system_tools import retry_database
+from odbo._format_file_bash import decompress, get_format_command, get_sed_substitutions
+from odbo._format_file_python import VCF_HEADER_SUBSTITUTION, iter_decompress
+from odbo.commands import CancellationToken, run_command
 from odbo.daemon import MySQLDaemon
-from odbo.table import MySQLTable
+from odbo.ddl import TableLayout, get_alter_table_sql, get_create_table_sql, read_table_layout
+from odbo.dtypes import get_arrow_schema, get_generic_dtypes, get_numpy_dtypes
+from odbo.encoding import (
+    DictionaryEncoder, get_dictionary_columns, get_lookup_tablename, get_view_name,
+    get_view_query)
+from odbo.engines import POOL_SIZE, fetch_value, get_databases, get_engine
+from odbo.estimate import ThroughputTimer, estimate_import
+from odbo.progress import iter_progress, make_progress
+from odbo.readers import read_fwf, read_xlsx, strip_extension
+from odbo.schema import get_widened_dtypes, optimize_schema
+from odbo.snapshot import SnapshotError, copy_files, read_manifest, verify_files
+from odbo.table import MySQLTable, PostgresTable, SQLiteTable
+from odbo.transport import get_transport
+from odbo.validation import (
+    SAMPLE_SIZE, LoadReport, LoadWarnings, count_lines, find_rows, iter_count_lines,
+    sample_lines)
+from odbo.vcf import get_vcf_dtypes, read_vcf
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +43,411 @@ class _Connection:
     pass
 
 
+def _set_default_csv_opts(csv_opts):
+    """Fill in the default options used to parse input files (in place)."""
+    csv_opts['sep'] = csv_opts.get('sep', '\t')
+    csv_opts['na_values'] = csv_opts.get('na_values', ['', '\\N', '.', 'na'])
+    if isinstance(csv_opts['na_values'], str):
+        csv_opts['na_values'] = [csv_opts['na_values']]
+    csv_opts['quotechar'] = csv_opts.get('quotechar', '"')
+    csv_opts['quoting'] = csv_opts.get('quoting', csv.QUOTE_MINIMAL)
+    return csv_opts
+
+
+def _get_db_skiprows(csv_opts):
+    """Return the number of lines that the database should skip (including the header)."""
+    if csv_opts.get('names') is None:
+        return csv_opts.get('skiprows', 0) + 1  # skip the header
+    else:
+        return csv_opts.get('skiprows', 0)
+
+
+def _get_record_quotechar(quotechar, quoting):
+    """Return the character which quotes fields that can contain newlines (or None)."""
+    return None if quoting == csv.QUOTE_NONE else quotechar
+
+
+def _check_duplicate_columns(df):
+    """Make sure that there are no duplicate columns silently screwing everything up."""
+    column_counts = Counter(df.columns)
+    duplicate_columns = [x for x in column_counts.items() if x[1] > 1]
+    if duplicate_columns:
+        raise Exception("The following columns have duplicates: {}".format(duplicate_columns))
+
+
+def _iter_csv_chunks(file, chunksize=int(1e6), **csv_opts):
+    """Read `file` `chunksize` rows at a time, formatting column names."""
+    for df in pd.read_csv(file, chunksize=chunksize, low_memory=False, **csv_opts):
+        df.columns = format_columns(df.columns)
+        yield df
+
+
+def _iter_str_chunks(file, chunksize=int(1e6), **csv_opts):
+    """Read formatted file `file` `chunksize` rows at a time, keeping all values as strings.
+
+    Values can be written back without being altered.
+    """
+    csv_opts = {**csv_opts, 'dtype': str, 'keep_default_na': False, 'na_values': ['\\N']}
+    yield from _iter_csv_chunks(file, chunksize=chunksize, **csv_opts)
+
+
+def _get_dictionary_encoder(df, dtypes, dictionary_columns):
+    """Return an encoder of `dictionary_columns`, or of columns chosen from `df` if True."""
+    if dictionary_columns is True:
+        dictionary_columns = get_dictionary_columns(df, dtypes)
+    return DictionaryEncoder(dictionary_columns or [])
+
+
+def _get_file_dictionary_encoder(file, dtypes, dictionary_columns, nrows=100000, **csv_opts):
+    """Return an encoder of `dictionary_columns`, or of columns chosen from the first
+    `nrows` rows of formatted file `file` if True.
+    """
+    df = None
+    if dictionary_columns is True:
+        df = next(_iter_str_chunks(file, chunksize=nrows, **csv_opts))
+    return _get_dictionary_encoder(df, dtypes, dictionary_columns)
+
+
+def _iter_encoded_chunks(file, encoder, chunksize=100000, progress=None, **csv_opts):
+    """Read formatted file `file` `chunksize` rows at a time, encoding the columns of `encoder`.
+
+    Values of other columns are kept as strings.
+    """
+    chunks = _iter_file_chunks(file)
+    if progress is not None:
+        chunks = iter_progress(chunks, progress)
+    reader = io.BufferedReader(_ChunkReader(chunks))
+    for df in _iter_str_chunks(reader, chunksize=chunksize, **csv_opts):
+        yield encoder.encode(df)
+
+
+def _get_df_dtypes(df):
+    """Infer the column types of `df`, including datetime columns (e.g. the dates of Excel
+    cells), which :func:`kmtools.df_tools.get_df_dtypes` leaves without a type.
+
+    Examples
+    --------
+    >>> _get_df_dtypes(pd.DataFrame({'id': [1, 2], 'date': pd.to_datetime(['2018-01-01', None])}))
+    {'id': INTEGER(), 'date': DateTime()}
+    """
+    dtypes = get_df_dtypes(df)
+    for column in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[column]):
+            dtypes[column] = sa.DateTime()
+    return dtypes
+
+
+def _update_dtypes(dtypes, extra_dtypes):
+    """Overwrite inferred `dtypes` with user-provided `extra_dtypes`."""
+    if extra_dtypes:
+        if set(extra_dtypes.keys()) - set(dtypes.keys()):
+            logger.warning(
+                "The following dtypes were not applied: ({})"
+                .format(set(extra_dtypes.keys()) - set(dtypes.keys())))
+        dtypes = {**dtypes, **extra_dtypes}
+    return dtypes
+
+
+def _split_file(file, partitioning, chunksize=int(1e6), **csv_opts):
+    """Split formatted file `file` into one file (without a header) per partition.
+
+    Values are read and written back as strings, so the data is not altered.
+
+    Returns
+    -------
+    partition_files : dict
+        Mapping of partition names to file names.
+    """
+    csv_opts = {**csv_opts, 'dtype': str, 'keep_default_na': False, 'na_values': ['\\N']}
+    write_opts = dict(
+        sep=csv_opts['sep'], quotechar=csv_opts['quotechar'], quoting=csv_opts['quoting'],
+        na_rep='\\N', index=False, header=False)
+    partition_files = {
+        name: '{}.{}'.format(file, name) for name in partitioning.names
+    }
+    for partition_file in partition_files.values():
+        open(partition_file, 'w').close()
+    for df in _iter_csv_chunks(file, chunksize=chunksize, **csv_opts):
+        names = partitioning.assign(df[partitioning.column])
+        for name, partition_df in df.groupby(names.values, sort=False):
+            partition_df.to_csv(partition_files[name], mode='a', **write_opts)
+    return partition_files
+
+
+def _get_file_segments(file, segment_size, skiprows=0):
+    """Split `file` into line-aligned byte ranges of roughly `segment_size` bytes.
+
+    Parameters
+    ----------
+    skiprows : int
+        Number of lines at the start of the file (e.g. the header) which are not
+        included in any segment.
+
+    Returns
+    -------
+    segments : list
+        ``(start, end)`` byte offsets of every segment.
+    """
+    file_size = op.getsize(file)
+    segments = []
+    with open(file, 'rb') as fh:
+        for _ in range(skiprows):
+            fh.readline()
+        start = fh.tell()
+        while start < file_size:
+            fh.seek(min(start + segment_size, file_size) - 1)
+            fh.readline()
+            end = fh.tell()
+            segments.append((start, end))
+            start = end
+    return segments
+
+
+def _write_segment(file, start, end, segment_file, buffer_size=1024 * 1024):
+    """Copy bytes `start` to `end` of `file` into `segment_file`."""
+    with open(file, 'rb') as ifh, open(segment_file, 'wb') as ofh:
+        ifh.seek(start)
+        remaining = end - start
+        while remaining:
+            data = ifh.read(min(buffer_size, remaining))
+            if not data:
+                break
+            ofh.write(data)
+            remaining -= len(data)
+
+
+def _get_file_import_dtypes(
+        file, dtypes=None, extra_dtypes=None, optimize_dtypes=False, **csv_opts):
+    """Infer (or optimize) the column types of formatted file `file`.
+
+    Returns
+    -------
+    df : DataFrame
+        Empty DataFrame with the (formatted) columns of the file.
+    dtypes : dict
+    not_null : list | None
+        Columns which do not contain nulls, if `optimize_dtypes`.
+    """
+    if dtypes is None:
+        df, dtypes = get_file_dtypes(file, **csv_opts)
+        df.columns = format_columns(df.columns)
+        dtypes = {format_columns(k): v for k, v in dtypes.items()}
+        dtypes = _update_dtypes(dtypes, extra_dtypes)
+    else:
+        df, _ = get_file_dtypes(file, nrows=0, **csv_opts)
+        df.columns = format_columns(df.columns)
+
+    not_null = None
+    if optimize_dtypes:
+        # Nulls in the formatted file are '\N', whatever `na_values` the input file used
+        csv_opts = {**csv_opts, 'keep_default_na': False, 'na_values': ['\\N']}
+        dfs = _iter_csv_chunks(file, **csv_opts)
+        dtypes, not_null, report = optimize_schema(dfs, dtypes)
+        dtypes = _update_dtypes(dtypes, extra_dtypes)
+        logger.info("Optimized column types:\n{}".format(report))
+    return df[0:0], dtypes, not_null
+
+
+def _check_segment_engine(db_engine):
+    """Make sure that checkpointed imports can copy segments into a `db_engine` table safely.
+
+    Examples
+    --------
+    >>> _check_segment_engine('InnoDB')
+    >>> _check_segment_engine('MyISAM')
+    Traceback (most recent call last):
+    ...
+    ValueError: Checkpointed imports require a transactional storage engine (not MyISAM)!
+    """
+    if str(db_engine).lower() not in TRANSACTIONAL_ENGINES:
+        raise ValueError(
+            "Checkpointed imports require a transactional storage engine (not {})!"
+            .format(db_engine))
+
+
+def _check_load_progress(progress, filename, segments):
+    """Make sure that recorded load `progress` refers to the same file and segments."""
+    for row in progress.itertuples():
+        if (row.filename != filename or
+                row.file_size != op.getsize(filename) or
+                row.segment >= len(segments) or
+                (row.start_offset, row.end_offset) != segments[row.segment]):
+            raise ValueError(
+                "Recorded progress does not match file '{}' (or the segment size has changed)! "
+                "Clear the load progress and start the import from scratch."
+                .format(filename))
+
+
+def _iter_csv_blocks(dfs, num_workers=2, max_pending=4, **csv_opts):
+    r"""Serialize every dataframe in `dfs` into CSV, using `num_workers` threads.
+
+    Blocks are yielded in order. At most `max_pending` blocks are being serialized or
+    waiting to be consumed at any time, so a slow consumer stalls the workers instead of
+    letting serialized data pile up in memory.
+
+    Examples
+    --------
+    >>> df = pd.DataFrame({'a': [1, 2, 3], 'b': ['x', None, 'z']})
+    >>> dfs = [df[:2], df[2:]]
+    >>> list(_iter_csv_blocks(dfs, sep='\t', na_rep='\\N', index=False, header=False))
+    [b'1\tx\n2\t\\N\n', b'3\tz\n']
+    """
+    def to_csv(df):
+        return df.to_csv(**csv_opts).encode('utf-8')
+
+    with ThreadPoolExecutor(num_workers) as executor:
+        pending = deque()
+        for df in dfs:
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+            pending.append(executor.submit(to_csv, df))
+        while pending:
+            yield pending.popleft().result()
+
+
+def _iter_df_blocks(df, chunksize):
+    """Yield `df`, `chunksize` rows at a time."""
+    for start in range(0, len(df), chunksize):
+        yield df[start:start + chunksize]
+
+
+def _peek_chunks(dfs, num_chunks):
+    """Take the first `num_chunks` dataframes out of `dfs`.
+
+    Returns
+    -------
+    first_dfs : list
+        Up to `num_chunks` dataframes.
+    dfs : iterator
+        All dataframes, including `first_dfs`.
+    """
+    dfs = iter(dfs)
+    first_dfs = list(itertools.islice(dfs, num_chunks))
+    if not first_dfs:
+        raise ValueError("No dataframes to import!")
+    return first_dfs, itertools.chain(first_dfs, dfs)
+
+
+def _iter_chunk_runs(dfs, columns, dtypes):
+    """Split `dfs` into runs of consecutive dataframes which fit into column types `dtypes`.
+
+    Yields
+    ------
+    widened_dtypes : dict
+        Column types which have to be widened before loading the run
+        (`dtypes` is updated in place).
+    run : iterator of DataFrames
+        Dataframes with columns `columns`. Each run must be consumed before
+        asking for the next one.
+    """
+    dfs = (_check_chunk_columns(df, columns) for df in dfs)
+    for widened_dtypes, run in _iter_runs(dfs, dtypes, lambda df: df):
+        yield widened_dtypes, (_cast_integer_columns(df, dtypes) for df in run)
+
+
+def _iter_block_runs(blocks, columns, dtypes, **csv_opts):
+    """Split line-aligned blocks of formatted data (without a header) into runs of
+    consecutive blocks which fit into column types `dtypes` (see :func:`_iter_chunk_runs`).
+
+    Blocks are parsed only to be checked, and are yielded as they are.
+    """
+    read_csv_opts = _get_block_csv_opts(columns, **csv_opts)
+    usecols = [c for c in columns if c in dtypes]
+    return _iter_runs(
+        blocks, dtypes,
+        lambda block: pd.read_csv(
+            io.BytesIO(block), usecols=usecols, low_memory=False, **read_csv_opts))
+
+
+def _iter_runs(items, dtypes, get_df):
+    """Split `items` into runs of consecutive items whose data (``get_df(item)``)
+    fits into column types `dtypes`.
+    """
+    items = iter(items)
+    item = next(items, None)
+    while item is not None:
+        widened_dtypes = get_widened_dtypes(dtypes, get_df(item))
+        dtypes.update(widened_dtypes)
+        overflow = []
+        yield widened_dtypes, _iter_run(item, items, dtypes, get_df, overflow)
+        item = overflow[0] if overflow else None
+
+
+def _iter_run(item, items, dtypes, get_df, overflow):
+    """Yield `item` and the following items, until one does not fit into `dtypes`.
+
+    That item is appended to `overflow`.
+    """
+    yield item
+    for item in items:
+        if get_widened_dtypes(dtypes, get_df(item)):
+            overflow.append(item)
+            return
+        yield item
+
+
+def _cast_integer_columns(df, dtypes):
+    """Cast float columns of `df` which are stored as integers, so they are written as such.
+
+    E.g. integer columns with nulls are read as floats, and would be written as ``1.0``.
+    """
+    columns = [
+        c for c in df.columns
+        if df[c].dtype.kind == 'f' and isinstance(dtypes[c], sa.Integer)
+    ]
+    if columns:
+        df = df.astype({c: 'Int64' for c in columns})
+    return df
+
+
+def _check_chunk_columns(df, columns):
+    """Put the columns of `df` into the same order as the columns of the table."""
+    extra_columns = [c for c in df.columns if c not in columns]
+    if extra_columns:
+        raise ValueError(
+            "Columns {} are not in the table, which has columns {}!"
+            .format(extra_columns, columns))
+    if list(df.columns) != columns:
+        df = df.reindex(columns=columns)
+    return df
+
+
+def _read_vcf_chunks(file, info_fields, keep_info, chunksize):
+    """Read VCF file `file` in chunks, with column types from its header (see :mod:`odbo.vcf`).
+
+    Returns
+    -------
+    dtypes : dict
+        A dictionary of dtypes for each column.
+    dfs : iterator of DataFrames
+    """
+    header, dfs = read_vcf(file, info_fields, keep_info, chunksize)
+    first_dfs, dfs = _peek_chunks(dfs, 1)
+    return get_vcf_dtypes(header, first_dfs[0]), dfs
+
+
+def _iter_file_chunks(filename, chunksize=1024 * 1024):
+    """Read `filename`, `chunksize` bytes at a time."""
+    with open(filename, 'rb') as ifh:
+        yield from iter(lambda: ifh.read(chunksize), b'')
+
+
+def _write_fifo(fifo, chunks):
+    """Write `chunks` into named pipe `fifo`, blocking until they have all been read."""
+    with open(fifo, 'wb') as ofh:
+        for chunk in chunks:
+            ofh.write(chunk)
+
+
+def _release_fifo(fifo):
+    """Unblock a writer still waiting for a reader to open `fifo` (e.g. after a failed load).
+
+    The writer then fails with a ``BrokenPipeError`` on its first write.
+    """
+    fd = os.open(fifo, os.O_RDONLY | os.O_NONBLOCK)
+    os.close(fd)
+
+
 # === MySQL / MariaDB ===
 
 MYSQL_CSV_OPTS = dict(
@@ -32,6 +459,15 @@ MYSQL_CSV_OPTS = dict(
     # escapechar='\\',  # this screws up nulls (\N) because it tries to escape them... :(
 )
 
+#: Table which keeps track of the segments loaded by checkpointed imports
+LOAD_PROGRESS_TABLE = '_odbo_load_progress'
+
+#: Default size of a segment in checkpointed imports (bytes)
+SEGMENT_SIZE = 1024 ** 3
+
+#: Storage engines which can copy a segment and record it as loaded in one transaction
+TRANSACTIONAL_ENGINES = {'innodb', 'xtradb', 'rocksdb'}
+
 
 class MySQLConnection(_Connection):
     """Load and save data from a database using intermediary csv files.
@@ -41,18 +477,21 @@ class MySQLConnection(_Connection):
 
     def __init__(
             self, connection_string, shared_folder, storage_host, datadir=None,
-            echo=False, db_engine=None, use_compression=False):
+            echo=False, db_engine=None, use_compression=False, pool_size=POOL_SIZE,
+            pool_pre_ping=True):
         self.connection_string = connection_string
         self.shared_folder = op.abspath(shared_folder)
         os.makedirs(self.shared_folder, exist_ok=True)
         self.storage_host = storage_host
+        self.transport = get_transport(storage_host)
         self.datadir = datadir
         self.db_engine = (
             db_engine if db_engine is not None else MySQLDaemon._default_storage_engine)
         self.use_compression = use_compression
         #
         logger.debug("Connection string: {}".format(repr(self.connection_string)))
-        self.engine = sa.create_engine(self.connection_string, echo=echo)
+        self.engine = get_engine(
+            self.connection_string, echo=echo, pool_size=pool_size, pool_pre_ping=pool_pre_ping)
         try:
             self.db_schema = self._get_db_schema()
         except sa.exc.OperationalError:
@@ -62,37 +501,96 @@ class MySQLConnection(_Connection):
             logger.debug("db_params: {}".format(db_params))
             _connection_string = make_connection_string(**db_params)
             logger.debug("_connection_string: {}".format(_connection_string))
-            _engine = sa.create_engine(_connection_string, echo=echo)
+            _engine = get_engine(_connection_string, echo=echo)
             _engine.execute('CREATE DATABASE {}'.format(_schema))
-            self.db_schema = self._get_db_schema()
+            self.db_schema = self._get_db_schema(refresh=True)
 
-    def _get_db_schema(self):
-        return set(pd.read_sql_query('show databases;', self.engine)['Database'])
+    def _get_db_schema(self, refresh=False):
+        return get_databases(self.engine, 'show databases;', refresh=refresh)
 
     @retry_database
     def create_db_table(
-            self, tablename, df, dtypes, empty=True, if_exists='replace'):
+            self, tablename, df, dtypes, empty=True, if_exists='replace', not_null=None,
+            partitioning=None, index_commands=None, primary_key=None):
         """Create a table `tablename` in the database.
 
         If `empty` == True, do not load any data. Otherwise,
         load the entire `df` into the created table.
+
+        Columns in `not_null` are declared as ``NOT NULL``.
+        The table is split into partitions according to `partitioning`
+        (see :class:`odbo.partitioning.Partitioning`).
+
+        The columns, indexes (`index_commands` and `primary_key`), storage engine,
+        row format and partitions are declared in a single ``CREATE TABLE`` statement.
+        If the table already exists and `if_exists` is 'replace', the table is emptied
+        and, if its layout is different, changed with a single ``ALTER TABLE`` statement,
+        which keeps the existing indexes (see :mod:`odbo.ddl`).
         """
         if empty:
             df = df[:0]
-        df.to_sql(tablename, self.engine, dtype=dtypes, index=False, if_exists=if_exists)
-        # Change storage engine
-        if self.db_engine != MySQLDaemon._default_storage_engine:
-            self.engine.execute(
-                'ALTER TABLE {tablename} ENGINE={db_engine};'  # ROW_FORMAT = FIXED
-                .format(tablename=tablename, db_engine=self.db_engine))
-        # Set compression
-        if self.use_compression and self.db_engine == 'InnoDB':
-            self.engine.execute(
-                'ALTER TABLE {tablename} ROW_FORMAT=COMPRESSED;'.format(tablename=tablename))
+        missing_columns = [c for c in df.columns if c not in dtypes]
+        if missing_columns:
+            dtypes = {**_get_df_dtypes(df[missing_columns]), **dtypes}
+        target = TableLayout.from_dtypes(
+            df.columns, dtypes, self.engine.dialect, not_null=not_null, engine=self.db_engine,
+            row_format=(
+                'COMPRESSED' if self.use_compression and self.db_engine == 'InnoDB' else None),
+            primary_key=primary_key, index_commands=index_commands, partitioning=partitioning)
+        db_schema = parse_connection_string(self.connection_string)['db_schema']
+        existing = read_table_layout(self.engine, db_schema, tablename)
+        if existing is None:
+            self.engine.execute(get_create_table_sql(tablename, target))
+        elif if_exists == 'fail':
+            raise ValueError("Table '{}' already exists!".format(tablename))
+        elif if_exists == 'replace':
+            self._alter_db_table(tablename, existing, target)
+        if not df.empty:
+            df.to_sql(tablename, self.engine, dtype=dtypes, index=False, if_exists='append')
+
+    def _alter_db_table(self, tablename, existing, target):
+        """Empty table `tablename`, and change its layout from `existing` into `target`.
+
+        Tables which cannot be changed (e.g. because an existing index does not fit
+        the new type of a column) are created again.
+        """
+        self.engine.execute('TRUNCATE TABLE `{}`;'.format(tablename))
+        sql_command = get_alter_table_sql(tablename, existing, target)
+        if sql_command is None:
+            logger.debug("Table '{}' already has the right layout.".format(tablename))
+            return
+        logger.debug("sql_command: '{}'".format(sql_command))
+        try:
+            self.engine.execute(sql_command)
+        except sa.exc.DatabaseError as e:
+            logger.warning(
+                "Could not alter table '{}' ({!r}), creating it again...".format(tablename, e))
+            self.engine.execute('DROP TABLE `{}`;'.format(tablename))
+            self.engine.execute(get_create_table_sql(tablename, target))
 
     def load_file_to_database(
             self, tsv_filepath, tablename, sep, quotechar='"', quoting=csv.QUOTE_MINIMAL,
-            skiprows=1):
+            skiprows=1, progress=None, timeout=None, cancel=None):
+        """Load formatted file `tsv_filepath` into table `tablename`.
+
+        If `progress` is given, the file is streamed to the database through a named pipe
+        (see :meth:`load_chunks_to_database`), counting the bytes sent in `progress`.
+
+        The ``mysql`` client is killed if it runs for longer than `timeout` seconds, or once
+        `cancel` is cancelled, raising :class:`odbo.commands.CancelledError`
+        (see :mod:`odbo.commands`).
+
+        Returns
+        -------
+        load_warnings : LoadWarnings
+            Warnings reported by ``LOAD DATA`` (e.g. truncated values).
+        """
+        if progress is not None:
+            chunks = iter_progress(_iter_file_chunks(tsv_filepath), progress)
+            return self.load_chunks_to_database(
+                chunks, tablename, sep, quotechar, quoting, skiprows,
+                cancel=CancellationToken(timeout, parent=cancel))
+
         logger.debug("Loading data into MySQL table: '{}'...".format(tablename))
 
         # Database options
@@ -120,84 +618,668 @@ class MySQLConnection(_Connection):
 mysql --local-infile {header} -u {db_username} {db_schema} -e \
 "load data local infile '{tsv_filepath}' into table `{tablename}` \
 fields terminated by {sep} {quoting} ignore {skiprows} lines; \
- show warnings;" \
+ show count(*) warnings; show warnings;" \
 """.format(header=header, tsv_filepath=tsv_filepath, tablename=tablename, skiprows=skiprows,
            sep=repr(sep), quoting=quoting, **db_params)
-        run_command(system_command)
+        stdout, _, _ = run_command(system_command, timeout, cancel)
+        load_warnings = LoadWarnings.parse(stdout)
+        if load_warnings.count:
+            logger.warning("Loading into '{}' produced warnings: {}".format(
+                tablename, load_warnings))
+        return load_warnings
+
+    def load_df_to_database(self, df, tablename, chunksize=100000, num_workers=2, max_pending=4):
+        """Stream dataframe `df` into table `tablename`, `chunksize` rows at a time.
+
+        See :meth:`load_dfs_to_database`.
+        """
+        self.load_dfs_to_database(
+            _iter_df_blocks(df, chunksize), tablename, num_workers, max_pending)
+
+    def load_dfs_to_database(
+            self, dfs, tablename, num_workers=2, max_pending=4, cancel=None):
+        """Stream an iterable of dataframes `dfs` into table `tablename`.
+
+        Dataframes are serialized by `num_workers` threads (see :meth:`load_chunks_to_database`).
+        At most `max_pending` serialized dataframes are held in memory at a time,
+        no matter how much data there is, and nothing is written to disk.
+        """
+        csv_opts = {**MYSQL_CSV_OPTS, 'header': False}
+        chunks = _iter_csv_blocks(dfs, num_workers, max_pending, **csv_opts)
+        return self.load_chunks_to_database(chunks, tablename, '\t', skiprows=0, cancel=cancel)
+
+    def load_chunks_to_database(
+            self, chunks, tablename, sep, quotechar='"', quoting=csv.QUOTE_MINIMAL,
+            skiprows=1, cancel=None):
+        r"""Stream an iterable of formatted data blocks into table `tablename`.
+
+        Blocks are written into a named pipe in `shared_folder`, which
+        ``LOAD DATA LOCAL INFILE`` reads from. Blocks are only pulled from `chunks` as fast
+        as the database loads them.
+
+        Parameters
+        ----------
+        chunks : iterable of bytes
+            Blocks of complete lines, with nulls represented as ``\N``.
+        skiprows : int
+            Number of lines to skip at the beginning of the data (including the header).
+        cancel : odbo.commands.CancellationToken | None
+            Token which stops the load (see :meth:`load_file_to_database`).
+
+        Returns
+        -------
+        load_warnings : LoadWarnings
+        """
+        fifo = op.join(self.shared_folder, '{}.{}.fifo'.format(tablename, os.getpid()))
+        os.mkfifo(fifo)
+        try:
+            with ThreadPoolExecutor(1) as executor:
+                writer = executor.submit(_write_fifo, fifo, chunks)
+                try:
+                    load_warnings = self.load_file_to_database(
+                        fifo, tablename, sep, quotechar, quoting, skiprows=skiprows,
+                        cancel=cancel)
+                except Exception:
+                    # Nobody is going to read the rest of the data
+                    while not writer.done():
+                        _release_fifo(fifo)
+                        wait([writer], timeout=0.1)
+                    raise
+                writer.result()
+        finally:
+            os.remove(fifo)
+        return load_warnings
+
+    @retry_database
+    def alter_columns(self, tablename, dtypes):
+        """Change the types of columns in table `tablename` to `dtypes`."""
+        self.engine.execute(
+            'ALTER TABLE `{tablename}` {modify_columns};'.format(
+                tablename=tablename,
+                modify_columns=', '.join(
+                    'MODIFY `{}` {}'.format(column, dtype.compile(dialect=self.engine.dialect))
+                    for column, dtype in dtypes.items())))
+
+    def load_partitions_to_database(
+            self, partition_files, tablename, sep, quotechar='"', quoting=csv.QUOTE_MINIMAL,
+            num_workers=4, cancel=None):
+        """Load one file per partition into the partitioned table `tablename`, in parallel.
+
+        Every file is loaded into its own staging table, which is then swapped with the
+        corresponding (empty) partition using ``ALTER TABLE ... EXCHANGE PARTITION``.
+
+        Parameters
+        ----------
+        partition_files : dict
+            Mapping of partition names to files without a header.
+        """
+        def load_partition(item):
+            partition, file = item
+            staging_tablename = '{}__{}'.format(tablename, partition)
+            self.engine.execute('DROP TABLE IF EXISTS {};'.format(staging_tablename))
+            self.engine.execute(
+                'CREATE TABLE {} LIKE {};'.format(staging_tablename, tablename))
+            self.engine.execute(
+                'ALTER TABLE {} REMOVE PARTITIONING;'.format(staging_tablename))
+            try:
+                load_warnings = self.load_file_to_database(
+                    file, staging_tablename, sep, quotechar, quoting, skiprows=0, cancel=cancel)
+            except BaseException:
+                self.engine.execute('DROP TABLE IF EXISTS {};'.format(staging_tablename))
+                raise
+            self.engine.execute(
+                'ALTER TABLE {} EXCHANGE PARTITION {} WITH TABLE {};'
+                .format(tablename, partition, staging_tablename))
+            self.engine.execute('DROP TABLE {};'.format(staging_tablename))
+            return load_warnings
+
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            return LoadWarnings.merge(executor.map(load_partition, partition_files.items()))
+
+    def get_load_progress(self, tablename):
+        """Return the segments of `tablename` recorded by an unfinished checkpointed import."""
+        self.engine.execute("""\
+CREATE TABLE IF NOT EXISTS {} (
+    tablename VARCHAR(64) NOT NULL,
+    segment INT NOT NULL,
+    filename VARCHAR(1024) NOT NULL,
+    file_size BIGINT NOT NULL,
+    start_offset BIGINT NOT NULL,
+    end_offset BIGINT NOT NULL,
+    rows_before BIGINT NOT NULL,
+    num_rows BIGINT NOT NULL,
+    status VARCHAR(16) NOT NULL,
+    PRIMARY KEY (tablename, segment)
+) ENGINE=InnoDB;""".format(LOAD_PROGRESS_TABLE))
+        return pd.read_sql_query(
+            sa.text("SELECT * FROM {} WHERE tablename = :tablename ORDER BY segment"
+                    .format(LOAD_PROGRESS_TABLE)),
+            self.engine, params={'tablename': tablename})
+
+    def clear_load_progress(self, tablename):
+        self.get_load_progress(tablename)  # make sure that the table exists
+        self.engine.execute(
+            sa.text("DELETE FROM {} WHERE tablename = :tablename".format(LOAD_PROGRESS_TABLE)),
+            tablename=tablename)
+
+    def load_segments_to_database(
+            self, tsv_filepath, tablename, sep, quotechar='"', quoting=csv.QUOTE_MINIMAL,
+            skiprows=1, segment_size=SEGMENT_SIZE, progress=None, cancel=None):
+        """Load `tsv_filepath` into `tablename` one segment at a time, recording progress.
+
+        The file is split into line-aligned segments of roughly `segment_size` bytes.
+        Every segment is loaded into a staging table, and then copied into `tablename`
+        using ``INSERT ... SELECT``, in the same transaction which records the segment in
+        :data:`LOAD_PROGRESS_TABLE`. A failed load can therefore be resumed by calling this
+        method again, with the same arguments. `tablename` has to use a transactional
+        storage engine (see :data:`TRANSACTIONAL_ENGINES`), because a half-finished copy
+        into a MyISAM table cannot be undone.
+
+        If given, `progress` is updated with the size of every finished segment.
+
+        Returns
+        -------
+        load_warnings : LoadWarnings
+            Warnings reported while loading the segments loaded by this call.
+        """
+        db_engine = fetch_value(
+            self.engine,
+            "SELECT engine FROM information_schema.tables "
+            "WHERE table_schema = DATABASE() AND table_name = :tablename",
+            tablename=tablename)
+        _check_segment_engine(db_engine)
+        segments = _get_file_segments(tsv_filepath, segment_size, skiprows)
+        load_progress = self.get_load_progress(tablename)
+        _check_load_progress(load_progress, tsv_filepath, segments)
+        done = set(load_progress[load_progress['status'] == 'done']['segment'])
+        load_warnings = []
+        for segment, (start, end) in enumerate(segments):
+            if segment in done:
+                logger.debug("Segment {} has already been loaded.".format(segment))
+            else:
+                load_warnings.append(self._load_segment(
+                    tsv_filepath, tablename, segment, start, end, sep, quotechar, quoting,
+                    cancel))
+            if progress is not None:
+                progress.update(end - start)
+        self.clear_load_progress(tablename)
+        if progress is not None:
+            progress.finish()
+        return LoadWarnings.merge(load_warnings)
+
+    @retry_database
+    def _load_segment(
+            self, tsv_filepath, tablename, segment, start, end, sep, quotechar, quoting,
+            cancel=None):
+        """Load a single segment of `tsv_filepath` into `tablename`.
+
+        Loading is idempotent: rows are copied into `tablename` in the same transaction
+        which marks the segment as done, so a segment whose transaction went through
+        (e.g. before the connection was lost) is not copied again.
+        """
+        logger.info("Loading segment {} of '{}'...".format(segment, tsv_filepath))
+        progress = self.get_load_progress(tablename)
+        if (progress[progress['segment'] == segment]['status'] == 'done').any():
+            return
+        staging_tablename = '{}__segment'.format(tablename)
+        self.engine.execute('DROP TABLE IF EXISTS {};'.format(staging_tablename))
+        self.engine.execute('CREATE TABLE {} LIKE {};'.format(staging_tablename, tablename))
+        segment_file = '{}.segment'.format(tsv_filepath)
+        try:
+            _write_segment(tsv_filepath, start, end, segment_file)
+            load_warnings = self.load_file_to_database(
+                segment_file, staging_tablename, sep, quotechar, quoting, skiprows=0,
+                cancel=cancel)
+        finally:
+            try:
+                os.remove(segment_file)
+            except FileNotFoundError:
+                pass
+        with self.engine.begin() as connection:
+            connection.execute(
+                'INSERT INTO {} SELECT * FROM {};'.format(tablename, staging_tablename))
+            self._set_segment_status(
+                connection, tablename, segment, tsv_filepath, start, end,
+                rows_before=int(progress['num_rows'].sum()),
+                num_rows=self._count_rows(staging_tablename),
+                status='done')
+        self.engine.execute('DROP TABLE {};'.format(staging_tablename))
+        return load_warnings
+
+    def _set_segment_status(
+            self, connection, tablename, segment, filename, start, end, **values):
+        connection.execute(
+            sa.text("REPLACE INTO {} VALUES (:tablename, :segment, :filename, :file_size, "
+                    ":start, :end, :rows_before, :num_rows, :status)"
+                    .format(LOAD_PROGRESS_TABLE)),
+            tablename=tablename, segment=segment, filename=filename,
+            file_size=op.getsize(filename), start=start, end=end, **values)
+
+    def _count_rows(self, tablename):
+        return self.engine.execute('SELECT COUNT(*) FROM {};'.format(tablename)).scalar()
+
+    def validate_load(
+            self, tablename, tsv_filepath, columns, dtypes, load_warnings=None, skiprows=1,
+            sample_size=SAMPLE_SIZE, sep='\t', quotechar='"', quoting=csv.QUOTE_MINIMAL,
+            expected_rows=None):
+        """Check that table `tablename` matches formatted file `tsv_filepath`, loaded into it.
+
+        The number of rows in the table is compared with the number of records in the file,
+        and `sample_size` random lines of the file are looked up in the table
+        (using a single scan of the table).
+
+        Parameters
+        ----------
+        columns : list
+            Columns of the table, in the order of the fields of the file.
+        load_warnings : LoadWarnings | None
+            Warnings reported while loading the file (see :meth:`load_file_to_database`).
+        skiprows : int
+            Number of lines at the beginning of the file which are not data (including the header).
+        expected_rows : int | None
+            Number of records in the file, if they were counted while it was written
+            (see :func:`odbo._format_file_bash.decompress`). Otherwise, the file is read again.
+
+        Returns
+        -------
+        report : LoadReport
+            Use :meth:`LoadReport.check` to raise an exception if any of the checks failed.
+        """
+        lines = sample_lines(tsv_filepath, sample_size, skiprows)
+        if lines:
+            sample = pd.read_csv(
+                io.BytesIO(b''.join(lines)), sep=sep, quotechar=quotechar, quoting=quoting,
+                header=None, names=columns, dtype=str, na_values=['\\N'],
+                keep_default_na=False)
+        else:
+            sample = pd.DataFrame(columns=columns)
+        found = find_rows(self.engine, tablename, sample, dtypes)
+        return LoadReport(
+            tablename, tsv_filepath,
+            expected_rows=(
+                expected_rows if expected_rows is not None else
+                count_lines(tsv_filepath, skiprows, sep=sep,
+                            quotechar=_get_record_quotechar(quotechar, quoting))),
+            num_rows=self._count_rows(tablename),
+            load_warnings=load_warnings,
+            sample=sample,
+            mismatches=sample[[not f for f in found]])
 
     def import_file(
             self, file, tablename=None, dtypes=None, extra_dtypes=None,
-            extra_substitutions=None, use_tmp=False, keep_tmp=False, **csv_opts):
+            extra_substitutions=None, use_tmp=False, keep_tmp=False, optimize_dtypes=False,
+            partitioning=None, num_workers=4, segment_size=None, progress_callback=None,
+            validate=False, sample_size=SAMPLE_SIZE, dictionary_columns=None, dry_run=False,
+            timeout=None, cancel=None, **csv_opts):
         """Load file `file` into database table `tablename`.
 
         Parameters
         ----------
         additional_substitutions : list of tuples
             Additional substitutions to perform on the file before loading to database.
+        optimize_dtypes : bool
+            Whether to scan the entire file and use the narrowest column types
+            (see :func:`odbo.schema.optimize_schema`).
+        partitioning : Partitioning | None
+            How to split the table into partitions. Unless the partitioning method is ``KEY``,
+            rows are routed into one file per partition, and partitions are loaded
+            in parallel, using `num_workers` threads.
+        segment_size : int | None
+            If not None, load the file in checkpointed segments of roughly `segment_size`
+            bytes (see :meth:`load_segments_to_database`). Calling `import_file` again
+            after a failure resumes the import at the first unfinished segment,
+            without recreating the table. Requires a transactional `db_engine`.
+        progress_callback : callable | None
+            Function called with an :class:`odbo.progress.Progress` object as the file is
+            formatted ('format') and loaded ('load'), e.g. :class:`odbo.progress.ProgressBar`.
+        validate : bool
+            Whether to check the loaded table against the formatted file
+            (see :meth:`validate_load`), raising :class:`odbo.validation.LoadValidationError`
+            if the number of rows does not match, if values were truncated or could not be
+            converted, or if any of `sample_size` random lines are missing from the table.
+        dictionary_columns : list | bool | None
+            String columns to store as integer codes, or True to choose columns with
+            many repeated values from the first rows of the file (see :mod:`odbo.encoding`).
+            Values are stored in lookup tables, which view ``{tablename}__view`` joins back.
+            Not supported together with `partitioning` or `segment_size`.
+        dry_run : bool
+            If True, do not touch the database. Instead, sample the file and return an
+            :class:`odbo.estimate.ImportEstimate` of the size of the table (for every
+            storage engine) and of the time taken to load it.
+        timeout : float | None
+            Number of seconds that the import may take. External commands (decompressing
+            the file, and loading it with ``mysql``) are killed once the time is up.
+        cancel : odbo.commands.CancellationToken | None
+            Token which stops the import (e.g. when a pool of workers is shut down).
+            If the import is stopped or fails, the partly decompressed file and the partly
+            loaded table are removed (unless the import is checkpointed, see `segment_size`),
+            and :class:`odbo.commands.CancelledError` is raised.
         skiprows : int
             Number of *non-header* rows to ignore.
             If your file does not have a header and you want to skip 0 rows, use skiprows=-1.
         vargs : dict
             Options to pass to `pd.read_csv`.
         """
-        if extra_substitutions is None:
-            extra_substitutions = []
+        extra_substitutions = get_sed_substitutions(file, extra_substitutions)
 
         # Default parameters
-        csv_opts['sep'] = csv_opts.get('sep', '\t')
-        csv_opts['na_values'] = csv_opts.get('na_values', ['', '\\N', '.', 'na'])
-        if isinstance(csv_opts['na_values'], str):
-            csv_opts['na_values'] = [csv_opts['na_values']]
-        csv_opts['quotechar'] = csv_opts.get('quotechar', '"')
-        csv_opts['quoting'] = csv_opts.get('quoting', csv.QUOTE_MINIMAL)
+        _set_default_csv_opts(csv_opts)
 
         tablename = tablename if tablename else get_tablename(file)
+        if dry_run:
+            return self._estimate_import(
+                file, tablename, dtypes, extra_dtypes, extra_substitutions, optimize_dtypes,
+                csv_opts)
+        resume = segment_size is not None and not self.get_load_progress(tablename).empty
 
-        if '.vcf' in op.basename(file).lower():
-            extra_substitutions.append('/^##/d')
-        outfile = decompress(
-            infile=file, sep=csv_opts['sep'], na_values=csv_opts['na_values'],
-            extra_substitutions=extra_substitutions, use_tmp=use_tmp)
+        self._check_import_options(
+            partitioning, segment_size, optimize_dtypes, dictionary_columns)
+        cancel = CancellationToken(timeout, parent=cancel)
+        if self.transport is not None:
+            return self._import_remote_file(
+                file, tablename, dtypes, extra_dtypes, extra_substitutions, csv_opts,
+                progress_callback, validate, cancel)
+        # Records are counted while the file is formatted, rather than by reading it again
+        counter = Counter() if validate else None
+        # Measured throughput is used to estimate how long later imports take
+        with ThroughputTimer('decompress', lambda: op.getsize(outfile)):
+            outfile = decompress(
+                infile=file, sep=csv_opts['sep'], na_values=csv_opts['na_values'],
+                extra_substitutions=extra_substitutions, use_tmp=use_tmp or resume,
+                progress=make_progress('format', op.getsize(file), progress_callback),
+                cancel=cancel, counter=counter,
+                quotechar=_get_record_quotechar(csv_opts['quotechar'], csv_opts['quoting']))
+        load_progress = make_progress('load', op.getsize(outfile), progress_callback)
 
-        # Get column types and create a dataframe
-        if dtypes is None:
-            df, dtypes = get_file_dtypes(outfile, **csv_opts)
-            df.columns = format_columns(df.columns)
-            dtypes = {format_columns(k): v for k, v in dtypes.items()}
-            if extra_dtypes:
-                if set(extra_dtypes.keys()) - set(dtypes.keys()):
-                    logger.warning(
-                        "The following dtypes were not applied: ({})"
-                        .format(set(extra_dtypes.keys()) - set(dtypes.keys())))
-                dtypes = {**dtypes, **extra_dtypes}
+        if resume:
+            logger.info("Resuming the import of '{}' into '{}'...".format(file, tablename))
+            df, dtypes, _ = _get_file_import_dtypes(outfile, dtypes, extra_dtypes, **csv_opts)
         else:
-            df, _ = get_file_dtypes(outfile, nrows=0, **csv_opts)
-            df.columns = format_columns(df.columns)
-
-        self.create_db_table(tablename, df, dtypes)
+            df, dtypes, not_null = _get_file_import_dtypes(
+                outfile, dtypes, extra_dtypes, optimize_dtypes=optimize_dtypes, **csv_opts)
+        encoder = _get_file_dictionary_encoder(outfile, dtypes, dictionary_columns, **csv_opts)
+        cancel.check("Import of '{}'".format(file))
 
-        # Upload file to database
-
-        if csv_opts.get('names') is None:
-            db_skiprows = csv_opts.get('skiprows', 0) + 1  # skip the header
-        else:
-            db_skiprows = csv_opts.get('skiprows', 0)
-        self.load_file_to_database(
-            outfile, tablename, csv_opts['sep'], csv_opts['quotechar'], csv_opts['quoting'],
-            db_skiprows)
+        # Upload file to database (checkpointed imports are resumed instead)
+        with self._dropping_on_failure(tablename, encoder, keep=segment_size is not None):
+            if not resume:
+                self.create_db_table(
+                    tablename, df, encoder.get_dtypes(dtypes), not_null=not_null,
+                    partitioning=partitioning)
+            with ThroughputTimer('load', op.getsize(outfile)):
+                load_warnings = self._load_formatted_file(
+                    outfile, tablename, partitioning, segment_size, num_workers, keep_tmp,
+                    load_progress, csv_opts, encoder, cancel)
+            if encoder.columns:
+                self.create_dictionary_tables(tablename, list(df.columns), encoder, dtypes)
 
+        if validate:
+            # Encoded values are compared through the view
+            self.validate_load(
+                get_view_name(tablename) if encoder.columns else tablename, outfile,
+                list(df.columns), dtypes, load_warnings,
+                _get_db_skiprows(csv_opts), sample_size, csv_opts['sep'],
+                csv_opts['quotechar'], csv_opts['quoting'],
+                expected_rows=(
+                    max(counter['lines'] - _get_db_skiprows(csv_opts), 0)
+                    if 'lines' in counter else None)).check()
         if not keep_tmp:
             try:
                 os.remove(outfile)
             except FileNotFoundError:
                 pass
         return MySQLTable(
-            name=tablename, df=df[0:0], dtypes=dtypes, tempfile=outfile,
+            name=tablename, df=df[0:0], dtypes=encoder.get_dtypes(dtypes), tempfile=outfile,
+            connection_string=self.connection_string, engine=self.engine, datadir=self.datadir)
+
+    def _check_import_options(
+            self, partitioning, segment_size, optimize_dtypes, dictionary_columns):
+        """Make sure that the options of :meth:`import_file` can be used together."""
+        if dictionary_columns and (partitioning is not None or segment_size is not None):
+            raise ValueError(
+                "Dictionary-encoded imports cannot be partitioned or checkpointed!")
+        if self.transport is not None and (
+                partitioning is not None or segment_size is not None or optimize_dtypes or
+                dictionary_columns):
+            raise ValueError(
+                "Partitioned, checkpointed, optimized and dictionary-encoded imports "
+                "are not supported for files on a storage host!")
+        if segment_size is not None:
+            _check_segment_engine(self.db_engine)
+
+    @contextmanager
+    def _dropping_on_failure(self, tablename, encoder, keep=False):
+        """Drop table `tablename`, and its dictionary tables, if it is not loaded completely."""
+        try:
+            yield
+        except BaseException:
+            if not keep:
+                logger.warning("Loading '{}' failed, dropping the table...".format(tablename))
+                if encoder.columns:
+                    self.engine.execute(
+                        'DROP VIEW IF EXISTS `{}`;'.format(get_view_name(tablename)))
+                for name in [tablename] + [
+                        get_lookup_tablename(tablename, c) for c in encoder.columns]:
+                    self.engine.execute('DROP TABLE IF EXISTS `{}`;'.format(name))
+            raise
+
+    def _estimate_import(
+            self, file, tablename, dtypes, extra_dtypes, extra_substitutions, optimize_dtypes,
+            csv_opts):
+        """Estimate the size of table `tablename` and the load time, without loading `file`."""
+        if self.transport is not None:
+            raise ValueError("Dry runs are not supported for files on a storage host!")
+        estimate = estimate_import(
+            file, dtypes, extra_dtypes, optimize_dtypes=optimize_dtypes,
+            extra_substitutions=extra_substitutions, **csv_opts)
+        logger.info("Plan for loading '{}' into '{}':\n{}".format(
+            file, tablename, estimate.format()))
+        return estimate
+
+    def _load_formatted_file(
+            self, outfile, tablename, partitioning, segment_size, num_workers, keep_tmp,
+            load_progress, csv_opts, encoder, cancel=None):
+        """Load `outfile` into `tablename`, by partition, by segment, or all at once.
+
+        Returns
+        -------
+        load_warnings : LoadWarnings
+        """
+        if encoder.columns:
+            dfs = _iter_encoded_chunks(outfile, encoder, progress=load_progress, **csv_opts)
+            return self._load_encoded_dfs(dfs, tablename, encoder, num_workers, cancel)
+        elif partitioning is not None and partitioning.is_routable:
+            partition_files = _split_file(outfile, partitioning, **csv_opts)
+            load_warnings = self.load_partitions_to_database(
+                partition_files, tablename, csv_opts['sep'], csv_opts['quotechar'],
+                csv_opts['quoting'], num_workers=num_workers, cancel=cancel)
+            if not keep_tmp:
+                for partition_file in partition_files.values():
+                    os.remove(partition_file)
+            return load_warnings
+        elif segment_size is not None:
+            return self.load_segments_to_database(
+                outfile, tablename, csv_opts['sep'], csv_opts['quotechar'],
+                csv_opts['quoting'], _get_db_skiprows(csv_opts), segment_size,
+                progress=load_progress, cancel=cancel)
+        else:
+            return self.load_file_to_database(
+                outfile, tablename, csv_opts['sep'], csv_opts['quotechar'],
+                csv_opts['quoting'], _get_db_skiprows(csv_opts), progress=load_progress,
+                cancel=cancel)
+
+    def _load_encoded_dfs(self, dfs, tablename, encoder, num_workers, cancel=None):
+        """Load dictionary-encoded `dfs` into `tablename`, widening the columns of codes
+        whenever a column has more distinct values than its codes can hold.
+
+        Columns are chosen from the start of the file, so a column can turn out to have
+        many more distinct values than expected.
+        """
+        code_dtypes = {column: encoder.code_dtype for column in encoder.columns}
+        load_warnings = []
+        for widened_dtypes, run in _iter_runs(dfs, code_dtypes, lambda df: df[encoder.columns]):
+            if widened_dtypes:
+                logger.info("Widening columns of codes: {}".format(widened_dtypes))
+                self.alter_columns(tablename, widened_dtypes)
+            load_warnings.append(
+                self.load_dfs_to_database(run, tablename, num_workers, cancel=cancel))
+        return LoadWarnings.merge(load_warnings)
+
+    def _import_remote_file(
+            self, file, tablename, dtypes, extra_dtypes, extra_substitutions, csv_opts,
+            progress_callback=None, validate=False, cancel=None):
+        """Decompress and format `file` on the storage host, and stream it into the database.
+
+        Column types are inferred from the first block of formatted lines, and are widened
+        when later blocks do not fit into them (``LOAD DATA LOCAL`` would truncate such values
+        with a warning).
+        The formatting command and the load are stopped when `cancel` is cancelled, and the
+        partly loaded table is dropped.
+        If `validate` is True, the number of rows in the table is compared with the number
+        of lines streamed, and warnings are checked (the file is not sampled).
+        """
+        format_command = (
+            get_format_command(
+                file, csv_opts['sep'], csv_opts['na_values'], extra_substitutions) or
+            "cat '{}'".format(file))
+        chunks = self.transport.iter_output(format_command, cancel=cancel)
+        progress = make_progress('load', None, progress_callback)
+        if progress is not None:
+            chunks = iter_progress(chunks, progress)
+        counter = Counter()
+        chunks = iter_count_lines(
+            chunks, counter, csv_opts['sep'],
+            _get_record_quotechar(csv_opts['quotechar'], csv_opts['quoting']))
+        first_chunk = next(chunks, b'')
+        df, inferred_dtypes = _get_chunk_dtypes(first_chunk, **csv_opts)
+        dtypes = dict(dtypes) if dtypes is not None else _update_dtypes(
+            inferred_dtypes, extra_dtypes)
+        with self._dropping_on_failure(tablename, DictionaryEncoder([])):
+            self.create_db_table(tablename, df, dtypes)
+            blocks = _iter_skip_lines(
+                _chain_chunks(first_chunk, chunks), _get_db_skiprows(csv_opts))
+            load_warnings = []
+            for widened_dtypes, run in _iter_block_runs(
+                    blocks, list(df.columns), dtypes, **csv_opts):
+                if widened_dtypes:
+                    logger.info("Widening columns: {}".format(widened_dtypes))
+                    self.alter_columns(tablename, widened_dtypes)
+                load_warnings.append(self.load_chunks_to_database(
+                    run, tablename, csv_opts['sep'], csv_opts['quotechar'], csv_opts['quoting'],
+                    skiprows=0, cancel=cancel))
+        load_warnings = LoadWarnings.merge(load_warnings)
+        if validate:
+            LoadReport(
+                tablename, file,
+                expected_rows=max(counter['lines'] - _get_db_skiprows(csv_opts), 0),
+                num_rows=self._count_rows(tablename),
+                load_warnings=load_warnings).check()
+        return MySQLTable(
+            name=tablename, df=df[0:0], dtypes=dtypes, tempfile=None,
+            connection_string=self.connection_string, engine=self.engine, datadir=self.datadir)
+
+    def create_dictionary_tables(self, tablename, columns, encoder, dtypes):
+        """Create a lookup table for every column encoded by `encoder`, and a view of table
+        `tablename` which replaces codes with their values (see :mod:`odbo.encoding`).
+
+        Parameters
+        ----------
+        columns : list
+            Columns of the table, in order.
+        dtypes : dict
+            Column types of the values, before they were encoded.
+
+        Returns
+        -------
+        view_name : str
+        """
+        for column in encoder.columns:
+            lookup_tablename = get_lookup_tablename(tablename, column)
+            lookup_table = self.import_df(
+                encoder.get_lookup_df(column), lookup_tablename,
+                extra_dtypes={'id': encoder.code_dtype, 'value': dtypes[column]},
+                chunksize=100000)
+            lookup_table.create_indexes([], primary_key='id')
+        view_name = get_view_name(tablename)
+        view_query = get_view_query(tablename, columns, encoder.columns)
+        self.engine.execute('CREATE OR REPLACE VIEW `{}` AS {};'.format(
+            view_name, view_query.compile(dialect=self.engine.dialect)))
+        logger.info("Created view '{}' of table '{}'.".format(view_name, tablename))
+        return view_name
+
+    def get_table(self, tablename):
+        """Return existing table `tablename`, with column types read from the database."""
+        dtypes = {c['name']: c['type'] for c in sa.inspect(self.engine).get_columns(tablename)}
+        return MySQLTable(
+            name=tablename, df=pd.DataFrame(columns=list(dtypes)), dtypes=dtypes, tempfile=None,
             connection_string=self.connection_string, engine=self.engine, datadir=self.datadir)
 
+    def import_snapshot(
+            self, snapshot_dir, tablename=None, if_exists='replace', link=False, verify=True):
+        """Attach a table snapshot (see :meth:`MySQLTable.export_snapshot`) to this server.
+
+        Table files are copied into the data directory of the server, which has to be
+        accessible from this host, and writable by the server.
+
+        Parameters
+        ----------
+        tablename : str | None
+            Name of the table. If None, use the name of the table that was exported.
+        if_exists : str
+            What to do if the table already exists ('replace' or 'fail').
+        link : bool
+            Whether to hard link the files instead of copying them.
+        verify : bool
+            Whether to check the files against their checksums before attaching them.
+
+        Raises
+        ------
+        odbo.snapshot.SnapshotError
+            If the files of the snapshot do not match the manifest, or if files of a
+            table with the same name are already in the data directory.
+        """
+        if self.datadir is None:
+            raise ValueError("Importing a snapshot requires the data directory of the server!")
+        manifest = read_manifest(snapshot_dir)
+        if verify:
+            verify_files(snapshot_dir, manifest['files'])
+        source_tablename = manifest['tablename']
+        tablename = tablename if tablename else source_tablename
+        db_schema = parse_connection_string(self.connection_string)['db_schema']
+        self._prepare_snapshot_import(tablename, source_tablename, if_exists)
+        table_dir = op.join(self.datadir, db_schema)
+        existing_files = [f for f in manifest['files'] if op.exists(op.join(table_dir, f))]
+        if existing_files:
+            raise SnapshotError(
+                "Files {} already exist in '{}'!".format(existing_files, table_dir))
+        copy_files(snapshot_dir, table_dir, manifest['files'], link=link, checksum=False)
+        # MySQL 8 keeps table definitions in its data dictionary
+        sdi_files = [op.join(table_dir, f) for f in manifest['files'] if f.endswith('.sdi')]
+        if sdi_files:
+            self.engine.execute('IMPORT TABLE FROM {};'.format(
+                ', '.join("'{}'".format(f) for f in sdi_files)))
+        self.engine.execute('FLUSH TABLES;')
+        if tablename != source_tablename:
+            self.engine.execute(
+                'RENAME TABLE `{}` TO `{}`;'.format(source_tablename, tablename))
+        return self.get_table(tablename)
+
+    def _prepare_snapshot_import(self, tablename, source_tablename, if_exists):
+        """Drop table `tablename` if it should be replaced by a snapshot of `source_tablename`."""
+        table_names = set(sa.inspect(self.engine).get_table_names())
+        if tablename in table_names:
+            if if_exists != 'replace':
+                raise ValueError("Table '{}' already exists!".format(tablename))
+            self.engine.execute('DROP TABLE `{}`;'.format(tablename))
+        if tablename != source_tablename and source_tablename in table_names:
+            raise ValueError(
+                "Cannot import a snapshot of table '{}' as '{}', because table '{}' exists!"
+                .format(source_tablename, tablename, source_tablename))
+
     def import_df(
             self, df, tablename=None, dtypes=None, extra_dtypes=None, use_temp_file=True,
-            if_exists='replace', force=True):
+            if_exists='replace', force=True, optimize_dtypes=False, partitioning=None,
+            chunksize=None, num_workers=2, max_pending=4, dictionary_columns=None):
         """Load dataframe `df` into database table `tablename`.
 
         Parameters
@@ -210,19 +1292,45 @@ fields terminated by {sep} {quoting} ignore {skiprows} lines; \
             Whether to save data to a .tsv file first, or import directly.
         if_exists : str
             What to do if the specified table already exists in the database.
+        optimize_dtypes : bool
+            Whether to use the narrowest column types (see :func:`odbo.schema.optimize_schema`).
+        partitioning : Partitioning | None
+            How to split the table into partitions.
+        chunksize : int | None
+            If given, stream `df` into the database `chunksize` rows at a time, instead of
+            saving it to a .tsv file first (see :meth:`load_df_to_database`).
+            Use this for dataframes which are too large to be serialized all at once.
+        num_workers : int
+            Number of threads serializing blocks of rows, if `chunksize` is given.
+        max_pending : int
+            Maximum number of serialized blocks held in memory, if `chunksize` is given.
+        dictionary_columns : list | bool | None
+            String columns to store as integer codes, or True to choose them automatically
+            (see :meth:`import_file`).
         """
         # Make sure there are no duplicate columns silently screwing everything up
-        column_counts = Counter(df.columns)
-        duplicate_columns = [x for x in column_counts.items() if x[1] > 1]
-        if duplicate_columns:
-            raise Exception("The following columns have duplicates: {}".format(duplicate_columns))
+        _check_duplicate_columns(df)
         # Sniff out column dtypes and create a db table
-        dtypes = get_df_dtypes(df)
+        dtypes = _get_df_dtypes(df)
+        not_null = None
+        if optimize_dtypes:
+            dtypes, not_null, report = optimize_schema([df], dtypes)
+            logger.info("Optimized column types:\n{}".format(report))
         if extra_dtypes:
             dtypes = {**dtypes, **extra_dtypes}
-        self.create_db_table(tablename, df, dtypes, empty=use_temp_file, if_exists=if_exists)
-        # If `use_temp_file`, save a .tsv file and load it into the database
-        if use_temp_file:
+        encoder = _get_dictionary_encoder(df, dtypes, dictionary_columns)
+        if encoder.columns:
+            # The type of the codes depends on the number of distinct values
+            df = encoder.encode(df)
+            value_dtypes, dtypes = dtypes, encoder.get_dtypes(dtypes)
+        self.create_db_table(
+            tablename, df, dtypes, empty=use_temp_file, if_exists=if_exists, not_null=not_null,
+            partitioning=partitioning)
+        # If `use_temp_file`, save a .tsv file (or stream blocks of it) into the database
+        if use_temp_file and chunksize is not None:
+            self.load_df_to_database(df, tablename, chunksize, num_workers, max_pending)
+            tsv_file = None
+        elif use_temp_file:
             tsv_file = op.abspath(op.join(self.shared_folder, tablename + '.tsv'))
             if op.isfile(tsv_file) and not force:
                 logger.info("tempfile already exists: {}".format(tsv_file))
@@ -231,6 +1339,910 @@ fields terminated by {sep} {quoting} ignore {skiprows} lines; \
             self.load_file_to_database(tsv_file, tablename, '\t', skiprows=1)
         else:
             tsv_file = None
+        if encoder.columns:
+            self.create_dictionary_tables(tablename, list(df.columns), encoder, value_dtypes)
         return MySQLTable(
             name=tablename, df=df[0:0], dtypes=dtypes, tempfile=tsv_file,
             connection_string=self.connection_string, engine=self.engine, datadir=self.datadir)
+
+    def import_df_chunks(
+            self, dfs, tablename, dtypes=None, extra_dtypes=None, if_exists='replace',
+            infer_chunks=1, num_workers=2, max_pending=4):
+        """Load an iterable of dataframes `dfs` into database table `tablename`.
+
+        Column types are inferred from the first `infer_chunks` dataframes. Columns are
+        widened (e.g. ``INTEGER`` to ``BIGINT``, ``VARCHAR(32)`` to ``TEXT``) when later
+        dataframes do not fit into them, so the whole dataset is never held in memory.
+
+        Parameters
+        ----------
+        dfs : iterable of DataFrames
+            Chunks of data (e.g. from ``pd.read_csv(..., chunksize=...)``),
+            with the same columns.
+        tablename : str
+            Name of the table to create in the database.
+        if_exists : str
+            What to do if the specified table already exists in the database.
+        infer_chunks : int
+            Number of dataframes used to infer column types.
+        num_workers : int
+            Number of threads serializing dataframes (see :meth:`load_dfs_to_database`).
+        max_pending : int
+            Maximum number of serialized dataframes held in memory.
+        """
+        first_dfs, dfs = _peek_chunks(dfs, infer_chunks)
+        df = pd.concat(first_dfs)
+        _check_duplicate_columns(df)
+        if dtypes is None:
+            dtypes = _get_df_dtypes(df)
+        dtypes = _update_dtypes(dtypes, extra_dtypes)
+        self.create_db_table(tablename, df, dtypes, if_exists=if_exists)
+        for widened_dtypes, run in _iter_chunk_runs(dfs, list(df.columns), dtypes):
+            if widened_dtypes:
+                logger.info("Widening columns: {}".format(widened_dtypes))
+                self.alter_columns(tablename, widened_dtypes)
+            self.load_dfs_to_database(run, tablename, num_workers, max_pending)
+        return MySQLTable(
+            name=tablename, df=df[0:0], dtypes=dtypes, tempfile=None,
+            connection_string=self.connection_string, engine=self.engine, datadir=self.datadir)
+
+    def import_vcf(
+            self, file, tablename=None, info_fields=True, keep_info=False, extra_dtypes=None,
+            if_exists='replace', chunksize=100000, num_workers=2, max_pending=4):
+        """Load VCF file `file` into database table `tablename`, parsing it natively.
+
+        Unlike :meth:`import_file`, INFO fields declared in the header can be stored in
+        typed columns of their own, which can be indexed. Data is streamed into the
+        database as it is parsed (see :meth:`import_df_chunks`).
+
+        Parameters
+        ----------
+        file : str
+            VCF file, optionally compressed (``.gz``, ``.bz2`` or ``.xz``).
+        info_fields : list | bool | None
+            IDs of the INFO fields to store in columns of their own, True for all
+            fields declared in the header, or None to keep INFO as a single column.
+        keep_info : bool
+            Whether to keep the INFO column when `info_fields` are stored in columns of their own.
+        chunksize : int
+            Number of lines to parse at a time.
+        """
+        tablename = tablename if tablename else get_tablename(file)
+        dtypes, dfs = _read_vcf_chunks(file, info_fields, keep_info, chunksize)
+        return self.import_df_chunks(
+            dfs, tablename, dtypes, extra_dtypes, if_exists=if_exists,
+            num_workers=num_workers, max_pending=max_pending)
+
+    def import_fwf(
+            self, file, tablename=None, colspecs='infer', names=None, skiprows=0,
+            na_values=None, extra_dtypes=None, if_exists='replace', chunksize=100000,
+            num_workers=2, max_pending=4):
+        """Load fixed-width file `file` into database table `tablename`.
+
+        The file is parsed `chunksize` lines at a time, and every chunk is streamed into the
+        database as it is parsed (see :meth:`import_df_chunks`), so the file is never
+        converted to CSV or held in memory.
+
+        Parameters
+        ----------
+        file : str
+            Fixed-width file, optionally compressed (``.gz``, ``.bz2`` or ``.xz``).
+        colspecs : list | str
+            ``(start, end)`` offsets of every column, or ``'infer'`` to infer them from
+            the first lines of the file (see :func:`odbo.readers.read_fwf`).
+        names : list | None
+            Column names. If None, column names are read from the first line.
+        """
+        tablename = tablename if tablename else get_tablename(strip_extension(file))
+        _, dfs = read_fwf(file, colspecs, names, skiprows, na_values, chunksize=chunksize)
+        return self.import_df_chunks(
+            dfs, tablename, None, extra_dtypes, if_exists=if_exists,
+            num_workers=num_workers, max_pending=max_pending)
+
+    def import_xlsx(
+            self, file, tablename=None, sheet_name=None, skiprows=0, extra_dtypes=None,
+            if_exists='replace', chunksize=100000, num_workers=2, max_pending=4):
+        """Load worksheet `sheet_name` of Excel file `file` into database table `tablename`.
+
+        Rows are read from the workbook in read-only mode (using ``openpyxl``), and streamed
+        into the database `chunksize` rows at a time (see :meth:`import_df_chunks`).
+
+        Parameters
+        ----------
+        sheet_name : str | None
+            Name of the worksheet. Defaults to the active worksheet.
+        skiprows : int
+            Number of rows to skip before the header row.
+        """
+        tablename = tablename if tablename else get_tablename(strip_extension(file))
+        _, dfs = read_xlsx(file, sheet_name, skiprows, chunksize)
+        return self.import_df_chunks(
+            dfs, tablename, None, extra_dtypes, if_exists=if_exists,
+            num_workers=num_workers, max_pending=max_pending)
+
+
+# === PostgreSQL ===
+
+#: Number of bytes that `psycopg2` sends to the server in one message during ``COPY``
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+class PostgresConnection(_Connection):
+    """Load and save data from a PostgreSQL database using ``COPY ... FROM STDIN``.
+
+    Formatted data is streamed straight into the database, without intermediary files.
+    """
+
+    def __init__(
+            self, connection_string, shared_folder, storage_host, datadir=None, echo=False,
+            pool_size=POOL_SIZE, pool_pre_ping=True):
+        self.connection_string = connection_string
+        self.shared_folder = op.abspath(shared_folder)
+        os.makedirs(self.shared_folder, exist_ok=True)
+        self.storage_host = storage_host
+        self.datadir = datadir
+        #
+        logger.debug("Connection string: {}".format(repr(self.connection_string)))
+        self.engine = get_engine(
+            self.connection_string, echo=echo, pool_size=pool_size, pool_pre_ping=pool_pre_ping)
+        try:
+            self.db_schema = self._get_db_schema()
+        except sa.exc.OperationalError:
+            db_url = sa.engine.url.make_url(connection_string)
+            _schema = db_url.database
+            _connection_string = str(db_url.set(database='postgres'))
+            logger.debug("_connection_string: {}".format(_connection_string))
+            # CREATE DATABASE cannot run inside a transaction
+            with get_engine(_connection_string, echo=echo).connect() as connection:
+                connection.execution_options(isolation_level='AUTOCOMMIT').execute(
+                    'CREATE DATABASE "{}"'.format(_schema))
+            self.db_schema = self._get_db_schema(refresh=True)
+
+    def _get_db_schema(self, refresh=False):
+        return get_databases(self.engine, 'SELECT datname FROM pg_database;', refresh=refresh)
+
+    @retry_database
+    def create_db_table(
+            self, tablename, df, dtypes, empty=True, if_exists='replace'):
+        """Create a table `tablename` in the database.
+
+        If `empty` == True, do not load any data. Otherwise,
+        load the entire `df` into the created table.
+        """
+        if empty:
+            df = df[:0]
+        dtypes = get_generic_dtypes(dtypes, varchar_as_text=True)
+        df.to_sql(tablename, self.engine, dtype=dtypes, index=False, if_exists=if_exists)
+
+    def load_chunks_to_database(
+            self, chunks, tablename, sep, quotechar='"', quoting=csv.QUOTE_MINIMAL,
+            skiprows=1):
+        r"""Stream an iterable of formatted data blocks into table `tablename`.
+
+        Parameters
+        ----------
+        chunks : iterable of bytes
+            Blocks of complete lines, with nulls represented as ``\N``.
+        skiprows : int
+            Number of lines to skip at the beginning of the data (including the header).
+        """
+        logger.debug("Loading data into PostgreSQL table: '{}'...".format(tablename))
+        copy_command = _get_copy_command(tablename, sep, quotechar, quoting)
+        logger.debug(copy_command)
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.copy_expert(
+                copy_command, _ChunkReader(_iter_skip_lines(chunks, skiprows)),
+                size=COPY_BUFFER_SIZE)
+            connection.commit()
+        finally:
+            connection.close()
+
+    def load_file_to_database(
+            self, tsv_filepath, tablename, sep, quotechar='"', quoting=csv.QUOTE_MINIMAL,
+            skiprows=1):
+        chunks = iter_decompress(tsv_filepath, sep)
+        self.load_chunks_to_database(chunks, tablename, sep, quotechar, quoting, skiprows)
+
+    def import_file(
+            self, file, tablename=None, dtypes=None, extra_dtypes=None,
+            extra_substitutions=None, **csv_opts):
+        """Load file `file` into database table `tablename`.
+
+        The file is decompressed and formatted on the fly and is streamed straight into
+        the database. Column types are inferred from the first block of the file, and are
+        widened when later blocks do not fit into them.
+
+        Parameters
+        ----------
+        extra_substitutions : list of tuples
+            Additional ``(regex, replacement)`` substitutions to perform on the file
+            before loading to database.
+        skiprows : int
+            Number of *non-header* rows to ignore.
+        vargs : dict
+            Options to pass to `pd.read_csv`.
+        """
+        # Default parameters
+        _set_default_csv_opts(csv_opts)
+
+        tablename = tablename if tablename else get_tablename(file)
+
+        df, inferred_dtypes, chunks = _stream_file(file, extra_substitutions, **csv_opts)
+        dtypes = dict(dtypes) if dtypes is not None else _update_dtypes(
+            inferred_dtypes, extra_dtypes)
+
+        self.create_db_table(tablename, df, dtypes)
+
+        # Stream file to database, widening the columns whenever a block does not fit
+        # (``COPY`` rejects values which do not match the column types)
+        blocks = _iter_skip_lines(chunks, _get_db_skiprows(csv_opts))
+        for widened_dtypes, run in _iter_block_runs(
+                blocks, list(df.columns), dtypes, **csv_opts):
+            if widened_dtypes:
+                logger.info("Widening columns: {}".format(widened_dtypes))
+                self.alter_columns(tablename, widened_dtypes)
+            self.load_chunks_to_database(
+                run, tablename, csv_opts['sep'], csv_opts['quotechar'], csv_opts['quoting'],
+                skiprows=0)
+
+        return PostgresTable(
+            name=tablename, df=df[0:0], dtypes=dtypes, tempfile=None,
+            connection_string=self.connection_string, engine=self.engine, datadir=self.datadir)
+
+    def import_df(
+            self, df, tablename=None, dtypes=None, extra_dtypes=None, if_exists='replace',
+            chunksize=100000):
+        """Load dataframe `df` into database table `tablename`.
+
+        Parameters
+        ----------
+        df : DataFrame
+            Need this to guess the columns types.
+        tablename : str
+            Name of the table to create in the database.
+        if_exists : str
+            What to do if the specified table already exists in the database.
+        chunksize : int
+            Number of rows to serialize and send to the database at a time.
+        """
+        _check_duplicate_columns(df)
+        # Sniff out column dtypes and create a db table
+        if dtypes is None:
+            dtypes = _get_df_dtypes(df)
+        if extra_dtypes:
+            dtypes = {**dtypes, **extra_dtypes}
+        self.create_db_table(tablename, df, dtypes, if_exists=if_exists)
+        # Stream the dataframe to the database, `chunksize` rows at a time
+        csv_opts = {**MYSQL_CSV_OPTS, 'header': False}
+        chunks = (
+            df[i:i + chunksize].to_csv(**csv_opts).encode('utf-8')
+            for i in range(0, len(df), chunksize)
+        )
+        self.load_chunks_to_database(chunks, tablename, '\t', skiprows=0)
+        return PostgresTable(
+            name=tablename, df=df[0:0], dtypes=dtypes, tempfile=None,
+            connection_string=self.connection_string, engine=self.engine, datadir=self.datadir)
+
+    def import_df_chunks(
+            self, dfs, tablename, dtypes=None, extra_dtypes=None, if_exists='replace',
+            infer_chunks=1):
+        """Load an iterable of dataframes `dfs` into database table `tablename`.
+
+        Column types are inferred from the first `infer_chunks` dataframes, and are widened
+        when later dataframes do not fit into them
+        (see :meth:`MySQLConnection.import_df_chunks`).
+        """
+        first_dfs, dfs = _peek_chunks(dfs, infer_chunks)
+        df = pd.concat(first_dfs)
+        _check_duplicate_columns(df)
+        if dtypes is None:
+            dtypes = _get_df_dtypes(df)
+        dtypes = _update_dtypes(dtypes, extra_dtypes)
+        self.create_db_table(tablename, df, dtypes, if_exists=if_exists)
+        csv_opts = {**MYSQL_CSV_OPTS, 'header': False}
+        for widened_dtypes, run in _iter_chunk_runs(dfs, list(df.columns), dtypes):
+            if widened_dtypes:
+                logger.info("Widening columns: {}".format(widened_dtypes))
+                self.alter_columns(tablename, widened_dtypes)
+            chunks = (df.to_csv(**csv_opts).encode('utf-8') for df in run)
+            self.load_chunks_to_database(chunks, tablename, '\t', skiprows=0)
+        return PostgresTable(
+            name=tablename, df=df[0:0], dtypes=dtypes, tempfile=None,
+            connection_string=self.connection_string, engine=self.engine, datadir=self.datadir)
+
+    def import_vcf(
+            self, file, tablename=None, info_fields=True, keep_info=False, extra_dtypes=None,
+            if_exists='replace', chunksize=100000):
+        """Load VCF file `file` into database table `tablename`, parsing it natively
+        (see :meth:`MySQLConnection.import_vcf`).
+        """
+        tablename = tablename if tablename else get_tablename(file)
+        dtypes, dfs = _read_vcf_chunks(file, info_fields, keep_info, chunksize)
+        return self.import_df_chunks(dfs, tablename, dtypes, extra_dtypes, if_exists=if_exists)
+
+    def import_fwf(
+            self, file, tablename=None, colspecs='infer', names=None, skiprows=0,
+            na_values=None, extra_dtypes=None, if_exists='replace', chunksize=100000):
+        """Load fixed-width file `file` into database table `tablename`, streaming it in chunks
+        (see :meth:`MySQLConnection.import_fwf`).
+        """
+        tablename = tablename if tablename else get_tablename(strip_extension(file))
+        _, dfs = read_fwf(file, colspecs, names, skiprows, na_values, chunksize=chunksize)
+        return self.import_df_chunks(dfs, tablename, None, extra_dtypes, if_exists=if_exists)
+
+    def import_xlsx(
+            self, file, tablename=None, sheet_name=None, skiprows=0, extra_dtypes=None,
+            if_exists='replace', chunksize=100000):
+        """Load worksheet `sheet_name` of Excel file `file` into database table `tablename`,
+        streaming it in chunks (see :meth:`MySQLConnection.import_xlsx`).
+        """
+        tablename = tablename if tablename else get_tablename(strip_extension(file))
+        _, dfs = read_xlsx(file, sheet_name, skiprows, chunksize)
+        return self.import_df_chunks(dfs, tablename, None, extra_dtypes, if_exists=if_exists)
+
+    @retry_database
+    def alter_columns(self, tablename, dtypes):
+        """Change the types of columns in table `tablename` to `dtypes`."""
+        dtypes = get_generic_dtypes(dtypes, varchar_as_text=True)
+        self.engine.execute(
+            'ALTER TABLE "{tablename}" {alter_columns};'.format(
+                tablename=tablename,
+                alter_columns=', '.join(
+                    'ALTER COLUMN "{0}" TYPE {1} USING "{0}"::{1}'.format(
+                        column, dtype.compile(dialect=self.engine.dialect))
+                    for column, dtype in dtypes.items())))
+
+
+def _get_copy_command(tablename, sep, quotechar='"', quoting=csv.QUOTE_MINIMAL):
+    r"""Return a ``COPY`` command which loads MySQL-formatted data from STDIN.
+
+    Examples
+    --------
+    >>> print(_get_copy_command('my_table', '\t'))
+    COPY "my_table" FROM STDIN WITH (FORMAT csv, DELIMITER E'\t', NULL E'\\N', QUOTE E'"')
+    >>> print(_get_copy_command('my_table', ',', quoting=csv.QUOTE_NONE))
+    COPY "my_table" FROM STDIN WITH (FORMAT text, DELIMITER E',', NULL E'\\N')
+    """
+    if quoting == csv.QUOTE_NONE:
+        options = "FORMAT text, DELIMITER {}, NULL {}".format(
+            _pg_literal(sep), _pg_literal('\\N'))
+    else:
+        options = "FORMAT csv, DELIMITER {}, NULL {}, QUOTE {}".format(
+            _pg_literal(sep), _pg_literal('\\N'), _pg_literal(quotechar))
+    return 'COPY "{}" FROM STDIN WITH ({})'.format(tablename, options)
+
+
+def _pg_literal(value):
+    """Format `value` as a PostgreSQL escape string constant."""
+    return "E'{}'".format(value.encode('unicode_escape').decode().replace("'", "\\'"))
+
+
+# === SQLite ===
+
+#: Pragmas which speed up bulk loading at the expense of crash safety
+SQLITE_BULK_LOAD_PRAGMAS = {
+    'journal_mode': 'OFF',
+    'synchronous': 'OFF',
+}
+
+
+class SQLiteConnection(_Connection):
+    """Load data into a single-file SQLite database, without running a database server.
+
+    Rows are parsed on the fly and inserted using ``executemany``, ``batchsize`` rows at
+    a time, inside a single transaction.
+    """
+
+    def __init__(
+            self, connection_string, shared_folder, storage_host=None, datadir=None,
+            echo=False, batchsize=100000):
+        self.connection_string = connection_string
+        self.shared_folder = op.abspath(shared_folder)
+        os.makedirs(self.shared_folder, exist_ok=True)
+        self.storage_host = storage_host
+        self.datadir = datadir
+        self.batchsize = batchsize
+        #
+        logger.debug("Connection string: {}".format(repr(self.connection_string)))
+        self.engine = get_engine(self.connection_string, echo=echo)
+
+    @retry_database
+    def create_db_table(
+            self, tablename, df, dtypes, empty=True, if_exists='replace'):
+        """Create a table `tablename` in the database.
+
+        If `empty` == True, do not load any data. Otherwise,
+        load the entire `df` into the created table.
+        """
+        if empty:
+            df = df[:0]
+        dtypes = get_generic_dtypes(dtypes)
+        df.to_sql(tablename, self.engine, dtype=dtypes, index=False, if_exists=if_exists)
+
+    def insert_rows(self, tablename, rows):
+        """Insert an iterable of row tuples into table `tablename`.
+
+        The pragmas in `SQLITE_BULK_LOAD_PRAGMAS` are in effect for the duration of the load.
+        """
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            columns = cursor.execute('PRAGMA table_info("{}")'.format(tablename)).fetchall()
+            sql_command = 'INSERT INTO "{}" VALUES ({})'.format(
+                tablename, ', '.join(['?'] * len(columns)))
+            # Pragmas can not be changed inside a transaction
+            pragmas = {
+                key: cursor.execute('PRAGMA {}'.format(key)).fetchone()[0]
+                for key in SQLITE_BULK_LOAD_PRAGMAS
+            }
+            for key, value in SQLITE_BULK_LOAD_PRAGMAS.items():
+                cursor.execute('PRAGMA {} = {}'.format(key, value))
+            try:
+                rows = iter(rows)
+                while True:
+                    batch = list(itertools.islice(rows, self.batchsize))
+                    if not batch:
+                        break
+                    cursor.executemany(sql_command, batch)
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                for key, value in pragmas.items():
+                    cursor.execute('PRAGMA {} = {}'.format(key, value))
+        finally:
+            connection.close()
+
+    def load_chunks_to_database(
+            self, chunks, tablename, sep, quotechar='"', quoting=csv.QUOTE_MINIMAL,
+            skiprows=1):
+        r"""Parse an iterable of formatted data blocks and insert them into `tablename`.
+
+        Parameters
+        ----------
+        chunks : iterable of bytes
+            Blocks of complete lines, with nulls represented as ``\N``.
+        skiprows : int
+            Number of lines to skip at the beginning of the data (including the header).
+        """
+        logger.debug("Loading data into SQLite table: '{}'...".format(tablename))
+        rows = _iter_rows(
+            _iter_skip_lines(chunks, skiprows), delimiter=sep, quotechar=quotechar,
+            quoting=csv.QUOTE_NONE if quoting == csv.QUOTE_NONE else csv.QUOTE_MINIMAL)
+        self.insert_rows(tablename, rows)
+
+    def load_file_to_database(
+            self, tsv_filepath, tablename, sep, quotechar='"', quoting=csv.QUOTE_MINIMAL,
+            skiprows=1):
+        chunks = iter_decompress(tsv_filepath, sep)
+        self.load_chunks_to_database(chunks, tablename, sep, quotechar, quoting, skiprows)
+
+    def import_file(
+            self, file, tablename=None, dtypes=None, extra_dtypes=None,
+            extra_substitutions=None, index_commands=None, vacuum=True, **csv_opts):
+        """Load file `file` into database table `tablename`.
+
+        The file is decompressed and formatted on the fly, and indexes are created only
+        after all the data has been loaded.
+
+        Parameters
+        ----------
+        extra_substitutions : list of tuples
+            Additional ``(regex, replacement)`` substitutions to perform on the file
+            before loading to database.
+        index_commands : list of tuples
+            ``(columns, unique)`` tuples describing the indexes to create.
+        vacuum : bool
+            Whether to ``VACUUM`` the database once the table has been loaded.
+        skiprows : int
+            Number of *non-header* rows to ignore.
+        vargs : dict
+            Options to pass to `pd.read_csv`.
+        """
+        # Default parameters
+        _set_default_csv_opts(csv_opts)
+
+        tablename = tablename if tablename else get_tablename(file)
+
+        df, inferred_dtypes, chunks = _stream_file(file, extra_substitutions, **csv_opts)
+        if dtypes is None:
+            dtypes = _update_dtypes(inferred_dtypes, extra_dtypes)
+
+        self.create_db_table(tablename, df, dtypes)
+
+        # Stream file to database
+        self.load_chunks_to_database(
+            chunks, tablename, csv_opts['sep'], csv_opts['quotechar'], csv_opts['quoting'],
+            _get_db_skiprows(csv_opts))
+
+        table = SQLiteTable(
+            name=tablename, df=df[0:0], dtypes=dtypes, tempfile=None,
+            connection_string=self.connection_string, engine=self.engine, datadir=self.datadir)
+        self._finalize_table(table, index_commands, vacuum)
+        return table
+
+    def import_df(
+            self, df, tablename=None, dtypes=None, extra_dtypes=None, if_exists='replace',
+            index_commands=None, vacuum=True):
+        """Load dataframe `df` into database table `tablename`.
+
+        Parameters
+        ----------
+        df : DataFrame
+            Need this to guess the columns types.
+        tablename : str
+            Name of the table to create in the database.
+        if_exists : str
+            What to do if the specified table already exists in the database.
+        index_commands : list of tuples
+            ``(columns, unique)`` tuples describing the indexes to create.
+        vacuum : bool
+            Whether to ``VACUUM`` the database once the table has been loaded.
+        """
+        _check_duplicate_columns(df)
+        # Sniff out column dtypes and create a db table
+        if dtypes is None:
+            dtypes = _get_df_dtypes(df)
+        if extra_dtypes:
+            dtypes = {**dtypes, **extra_dtypes}
+        self.create_db_table(tablename, df, dtypes, if_exists=if_exists)
+        rows = df.astype(object).where(df.notnull(), None).itertuples(index=False, name=None)
+        self.insert_rows(tablename, rows)
+        table = SQLiteTable(
+            name=tablename, df=df[0:0], dtypes=dtypes, tempfile=None,
+            connection_string=self.connection_string, engine=self.engine, datadir=self.datadir)
+        self._finalize_table(table, index_commands, vacuum)
+        return table
+
+    def _finalize_table(self, table, index_commands, vacuum):
+        if index_commands:
+            table.create_indexes(index_commands)
+        table.analyze()
+        if vacuum:
+            self.vacuum()
+
+    def vacuum(self):
+        """Rebuild the database file, repacking it into a minimal amount of disk space."""
+        connection = self.engine.raw_connection()
+        try:
+            connection.cursor().execute('VACUUM')
+        finally:
+            connection.close()
+
+
+def _iter_rows(chunks, **reader_opts):
+    r"""Parse an iterable of line-aligned data blocks into row tuples.
+
+    Examples
+    --------
+    >>> list(_iter_rows([b'a\t\\N\n', b'"b\tc"\td\n'], delimiter='\t'))
+    [('a', None), ('b\tc', 'd')]
+    """
+    for chunk in chunks:
+        lines = io.StringIO(chunk.decode('utf-8'), newline='')
+        for row in csv.reader(lines, **reader_opts):
+            yield tuple(None if value == '\\N' else value for value in row)
+
+
+# === HDF5 ===
+
+class HDF5Connection(_Connection):
+    """Save data into a chunked, compressed HDF5 file (using PyTables).
+
+    Every table is stored under its own key, in the ``table`` format, so that individual
+    columns and blocks of rows can be read without loading the entire table.
+    """
+
+    def __init__(self, filename, complib='blosc', complevel=9):
+        self.filename = op.abspath(filename)
+        self.complib = complib
+        self.complevel = complevel
+
+    def _append_frames(self, tablename, dfs, dtypes, columns, itemsizes, nullable=None):
+        """Append `dfs` to table `tablename`.
+
+        Strings are stored with a fixed width, which can not change once the table has been
+        created, so `itemsizes` must hold the largest number of bytes in every string column
+        of *every* dataframe.
+        """
+        dtypes = {c: dtypes.get(c) for c in columns}
+        numpy_dtypes = get_numpy_dtypes(dtypes, nullable=nullable)
+        min_itemsize = {
+            c: itemsizes[c] for c, dtype in numpy_dtypes.items()
+            if dtype == 'object' and itemsizes.get(c)
+        }
+        with pd.HDFStore(
+                self.filename, mode='a', complib=self.complib, complevel=self.complevel) as store:
+            if tablename in store:
+                store.remove(tablename)
+            offset = 0
+            for df in dfs:
+                df.index = pd.RangeIndex(offset, offset + len(df))
+                offset += len(df)
+                store.append(
+                    tablename, df.astype(numpy_dtypes), format='table', data_columns=True,
+                    min_itemsize=min_itemsize, index=False)
+        if not offset:
+            logger.warning("No rows to store in '{}'.".format(tablename))
+
+    def import_file(
+            self, file, tablename=None, dtypes=None, extra_dtypes=None,
+            extra_substitutions=None, **csv_opts):
+        """Load file `file` into HDF5 group `tablename`.
+
+        The file is read twice: once to find column types and string widths which hold
+        every block of the file, and once to store it.
+        Integer and boolean columns are stored as floats, because we can not know in advance
+        whether they contain nulls.
+
+        Returns
+        -------
+        filename : str
+            Name of the HDF5 file.
+        """
+        _set_default_csv_opts(csv_opts)
+        tablename = tablename if tablename else get_tablename(file)
+        dtypes, itemsizes = _scan_file_frames(
+            file, dtypes, extra_dtypes, extra_substitutions, **csv_opts)
+        df, dtypes, dfs = _iter_file_frames(file, dtypes, None, extra_substitutions, **csv_opts)
+        self._append_frames(tablename, dfs, dtypes, list(df.columns), itemsizes)
+        return self.filename
+
+    def import_df(self, df, tablename, dtypes=None, extra_dtypes=None, chunksize=100000):
+        """Load dataframe `df` into HDF5 group `tablename`.
+
+        Returns
+        -------
+        filename : str
+            Name of the HDF5 file.
+        """
+        _check_duplicate_columns(df)
+        if dtypes is None:
+            dtypes = _get_df_dtypes(df)
+        if extra_dtypes:
+            dtypes = {**dtypes, **extra_dtypes}
+        dfs = (df[i:i + chunksize] for i in range(0, len(df), chunksize))
+        self._append_frames(
+            tablename, dfs, dtypes, list(df.columns), _get_itemsizes(df),
+            nullable=df.columns[df.isnull().any()])
+        return self.filename
+
+
+# === Parquet ===
+
+class ParquetConnection(_Connection):
+    """Save data into Parquet files, one file per table, in folder `datadir`.
+
+    Every chunk of data is written as a separate row group.
+    """
+
+    def __init__(self, datadir, compression='snappy'):
+        self.datadir = op.abspath(datadir)
+        os.makedirs(self.datadir, exist_ok=True)
+        self.compression = compression
+
+    def _write_frames(self, tablename, dfs, dtypes, columns):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        filename = op.join(self.datadir, tablename + '.parquet')
+        schema = get_arrow_schema(dtypes, columns)
+        with pq.ParquetWriter(filename, schema, compression=self.compression) as writer:
+            for df in dfs:
+                writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+        return filename
+
+    def import_file(
+            self, file, tablename=None, dtypes=None, extra_dtypes=None,
+            extra_substitutions=None, **csv_opts):
+        """Load file `file` into Parquet file ``{datadir}/{tablename}.parquet``.
+
+        The file is read twice: once to find column types which hold every block of the file,
+        and once to store it (the schema of a Parquet file can not change).
+
+        Returns
+        -------
+        filename : str
+            Name of the Parquet file.
+        """
+        _set_default_csv_opts(csv_opts)
+        tablename = tablename if tablename else get_tablename(file)
+        dtypes, _ = _scan_file_frames(file, dtypes, extra_dtypes, extra_substitutions, **csv_opts)
+        df, dtypes, dfs = _iter_file_frames(file, dtypes, None, extra_substitutions, **csv_opts)
+        return self._write_frames(tablename, dfs, dtypes, list(df.columns))
+
+    def import_df(self, df, tablename, dtypes=None, extra_dtypes=None, chunksize=100000):
+        """Load dataframe `df` into Parquet file ``{datadir}/{tablename}.parquet``.
+
+        Returns
+        -------
+        filename : str
+            Name of the Parquet file.
+        """
+        _check_duplicate_columns(df)
+        if dtypes is None:
+            dtypes = _get_df_dtypes(df)
+        if extra_dtypes:
+            dtypes = {**dtypes, **extra_dtypes}
+        dfs = (df[i:i + chunksize] for i in range(0, len(df), chunksize))
+        return self._write_frames(tablename, dfs, dtypes, list(df.columns))
+
+
+def _iter_file_frames(
+        file, dtypes=None, extra_dtypes=None, extra_substitutions=None, **csv_opts):
+    """Decompress and format `file` on the fly, parsing every block into a DataFrame.
+
+    Returns
+    -------
+    df : DataFrame
+        Empty DataFrame with the correct (formatted) columns.
+    dtypes : dict
+        A dictionary of dtypes for each column.
+    dfs : iterator of DataFrames
+        DataFrames with the (formatted) columns of the file and NumPy dtypes.
+    """
+    df, inferred_dtypes, chunks = _stream_file(file, extra_substitutions, **csv_opts)
+    if dtypes is None:
+        dtypes = _update_dtypes(inferred_dtypes, extra_dtypes)
+    # Leave booleans ('True' / 'False') for pandas to parse
+    numpy_dtypes = {
+        c: dtype for c, dtype in get_numpy_dtypes(dtypes).items()
+        if c in df.columns and not isinstance(dtypes[c], sa.Boolean)
+    }
+    read_csv_opts = _get_block_csv_opts(list(df.columns), **csv_opts)
+    dfs = (
+        pd.read_csv(io.BytesIO(chunk), dtype=numpy_dtypes, **read_csv_opts)
+        for chunk in _iter_skip_lines(chunks, _get_db_skiprows(csv_opts))
+    )
+    return df, dtypes, dfs
+
+
+def _scan_file_frames(
+        file, dtypes=None, extra_dtypes=None, extra_substitutions=None, **csv_opts):
+    """Read `file` once, finding column types and string widths which hold every block.
+
+    Returns
+    -------
+    dtypes : dict
+        Column types of the first block, widened to hold the values of later blocks.
+    itemsizes : dict
+        Largest number of bytes in every column, with values written as in the file.
+    """
+    df, inferred_dtypes, chunks = _stream_file(file, extra_substitutions, **csv_opts)
+    dtypes = dict(dtypes) if dtypes is not None else _update_dtypes(
+        inferred_dtypes, extra_dtypes)
+    read_csv_opts = _get_block_csv_opts(list(df.columns), **csv_opts)
+    itemsizes = {}
+    for chunk in _iter_skip_lines(chunks, _get_db_skiprows(csv_opts)):
+        chunk_df = pd.read_csv(io.BytesIO(chunk), low_memory=False, **read_csv_opts)
+        dtypes.update(get_widened_dtypes(dtypes, chunk_df[[c for c in df if c in dtypes]]))
+        # Values are measured as text, in case the column is stored as strings
+        chunk_itemsizes = _get_itemsizes(
+            pd.read_csv(io.BytesIO(chunk), dtype=str, **read_csv_opts))
+        for column, itemsize in chunk_itemsizes.items():
+            itemsizes[column] = max(itemsizes.get(column, 0), itemsize)
+    return dtypes, itemsizes
+
+
+def _get_itemsizes(df):
+    """Return the largest number of bytes in every string column of `df`.
+
+    Examples
+    --------
+    >>> _get_itemsizes(pd.DataFrame({'a': ['x', 'é', None], 'b': [1, 2, 3], 'c': [None] * 3}))
+    {'a': 2}
+    """
+    itemsizes = {}
+    for column in df.columns:
+        values = df[column].dropna()
+        if values.dtype == object and len(values):
+            itemsizes[column] = int(values.astype(str).str.encode('utf-8').str.len().max())
+    return itemsizes
+
+
+def _get_block_csv_opts(columns, **csv_opts):
+    """Return the options of `pd.read_csv` which parse a block of formatted lines
+    (without a header) into columns `columns`.
+    """
+    return dict(
+        sep=csv_opts['sep'], quotechar=csv_opts['quotechar'], quoting=csv_opts['quoting'],
+        header=None, names=columns, na_values=['\\N'], keep_default_na=False)
+
+
+def _stream_file(file, extra_substitutions=None, **csv_opts):
+    """Decompress and format `file` on the fly.
+
+    Column types are inferred from the first block of formatted lines.
+
+    Returns
+    -------
+    df : DataFrame
+        Empty DataFrame with the correct (formatted) columns.
+    dtypes : dict
+        A dictionary of dtypes for each column.
+    chunks : iterator of bytes
+        Blocks of formatted lines, including the header.
+    """
+    extra_substitutions = list(extra_substitutions) if extra_substitutions else []
+    if '.vcf' in op.basename(file).lower():
+        extra_substitutions.append(VCF_HEADER_SUBSTITUTION)
+    chunks = iter_decompress(
+        infile=file, sep=csv_opts['sep'], na_values=csv_opts['na_values'],
+        extra_substitutions=extra_substitutions)
+    first_chunk = next(chunks, b'')
+    df, dtypes = _get_chunk_dtypes(first_chunk, **csv_opts)
+    return df, dtypes, _chain_chunks(first_chunk, chunks)
+
+
+def _get_chunk_dtypes(data, **csv_opts):
+    """Infer column types from a block of formatted lines (e.g. the first chunk of a file).
+
+    Returns
+    -------
+    df : DataFrame
+        Empty DataFrame with the correct (formatted) columns.
+    dtypes : dict
+        A dictionary of dtypes for each column.
+    """
+    # Nulls have already been replaced with '\N' by the formatter
+    csv_opts = {**csv_opts, 'na_values': list(csv_opts.get('na_values') or []) + ['\\N']}
+    df = pd.read_csv(io.BytesIO(data), low_memory=False, **csv_opts)
+    dtypes = _get_df_dtypes(df)
+    df.columns = format_columns(df.columns)
+    dtypes = {format_columns(k): v for k, v in dtypes.items()}
+    return df[0:0], dtypes
+
+
+def _chain_chunks(first_chunk, chunks):
+    """Put `first_chunk` back in front of `chunks`."""
+    if first_chunk:
+        yield first_chunk
+    yield from chunks
+
+
+def _iter_skip_lines(chunks, skiprows):
+    r"""Drop the first `skiprows` lines from an iterable of line-aligned data blocks.
+
+    Examples
+    --------
+    >>> list(_iter_skip_lines([b'a\nb\n', b'c\nd\n'], 3))
+    [b'd\n']
+    """
+    for chunk in chunks:
+        idx = 0
+        while skiprows and idx < len(chunk):
+            idx = (chunk.find(b'\n', idx) + 1) or len(chunk)
+            skiprows -= 1
+        if idx < len(chunk):
+            yield chunk[idx:] if idx else chunk
+
+
+class _ChunkReader(io.RawIOBase):
+    """Read-only file object over an iterable of bytes (e.g. for ``cursor.copy_expert``).
+
+    Examples
+    --------
+    >>> reader = _ChunkReader([b'abc', b'', b'def'])
+    >>> reader.read(2), reader.read(2), reader.read()
+    (b'ab', b'c', b'def')
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._chunk = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._chunk:
+            try:
+                self._chunk = memoryview(next(self._chunks))
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._chunk))
+        buffer[:size] = self._chunk[:size]
+        self._chunk = self._chunk[size:]
+        return size
@@ -13,16 +13,19 @@ import tempfile
 
 from kmtools.db_tools import make_connection_string
 from kmtools.system_tools import iter_stdout, start_subprocess
+from odbo.commands import iter_command_output
 
 logger = logging.getLogger(__name__)
 
 
 def start_database(db_type, *args, **kwargs):
     db_type = db_type.lower()
-    if db_type not in ['mysql']:
+    if db_type not in ['mysql', 'postgresql']:
         raise Exception("Unsupported DB_TYPE = '{}'".format(db_type))
     if db_type == 'mysql':
         return start_mysql_database(*args, **kwargs)
+    elif db_type == 'postgresql':
+        return start_postgres_database(*args, **kwargs)
 
 
 def start_mysql_database(
@@ -48,6 +51,23 @@ def start_mysql_database(
     return mysqld
 
 
+def start_postgres_database(db_data_dir, db_socket, db_port):
+    postgres = PostgresDaemon(
+        datadir=db_data_dir,
+        db_socket=db_socket,
+        db_port=db_port,
+    )
+    try:
+        logger.info('Starting PostgreSQL database...')
+        postgres.install_db()
+        postgres.start()
+    except Exception as e:
+        logger.error(
+            "Failed to start database beacuse of error:\n    {}: {}".format(type(e), e))
+        postgres.stop()
+    return postgres
+
+
 class _Daemon:
 
     def get_connection_string(self, db_schema=None, db_url='localhost'):
@@ -114,7 +134,11 @@ class MySQLDaemon(_Daemon):
         # Working variables
         self._mysqld_process = None
 
-    def install_db(self):
+    def install_db(self, timeout=None):
+        """Initialize the data directory.
+
+        ``mysql_install_db`` is killed if it runs for longer than `timeout` seconds.
+        """
         log_files = [op.join(self.datadir, x) for x in ['ib_logfile0', 'ib_logfile1']]
         for log_file in log_files:
             if op.isfile(log_file):
@@ -123,9 +147,7 @@ class MySQLDaemon(_Daemon):
 mysql_install_db --no-defaults --basedir={basedir} --datadir={datadir} \
 """.format(basedir=self.basedir, datadir=self.datadir)
         logger.debug('===== Initializing MySQL database... =====')
-        logger.debug(system_command)
-        p = start_subprocess(system_command)
-        for line in iter_stdout(p):
+        for line in iter_command_output(system_command, timeout):
             logger.debug(line)
 
     def _format_kwargs(self, **kwargs):
@@ -213,3 +235,141 @@ flush privileges;" \
         p = start_subprocess(system_command)
         for line in iter_stdout(p):
             logger.debug(line)
+
+
+# === PostgreSQL ===
+
+class PostgresDaemon(_Daemon):
+    """PostgreSQL daemon, managed using ``initdb`` and ``pg_ctl``.
+
+    .. note::
+        The server is meant to hold disposable data, so it is started with ``fsync``
+        and ``full_page_writes`` turned off to speed up bulk loading.
+
+    Parameters
+    ----------
+    db_socket : str
+        The *directory* in which PostgreSQL creates its Unix domain socket.
+    """
+    db_type = 'postgresql'
+
+    def __init__(self, *, basedir=None, datadir=None, db_socket=None, db_port=9432):
+        if basedir is None:
+            basedir = op.dirname(op.dirname(sys.executable))
+            logger.debug("'basedir': {}".format(basedir))
+        self.basedir = basedir
+        if datadir is None:
+            datadir = op.join(tempfile.gettempdir(), 'postgres_db')
+            logger.debug("'datadir': {}".format(datadir))
+        self.datadir = datadir
+        if db_socket is None:
+            db_socket = tempfile.gettempdir()
+            logger.debug("'db_socket': {}".format(db_socket))
+        self.db_socket = db_socket
+        self.db_port = db_port
+        # Working variables
+        self._is_running = False
+
+    def get_connection_string(self, db_schema=None, db_url='localhost'):
+        """Return database connection string (e.g. for sqlalchemy).
+
+        Parameters
+        ----------
+        db_schema : db_schema
+            Default database for the connection.
+        db_url : str
+            The IP address / domain name of the computer running the database server.
+            If db_url == 'localhost', the client will connect using a Unix domain socket.
+
+        Examples
+        --------
+        >>> postgres = PostgresDaemon(db_socket='/tmp', db_port=9432)
+        >>> postgres.get_connection_string('testing')
+        'postgresql://postgres@/testing?host=/tmp&port=9432'
+        """
+        if db_url is None:
+            db_url = socket.gethostbyname(socket.gethostname())
+        if db_url == 'localhost':
+            return 'postgresql://postgres@/{}?host={}&port={}'.format(
+                db_schema or '', self.db_socket, self.db_port)
+        else:
+            return 'postgresql://postgres@{}:{}/{}'.format(db_url, self.db_port, db_schema or '')
+
+    def install_db(self, timeout=None):
+        """Initialize the data directory.
+
+        ``initdb`` is killed if it runs for longer than `timeout` seconds.
+        """
+        if op.isfile(op.join(self.datadir, 'PG_VERSION')):
+            logger.debug("PostgreSQL database already initialized in '{}'.".format(self.datadir))
+            return
+        system_command = """\
+initdb --no-locale --encoding=UTF8 --auth=trust --username=postgres --pgdata={datadir} \
+""".format(datadir=self.datadir)
+        logger.debug('===== Initializing PostgreSQL database... =====')
+        for line in iter_command_output(system_command, timeout):
+            logger.debug(line)
+
+    def _format_kwargs(self, **kwargs):
+        """
+        Examples
+        --------
+        >>> postgres = PostgresDaemon()
+        >>> sorted(postgres._format_kwargs(aaa='on', bbb=300).split())
+        ['-c', '-c', 'aaa=on', 'bbb=300']
+        """
+        kwargs_string = ''
+        for x, y in kwargs.items():
+            kwargs_string += ' -c {}={}'.format(x, y)
+        return kwargs_string
+
+    def start(
+            self,
+            max_connections=150,
+            fsync='off',
+            full_page_writes='off',
+            **kwargs):
+        if self._is_running:
+            logger.info(
+                "PostgreSQL is already running (socket: '{}', port: {})."
+                .format(self.db_socket, self.db_port))
+            return
+
+        logger.debug('===== Starting PostgreSQL daemon... =====')
+        system_command = """\
+pg_ctl --pgdata={datadir} --log={logfile} --wait \
+    -o "-p {db_port} -k {db_socket} -c listen_addresses='*' {kwargs}" \
+    start \
+""".format(
+            datadir=self.datadir,
+            logfile=op.join(self.datadir, 'postgres.log'),
+            db_port=self.db_port,
+            db_socket=self.db_socket,
+            kwargs=self._format_kwargs(
+                max_connections=max_connections,
+                fsync=fsync,
+                full_page_writes=full_page_writes,
+                **kwargs),
+        )
+        logger.debug(system_command)
+        p = start_subprocess(system_command)
+        for line in iter_stdout(p):
+            logger.debug(line)
+        if p.wait():
+            raise Exception("Failed to start PostgreSQL (returncode = {})".format(p.returncode))
+        self._is_running = True
+        # Stop PostgreSQL when you exit Python
+        atexit.register(self.stop)
+
+    def stop(self):
+        if not self._is_running:
+            logger.debug("PostgreSQL daemon is already shut down!")
+            return
+        system_command = "pg_ctl --pgdata={datadir} --mode=fast --wait stop".format(
+            datadir=self.datadir)
+        logger.debug(system_command)
+        p = start_subprocess(system_command)
+        for line in iter_stdout(p):
+            logger.debug(line)
+        logger.debug('pg_ctl returncode: {}'.format(p.wait()))
+        self._is_running = False
@@ -0,0 +1,361 @@
+"""Create MySQL tables, or bring existing tables into a new layout, with a single statement.
+
+Every ``ALTER TABLE`` which changes the storage engine, the row format or the columns of a
+table rebuilds the entire table, and dropping a table throws away its indexes. Instead:
+
+- :func:`get_create_table_sql` declares the columns, indexes, storage engine, row format and
+  partitions of a new table in a single ``CREATE TABLE``.
+- :func:`get_alter_table_sql` compares the layout that the data needs with the layout of an
+  existing table (see :func:`read_table_layout`), and returns the smallest
+  ``ALTER TABLE``, or nothing if the table already has the right layout.
+  Indexes of the existing table are kept.
+
+Examples
+--------
+>>> target = TableLayout(
+...     [('id', 'INTEGER', False), ('gene', 'VARCHAR(16)', True)], engine='MyISAM',
+...     primary_key=['id'])
+>>> print(get_create_table_sql('variants', target))
+CREATE TABLE `variants` (
+  `id` INTEGER NOT NULL,
+  `gene` VARCHAR(16),
+  PRIMARY KEY (`id`)
+) ENGINE=MyISAM;
+>>> existing = TableLayout(
+...     [('id', 'int(11)', False), ('gene', 'varchar(8)', True)], engine='MyISAM',
+...     primary_key=['id'], indexes={'A': (('gene', ), False)})
+>>> print(get_alter_table_sql('variants', existing, target))
+ALTER TABLE `variants`
+  MODIFY COLUMN `gene` VARCHAR(16);
+>>> get_alter_table_sql('variants', existing, existing) is None
+True
+"""
+import itertools
+import logging
+import re
+import string
+
+import sqlalchemy as sa
+
+logger = logging.getLogger(__name__)
+
+#: Integer types, which ``information_schema`` lists with a display width (e.g. ``int(11)``)
+INTEGER_TYPE_NAMES = ['tinyint', 'smallint', 'mediumint', 'int', 'bigint']
+
+#: Names of the same column types, as written by SQLAlchemy and as listed by MySQL
+COLUMN_TYPE_ALIASES = {
+    'integer': 'int',
+    'bool': 'tinyint',
+    'boolean': 'tinyint',
+    'real': 'double',
+    'double precision': 'double',
+}
+
+_DISPLAY_WIDTH_RE = re.compile(r'\b({})\(\d+\)'.format('|'.join(INTEGER_TYPE_NAMES)))
+
+
+class TableLayout:
+    """Columns, indexes and storage options of a table.
+
+    Parameters
+    ----------
+    columns : list
+        ``(name, column_type, nullable)`` tuples, in order, where `column_type` is SQL
+        (e.g. ``'VARCHAR(255)'``).
+    engine : str | None
+        Storage engine.
+    row_format : str | None
+        Row format (e.g. ``'COMPRESSED'``), or None for the default row format.
+    primary_key : list | None
+        Columns of the primary key.
+    indexes : dict | None
+        Mapping of index names to ``(columns, unique)`` tuples.
+    partitioning : odbo.partitioning.Partitioning | tuple | None
+        Partitions of the table, or the ``(method, column, partition names)`` of the
+        partitions of an existing table.
+    """
+
+    def __init__(
+            self, columns, engine=None, row_format=None, primary_key=None, indexes=None,
+            partitioning=None):
+        self.columns = [(name, column_type, nullable) for name, column_type, nullable in columns]
+        self.engine = engine
+        self.row_format = row_format.upper() if row_format else None
+        self.primary_key = list(primary_key) if primary_key else None
+        self.indexes = {
+            name: (tuple(columns), bool(unique))
+            for name, (columns, unique) in (indexes or {}).items()
+        }
+        self.partitioning = partitioning
+
+    def __repr__(self):
+        return 'TableLayout({})'.format(', '.join(
+            '{} {}'.format(name, column_type) for name, column_type, _ in self.columns))
+
+    @classmethod
+    def from_dtypes(
+            cls, columns, dtypes, dialect, not_null=None, engine=None, row_format=None,
+            primary_key=None, index_commands=None, partitioning=None):
+        """Return the layout of a table which stores `columns` as `dtypes`.
+
+        Parameters
+        ----------
+        dialect : sqlalchemy.engine.Dialect
+            Dialect which compiles `dtypes` into SQL.
+        not_null : list | None
+            Columns which are declared as ``NOT NULL``.
+        index_commands : list | None
+            ``(columns, unique)`` tuples, where `columns` is a column name or a list of
+            column names.
+
+        Examples
+        --------
+        >>> from sqlalchemy.dialects import mysql
+        >>> layout = TableLayout.from_dtypes(
+        ...     ['id', 'gene'], {'id': mysql.INTEGER(), 'gene': mysql.VARCHAR(16)},
+        ...     mysql.dialect(), not_null=['id'], index_commands=[('gene', False)])
+        >>> layout.columns, layout.indexes
+        ([('id', 'INTEGER', False), ('gene', 'VARCHAR(16)', True)], {'A': (('gene',), False)})
+        """
+        not_null = set(not_null or [])
+        return cls(
+            [
+                (column, dtypes[column].compile(dialect=dialect), column not in not_null)
+                for column in columns
+            ],
+            engine=engine, row_format=row_format,
+            primary_key=_as_list(primary_key) if primary_key is not None else None,
+            indexes={
+                name: (_as_list(columns), unique)
+                for name, (columns, unique) in zip(_iter_index_names(), index_commands or [])
+            },
+            partitioning=partitioning)
+
+    @property
+    def partition_key(self):
+        """``(method, column, partition names)``, or None if the table is not partitioned."""
+        if self.partitioning is None or isinstance(self.partitioning, tuple):
+            return self.partitioning
+        return (self.partitioning.method, self.partitioning.column,
+                tuple(self.partitioning.names))
+
+
+def read_table_layout(engine, db_schema, tablename):
+    """Return the :class:`TableLayout` of table `tablename`, or None if it does not exist.
+
+    The layout is read from ``information_schema``.
+    """
+    params = {'db_schema': db_schema, 'tablename': tablename}
+    where = 'WHERE table_schema = :db_schema AND table_name = :tablename'
+    with engine.connect() as connection:
+        table_row = connection.execute(
+            sa.text('SELECT ENGINE, CREATE_OPTIONS FROM information_schema.tables ' + where),
+            **params).first()
+        if table_row is None:
+            return None
+        columns = [
+            (name, column_type, is_nullable == 'YES')
+            for name, column_type, is_nullable in connection.execute(sa.text(
+                'SELECT COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE FROM information_schema.columns ' +
+                where + ' ORDER BY ORDINAL_POSITION'), **params)
+        ]
+        index_columns = {}
+        unique_indexes = set()
+        for index_name, non_unique, column in connection.execute(sa.text(
+                'SELECT INDEX_NAME, NON_UNIQUE, COLUMN_NAME FROM information_schema.statistics ' +
+                where + ' ORDER BY INDEX_NAME, SEQ_IN_INDEX'), **params):
+            index_columns.setdefault(index_name, []).append(column)
+            if not int(non_unique):
+                unique_indexes.add(index_name)
+        partitions = list(connection.execute(sa.text(
+            'SELECT PARTITION_NAME, PARTITION_METHOD, PARTITION_EXPRESSION '
+            'FROM information_schema.partitions ' + where +
+            ' AND PARTITION_NAME IS NOT NULL ORDER BY PARTITION_ORDINAL_POSITION'), **params))
+    engine_name, create_options = table_row
+    row_format = re.search(r'row_format=(\w+)', create_options or '', re.IGNORECASE)
+    return TableLayout(
+        columns, engine=engine_name, row_format=row_format.group(1) if row_format else None,
+        primary_key=index_columns.pop('PRIMARY', None),
+        indexes={
+            name: (columns, name in unique_indexes) for name, columns in index_columns.items()
+        },
+        partitioning=(
+            partitions[0][1].split()[0], partitions[0][2].strip('`'),
+            tuple(name for name, _, _ in partitions)) if partitions else None)
+
+
+def get_create_table_sql(tablename, layout):
+    """Return the ``CREATE TABLE`` statement of table `tablename` with `layout`."""
+    primary_key = layout.primary_key or []
+    definitions = [
+        _get_column_definition(name, column_type, nullable and name not in primary_key)
+        for name, column_type, nullable in layout.columns
+    ]
+    if primary_key:
+        definitions.append('PRIMARY KEY ({})'.format(_format_columns(primary_key)))
+    definitions.extend(
+        '{}INDEX `{}` ({})'.format('UNIQUE ' if unique else '', name, _format_columns(columns))
+        for name, (columns, unique) in layout.indexes.items())
+    options = []
+    if layout.engine:
+        options.append('ENGINE={}'.format(layout.engine))
+    if layout.row_format:
+        options.append('ROW_FORMAT={}'.format(layout.row_format))
+    sql_command = 'CREATE TABLE `{}` (\n  {}\n){}'.format(
+        tablename, ',\n  '.join(definitions), ''.join(' ' + option for option in options))
+    if layout.partitioning is not None:
+        sql_command += '\n' + layout.partitioning.get_sql()
+    return sql_command + ';'
+
+
+def get_alter_table_sql(tablename, existing, target):
+    """Return the ``ALTER TABLE`` statement which changes table `tablename` from layout
+    `existing` into layout `target`, or None if nothing has to change.
+
+    Columns are added, dropped, changed and moved as needed. Indexes of the existing table
+    are kept, and indexes of `target` which the table does not have yet are added.
+    The primary key is replaced only if `target` declares a different one.
+    """
+    primary_key = (
+        target.primary_key if target.primary_key is not None else existing.primary_key) or []
+    clauses = _get_column_clauses(existing, target, primary_key)
+    clauses.extend(get_index_clauses(
+        existing, list(target.indexes.values()), target.primary_key))
+    if target.engine and (existing.engine or '').lower() != target.engine.lower():
+        clauses.append('ENGINE={}'.format(target.engine))
+    if existing.row_format != target.row_format:
+        clauses.append('ROW_FORMAT={}'.format(target.row_format or 'DEFAULT'))
+    partition_clause = _get_partition_clause(existing, target)
+    if not clauses and not partition_clause:
+        return None
+    lines = ['ALTER TABLE `{}`'.format(tablename)]
+    if clauses:
+        lines.append('  ' + ',\n  '.join(clauses))
+    if partition_clause:
+        lines.append(partition_clause)
+    return '\n'.join(lines) + ';'
+
+
+def get_index_clauses(existing, index_commands, primary_key=None):
+    """Return the ``ALTER TABLE`` clauses which add the indexes that a table does not have yet.
+
+    Parameters
+    ----------
+    existing : TableLayout
+        Layout of the table.
+    index_commands : list
+        ``(columns, unique)`` tuples, where `columns` is a column name or a list of
+        column names.
+    primary_key : str | list | None
+        Column(s) of the primary key, which replaces a different primary key of the table.
+
+    Examples
+    --------
+    >>> existing = TableLayout([], primary_key=['id'], indexes={'A': (('gene', ), False)})
+    >>> get_index_clauses(existing, [('gene', False), (['chrom', 'pos'], True)], 'id')
+    ['ADD UNIQUE INDEX `B` (`chrom`, `pos`)']
+    """
+    clauses = []
+    if primary_key is not None and _as_list(primary_key) != existing.primary_key:
+        if existing.primary_key is not None:
+            clauses.append('DROP PRIMARY KEY')
+        clauses.append('ADD PRIMARY KEY ({})'.format(_format_columns(primary_key)))
+    existing_indexes = set(existing.indexes.values())
+    index_names = (n for n in _iter_index_names() if n not in existing.indexes)
+    for columns, unique in index_commands:
+        index = (tuple(_as_list(columns)), bool(unique))
+        if index in existing_indexes:
+            logger.debug("Index {} already exists.".format(index))
+            continue
+        existing_indexes.add(index)
+        clauses.append('ADD {}INDEX `{}` ({})'.format(
+            'UNIQUE ' if unique else '', next(index_names), _format_columns(columns)))
+    return clauses
+
+
+def normalize_column_type(column_type):
+    """Return `column_type` in the form used by ``information_schema.columns``, so that
+    column types written by SQLAlchemy can be compared with those of existing tables.
+
+    Examples
+    --------
+    >>> normalize_column_type('SMALLINT UNSIGNED') == normalize_column_type('smallint(5) unsigned')
+    True
+    >>> normalize_column_type('DECIMAL(10, 2)'), normalize_column_type('BOOL')
+    ('decimal(10,2)', 'tinyint')
+    >>> normalize_column_type("ENUM('A','b')")
+    "enum('A','b')"
+    """
+    name, paren, rest = column_type.strip().partition('(')
+    name = name.strip().lower()
+    if name in ['enum', 'set']:
+        # Values are case sensitive
+        return name + paren + rest
+    column_type = (name + paren + re.sub(r'\s*,\s*', ',', rest)).lower()
+    column_type = _DISPLAY_WIDTH_RE.sub(r'\1', column_type)
+    for alias, name in COLUMN_TYPE_ALIASES.items():
+        column_type = re.sub(r'^{}\b'.format(alias), name, column_type)
+    return column_type
+
+
+def _get_column_clauses(existing, target, primary_key):
+    """Return the clauses which drop, add, change and move columns."""
+    existing_columns = {
+        name: (normalize_column_type(column_type), nullable)
+        for name, column_type, nullable in existing.columns
+    }
+    target_names = [name for name, _, _ in target.columns]
+    clauses = [
+        'DROP COLUMN `{}`'.format(name) for name in existing_columns if name not in target_names
+    ]
+    # Order of the columns as the clauses are applied
+    current = [name for name in existing_columns if name in target_names]
+    for i, (name, column_type, nullable) in enumerate(target.columns):
+        nullable = nullable and name not in primary_key
+        definition = _get_column_definition(name, column_type, nullable)
+        position = 'FIRST' if i == 0 else 'AFTER `{}`'.format(target_names[i - 1])
+        if name not in existing_columns:
+            clauses.append('ADD COLUMN {} {}'.format(definition, position))
+            current.insert(i, name)
+        elif (current.index(name) != i or
+                existing_columns[name] != (normalize_column_type(column_type), nullable)):
+            moved = current.index(name) != i
+            clauses.append('MODIFY COLUMN {}{}'.format(
+                definition, ' ' + position if moved else ''))
+            current.remove(name)
+            current.insert(i, name)
+    return clauses
+
+
+def _get_partition_clause(existing, target):
+    if existing.partition_key == target.partition_key:
+        return ''
+    if target.partitioning is None:
+        return 'REMOVE PARTITIONING'
+    return target.partitioning.get_sql()
+
+
+def _get_column_definition(name, column_type, nullable):
+    return '`{}` {}{}'.format(name, column_type, '' if nullable else ' NOT NULL')
+
+
+def _iter_index_names():
+    """Generate index names: A, B, ..., Z, AA, AB, ...
+
+    Examples
+    --------
+    >>> names = list(itertools.islice(_iter_index_names(), 28))
+    >>> names[0], names[25], names[26], names[27]
+    ('A', 'Z', 'AA', 'AB')
+    """
+    for length in itertools.count(1):
+        for letters in itertools.product(string.ascii_uppercase, repeat=length):
+            yield ''.join(letters)
+
+
+def _as_list(columns):
+    return list(columns) if isinstance(columns, (list, tuple)) else [columns]
+
+
+def _format_columns(columns):
+    return ', '.join('`{}`'.format(column) for column in _as_list(columns))
@@ -0,0 +1,150 @@
+"""Convert between the column types used by the different backends.
+
+Column types inferred by :mod:`kmtools.df_tools` are MySQL-specific SQLAlchemy types
+(``MEDIUMTEXT``, ``DOUBLE``, ...), which other databases do not understand.
+"""
+import sqlalchemy as sa
+
+#: Backend-agnostic replacements for column types, from most to least specific
+_GENERIC_DTYPES = [
+    (sa.Boolean, lambda dtype: sa.Boolean()),
+    (sa.BigInteger, lambda dtype: sa.BigInteger()),
+    (sa.SmallInteger, lambda dtype: sa.SmallInteger()),
+    (sa.Integer, lambda dtype: sa.Integer()),
+    (sa.Float, lambda dtype: sa.Float(precision=53)),
+    (sa.Numeric, lambda dtype: sa.Numeric(precision=dtype.precision, scale=dtype.scale)),
+    (sa.Enum, lambda dtype: sa.Enum(*dtype.enums)),
+    (sa.Text, lambda dtype: sa.Text()),
+]
+
+
+def get_generic_dtypes(dtypes, varchar_as_text=False):
+    """Convert a dictionary of MySQL column types into backend-agnostic column types.
+
+    Parameters
+    ----------
+    dtypes : dict
+        Mapping of column names to SQLAlchemy types.
+    varchar_as_text : bool
+        Whether to use ``TEXT`` instead of ``VARCHAR(n)``, which is useful for databases
+        (e.g. PostgreSQL) which enforce the length of the string.
+    """
+    return {
+        column: get_generic_dtype(dtype, varchar_as_text=varchar_as_text)
+        for column, dtype in dtypes.items()
+    }
+
+
+def get_generic_dtype(dtype, varchar_as_text=False):
+    """Convert a MySQL column type into a backend-agnostic column type.
+
+    Examples
+    --------
+    >>> from sqlalchemy.dialects import mysql
+    >>> get_generic_dtype(mysql.INTEGER())
+    Integer()
+    >>> get_generic_dtype(mysql.VARCHAR(32))
+    VARCHAR(length=32)
+    >>> get_generic_dtype(mysql.VARCHAR(32), varchar_as_text=True)
+    Text()
+    >>> get_generic_dtype(mysql.MEDIUMTEXT())
+    Text()
+    """
+    if isinstance(dtype, type):
+        dtype = dtype()
+    for base_type, get_dtype in _GENERIC_DTYPES:
+        if isinstance(dtype, base_type):
+            return get_dtype(dtype)
+    if isinstance(dtype, sa.String):
+        if dtype.length is None or varchar_as_text:
+            return sa.Text()
+        return sa.VARCHAR(dtype.length)
+    return dtype
+
+
+def get_numpy_dtypes(dtypes, nullable=None):
+    """Convert a dictionary of column types into NumPy dtypes (e.g. for HDF5 files).
+
+    Parameters
+    ----------
+    dtypes : dict
+        Mapping of column names to SQLAlchemy types.
+    nullable : list | None
+        Columns which may contain nulls. If None, assume that all columns may contain nulls.
+        NumPy has no missing value for integers and booleans, so such columns are stored
+        as floats.
+
+    Examples
+    --------
+    >>> from sqlalchemy.dialects import mysql
+    >>> dtypes = {'a': mysql.INTEGER(), 'b': mysql.INTEGER(), 'c': mysql.VARCHAR(32)}
+    >>> sorted(get_numpy_dtypes(dtypes, nullable=['b']).items())
+    [('a', 'int64'), ('b', 'float64'), ('c', 'object')]
+    """
+    if nullable is None:
+        nullable = set(dtypes)
+    else:
+        nullable = set(nullable)
+    return {
+        column: get_numpy_dtype(dtype, nullable=column in nullable)
+        for column, dtype in dtypes.items()
+    }
+
+
+def get_numpy_dtype(dtype, nullable=True):
+    if isinstance(dtype, type):
+        dtype = dtype()
+    if isinstance(dtype, sa.Boolean):
+        return 'float64' if nullable else 'bool'
+    elif isinstance(dtype, sa.Integer):
+        return 'float64' if nullable else 'int64'
+    elif isinstance(dtype, sa.Numeric):
+        return 'float64'
+    else:
+        return 'object'
+
+
+def get_arrow_schema(dtypes, columns=None):
+    """Convert a dictionary of column types into a :class:`pyarrow.Schema` (e.g. for Parquet).
+
+    Parameters
+    ----------
+    dtypes : dict
+        Mapping of column names to SQLAlchemy types.
+    columns : list | None
+        Order of columns in the schema. Columns missing from `dtypes` are stored as strings.
+
+    Examples
+    --------
+    >>> from sqlalchemy.dialects import mysql
+    >>> print(get_arrow_schema({'a': mysql.INTEGER(), 'b': mysql.DOUBLE()}, ['b', 'a', 'c']))
+    b: double
+    a: int32
+    c: string
+    """
+    import pyarrow as pa
+    if columns is None:
+        columns = list(dtypes)
+    return pa.schema([(column, get_arrow_type(dtypes.get(column))) for column in columns])
+
+
+def get_arrow_type(dtype):
+    import pyarrow as pa
+    if isinstance(dtype, type):
+        dtype = dtype()
+    if isinstance(dtype, sa.Boolean):
+        return pa.bool_()
+    elif isinstance(dtype, sa.BigInteger):
+        return pa.int64()
+    elif isinstance(dtype, sa.SmallInteger):
+        return pa.int16()
+    elif isinstance(dtype, sa.Integer):
+        return pa.int32()
+    elif isinstance(dtype, sa.Numeric):
+        return pa.float64()
+    elif isinstance(dtype, sa.DateTime):
+        return pa.timestamp('us')
+    elif isinstance(dtype, sa.Date):
+        return pa.date32()
+    else:
+        return pa.string()
@@ -0,0 +1,194 @@
+"""Dictionary-encode string columns which repeat a limited number of distinct values.
+
+Columns with up to :data:`odbo.schema.MAX_ENUM_VALUES` distinct values can be stored as
+``ENUM`` (see :func:`odbo.schema.optimize_schema`). Columns with a few thousand distinct
+values (e.g. gene names or tissue types) are stored as integer codes instead, with a lookup
+table of values for every column, and a view which joins the codes with their values::
+
+    variants                variants__gene_name      variants__view
+    id  gene_name  pos      id  value                id  gene_name  pos
+    1   1          100      1   BRCA1                1   BRCA1      100
+    2   2          200      2   TP53                 2   TP53       200
+    3   1          300                               3   BRCA1      300
+
+Codes are assigned as chunks of data stream through the encoder, in order of appearance,
+so the data never has to be held in memory or read twice.
+
+Examples
+--------
+>>> encoder = DictionaryEncoder(['gene_name'])
+>>> encoder.encode(pd.DataFrame({'gene_name': ['BRCA1', 'TP53', None], 'pos': [1, 2, 3]}))
+   gene_name  pos
+0          1    1
+1          2    2
+2       <NA>    3
+>>> encoder.encode(pd.DataFrame({'gene_name': ['KRAS', 'BRCA1'], 'pos': [4, 5]}))
+   gene_name  pos
+0          3    4
+1          1    5
+>>> encoder.get_lookup_df('gene_name')
+   id  value
+0   1  BRCA1
+1   2   TP53
+2   3   KRAS
+"""
+import logging
+
+import pandas as pd
+import sqlalchemy as sa
+
+from odbo.schema import ColumnStats, _get_integer_dtype, get_dtype_size
+
+logger = logging.getLogger(__name__)
+
+#: Default maximum number of distinct values in a dictionary-encoded column
+MAX_DICTIONARY_SIZE = 2 ** 16 - 1
+
+#: Minimum average number of rows per distinct value for a column to be encoded automatically
+MIN_REPEATS = 10
+
+
+class DictionaryEncoder:
+    """Replace the values of `columns` with integer codes, consistently across chunks of data.
+
+    Parameters
+    ----------
+    columns : list
+        Columns to encode.
+    max_size : int
+        Number of distinct values which the codes can hold at first, which determines the
+        type of the codes (e.g. ``SMALLINT UNSIGNED`` for up to 65535 values). Codes are
+        widened if a column turns out to have more distinct values (see :attr:`code_dtype`).
+
+    Attributes
+    ----------
+    dictionaries : dict
+        Mapping of every column to a dictionary of values and their codes (starting at 1).
+    """
+
+    def __init__(self, columns, max_size=MAX_DICTIONARY_SIZE):
+        self.columns = list(columns)
+        self.max_size = max_size
+        self.dictionaries = {column: {} for column in self.columns}
+
+    def __repr__(self):
+        return 'DictionaryEncoder({})'.format(
+            ', '.join('{}: {}'.format(c, len(d)) for c, d in self.dictionaries.items()))
+
+    @property
+    def code_dtype(self):
+        """Column type of the codes, which holds the codes of every value seen so far.
+
+        Examples
+        --------
+        >>> encoder = DictionaryEncoder(['a'], max_size=2)
+        >>> encoder.code_dtype
+        TINYINT(unsigned=True)
+        >>> _ = encoder.encode(pd.DataFrame({'a': range(300)}))
+        >>> encoder.code_dtype
+        SMALLINT(unsigned=True)
+        """
+        num_values = max([self.max_size] + [len(d) for d in self.dictionaries.values()])
+        return _get_integer_dtype(0, num_values)
+
+    def encode(self, df):
+        """Return a copy of `df`, with the values of :attr:`columns` replaced by their codes.
+
+        Nulls are not encoded.
+        """
+        df = df.copy(deep=False)
+        for column in self.columns:
+            dictionary = self.dictionaries[column]
+            values = df[column]
+            for value in values.dropna().unique():
+                if value not in dictionary:
+                    dictionary[value] = len(dictionary) + 1
+            df[column] = values.map(dictionary).astype('Int64')
+        return df
+
+    def get_dtypes(self, dtypes):
+        """Return column types `dtypes`, with the encoded columns replaced by codes."""
+        return {
+            column: self.code_dtype if column in self.columns else dtype
+            for column, dtype in dtypes.items()
+        }
+
+    def get_lookup_df(self, column):
+        """Return the values of `column` (``value``) with their codes (``id``)."""
+        dictionary = self.dictionaries[column]
+        return pd.DataFrame(
+            {'id': list(dictionary.values()), 'value': list(dictionary.keys())},
+            columns=['id', 'value'])
+
+
+def get_dictionary_columns(
+        df, dtypes, max_size=MAX_DICTIONARY_SIZE, min_repeats=MIN_REPEATS):
+    """Choose the columns of `df` which are worth dictionary-encoding.
+
+    String columns are encoded if every distinct value appears `min_repeats` times on
+    average, and if values are longer than the codes which replace them.
+    ``ENUM`` columns are already encoded by the database.
+
+    Parameters
+    ----------
+    df : DataFrame
+        A sample of the data (e.g. the first chunk).
+    dtypes : dict
+        Column types of the data.
+
+    Examples
+    --------
+    >>> from sqlalchemy.dialects import mysql
+    >>> df = pd.DataFrame({'gene_name': ['BRCA1', 'TP53'] * 10, 'sample_id': range(20)})
+    >>> dtypes = {'gene_name': mysql.VARCHAR(5), 'sample_id': mysql.INTEGER()}
+    >>> get_dictionary_columns(df, dtypes)
+    ['gene_name']
+    """
+    code_size = get_dtype_size(_get_integer_dtype(0, max_size))
+    columns = []
+    for column in df.columns:
+        dtype = dtypes.get(column)
+        if not isinstance(dtype, sa.String) or isinstance(dtype, sa.Enum):
+            continue
+        stats = ColumnStats(max_distinct=max_size)
+        stats.update(df[column])
+        if (stats.kind == 'str' and stats.distinct is not None and
+                len(stats.distinct) * min_repeats <= stats.count and
+                stats.avg_length > code_size):
+            columns.append(column)
+    logger.info("Columns chosen for dictionary encoding: {}".format(columns))
+    return columns
+
+
+def get_lookup_tablename(tablename, column):
+    """Return the name of the lookup table of `column` in table `tablename`."""
+    return '{}__{}'.format(tablename, column)
+
+
+def get_view_name(tablename):
+    """Return the name of the view which decodes the encoded columns of table `tablename`."""
+    return '{}__view'.format(tablename)
+
+
+def get_view_query(tablename, columns, encoded_columns):
+    """Return a query which selects `columns` from `tablename`, replacing the codes of
+    `encoded_columns` with their values.
+
+    Examples
+    --------
+    >>> print(get_view_query('variants', ['gene', 'pos'], ['gene']))
+    SELECT variants__gene.value AS gene, variants.pos
+    FROM variants LEFT OUTER JOIN variants__gene ON variants__gene.id = variants.gene
+    """
+    table = sa.table(tablename, *[sa.column(c) for c in columns])
+    from_clause = table
+    selected = []
+    for column in columns:
+        if column in encoded_columns:
+            lookup = sa.table(
+                get_lookup_tablename(tablename, column), sa.column('id'), sa.column('value'))
+            from_clause = from_clause.outerjoin(lookup, lookup.c.id == table.c[column])
+            selected.append(lookup.c.value.label(column))
+        else:
+            selected.append(table.c[column])
+    return sa.select(selected).select_from(from_clause)
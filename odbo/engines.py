@@ -0,0 +1,106 @@
+"""Share SQLAlchemy engines, and their connection pools, within a process.
+
+Every :class:`odbo.MySQLConnection` (and every table that it returns) used to create its own
+engine, so a pool of workers, each creating a few connection objects, opened a storm of
+database connections. Engines are now created once per connection string and process.
+
+Examples
+--------
+>>> engine = get_engine('sqlite://')
+>>> engine is get_engine('sqlite://')
+True
+>>> fetch_column(engine, 'SELECT 1 UNION ALL SELECT 2')
+[1, 2]
+>>> fetch_value(engine, 'SELECT :value', value='a')
+'a'
+"""
+import logging
+import os
+import threading
+
+import sqlalchemy as sa
+
+logger = logging.getLogger(__name__)
+
+#: Default number of connections kept open by every engine
+POOL_SIZE = 5
+
+#: Default number of connections which can be opened on top of `POOL_SIZE`
+MAX_OVERFLOW = 10
+
+#: Backends which use a pool with a fixed number of connections (``QueuePool``)
+_QUEUE_POOL_BACKENDS = ['mysql', 'postgresql']
+
+_ENGINES = {}
+_DATABASES = {}
+_LOCK = threading.Lock()
+
+
+def get_engine(
+        connection_string, echo=False, pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW,
+        pool_pre_ping=True):
+    """Return the engine for `connection_string`, creating it the first time.
+
+    Engines are not shared with child processes, which get engines of their own.
+
+    Parameters
+    ----------
+    pool_size : int
+        Number of connections to keep open. Ignored by SQLite.
+        Only used when the engine is first created.
+    max_overflow : int
+        Number of connections which can be opened on top of `pool_size`.
+    pool_pre_ping : bool
+        Whether to check that a connection is still alive before using it,
+        e.g. in case the server has been restarted.
+    """
+    key = (os.getpid(), connection_string, echo)
+    with _LOCK:
+        engine = _ENGINES.get(key)
+        if engine is None:
+            engine_opts = dict(echo=echo, pool_pre_ping=pool_pre_ping)
+            backend = sa.engine.url.make_url(connection_string).get_backend_name()
+            if backend in _QUEUE_POOL_BACKENDS:
+                engine_opts.update(pool_size=pool_size, max_overflow=max_overflow)
+            logger.debug("Creating engine for {!r}...".format(connection_string))
+            engine = sa.create_engine(connection_string, **engine_opts)
+            _ENGINES[key] = engine
+    return engine
+
+
+def dispose_engines():
+    """Close all pooled connections, and forget all engines and cached database names."""
+    with _LOCK:
+        for engine in _ENGINES.values():
+            engine.dispose()
+        _ENGINES.clear()
+        _DATABASES.clear()
+
+
+def get_databases(engine, sql_query, refresh=False):
+    """Return the names of the databases on the server of `engine` (cached).
+
+    Parameters
+    ----------
+    sql_query : str
+        Query which returns database names, in the first column.
+    refresh : bool
+        Whether to query the server even if database names have been cached
+        (e.g. after creating a database).
+    """
+    key = (os.getpid(), str(engine.url))
+    if refresh or key not in _DATABASES:
+        _DATABASES[key] = set(fetch_column(engine, sql_query))
+    return _DATABASES[key]
+
+
+def fetch_column(engine, sql_query, **params):
+    """Return the first column of the results of `sql_query`, without going through pandas."""
+    with engine.connect() as connection:
+        return [row[0] for row in connection.execute(sa.text(sql_query), **params)]
+
+
+def fetch_value(engine, sql_query, **params):
+    """Return the first value of the results of `sql_query` (or None)."""
+    with engine.connect() as connection:
+        return connection.execute(sa.text(sql_query), **params).scalar()
@@ -0,0 +1,467 @@
+"""Estimate how much disk space a table takes up, and how long it takes to load, before loading it.
+
+Estimates are extrapolated from a sample at the start of the input file, without touching
+the database:
+
+- the compression ratio of the file, and the size of the decompressed data;
+- the average number of bytes per line, and the number of rows;
+- the width of a row, using the column types inferred from the sample;
+- the size of the table for every engine in :data:`ENGINES`, and the size of its indexes;
+- the time taken by every stage of the import, using the throughput in :data:`THROUGHPUT`,
+  or the throughput recorded during earlier imports (see :func:`record_throughput`).
+
+Engines are functions of an :class:`ImportEstimate`, so further engines (or better models)
+can be added to :data:`ENGINES`.
+
+Examples
+--------
+>>> import gzip, tempfile
+>>> file = op.join(tempfile.mkdtemp(), 'genes.tsv.gz')
+>>> with gzip.open(file, 'wt') as ofh:
+...     _ = ofh.write('gene_id\\tgene_name\\n')
+...     for i in range(1000):
+...         _ = ofh.write('{}\\tGENE{}\\n'.format(i, i % 10))
+>>> estimate = estimate_import(file, sep='\\t')
+>>> estimate.num_rows, estimate.exact
+(1000, True)
+>>> estimate.primary_key
+'gene_id'
+"""
+import bz2
+import io
+import json
+import logging
+import lzma
+import math
+import os
+import os.path as op
+import statistics
+import subprocess
+import tempfile
+import time
+import zlib
+
+import pandas as pd
+import sqlalchemy as sa
+
+from kmtools.df_tools import format_columns, get_df_dtypes
+from odbo._format_file_bash import get_sed_command, get_sed_substitutions
+from odbo.cache import CACHE_DIR
+from odbo.commands import Command
+from odbo.progress import format_bytes, format_duration
+from odbo.schema import get_column_stats, get_dtype_size, optimize_schema
+from odbo.table import (
+    MAX_AUTO_INDEXES, MAX_INDEX_KEY_LENGTH, MIN_INDEX_SELECTIVITY, _choose_indexes,
+    _is_indexable)
+
+logger = logging.getLogger(__name__)
+
+#: Number of decompressed bytes sampled from the start of the input file
+SAMPLE_SIZE = 8 * 1024 * 1024
+
+#: Default throughput of every stage of an import, in bytes per second: decompressed bytes
+#: for 'decompress' and 'load', and index bytes for 'index'.
+#: These are rough figures for a single server with local disks.
+THROUGHPUT = {
+    'decompress': 100e6,
+    'load': 40e6,
+    'index': 20e6,
+}
+
+#: File in which the throughput measured during imports is recorded
+THROUGHPUT_FILE = op.join(op.dirname(CACHE_DIR), 'throughput.json')
+
+#: Number of measurements kept for every stage
+MAX_MEASUREMENTS = 20
+
+#: Bytes added to every row by InnoDB (record header, transaction ID and roll pointer)
+INNODB_ROW_OVERHEAD = 18
+
+#: Fraction of every InnoDB page which is filled during a sequential load
+INNODB_FILL_FACTOR = 15 / 16
+
+#: Smallest fraction of its size that an InnoDB page can be compressed to
+#: (``KEY_BLOCK_SIZE=8`` for the default page size of 16 KB)
+INNODB_MIN_COMPRESSION = 0.5
+
+#: Size of a row pointer in a MyISAM index
+MYISAM_POINTER_SIZE = 6
+
+#: Average fraction of every B-tree page which is filled
+INDEX_FILL_FACTOR = 2 / 3
+
+_DECOMPRESSORS = {
+    '.gz': lambda: zlib.decompressobj(zlib.MAX_WBITS | 32),
+    '.bz2': bz2.BZ2Decompressor,
+    '.xz': lzma.LZMADecompressor,
+}
+
+
+class ImportEstimate:
+    """Estimated size of a table, and time taken to load it.
+
+    Attributes
+    ----------
+    file_size : int
+        Size of the input file.
+    compression_ratio : float
+        Ratio of the decompressed size to the size of the input file.
+    decompressed_size : int
+    num_rows : int
+    exact : bool
+        Whether the entire file was sampled, so that `num_rows` is exact.
+    dtypes : dict
+        Column types inferred from the sample.
+    row_width : float
+        Average number of bytes in a row, stored as `dtypes`.
+    sample : DataFrame
+        Rows of the sample.
+    table_sizes : dict
+        Estimated size of the data, for every engine in :data:`ENGINES`.
+    primary_key : str | None
+    index_sizes : dict
+        Estimated size of every index (``PRIMARY`` for the primary key).
+    durations : dict
+        Estimated number of seconds taken by every stage of the import.
+    """
+
+    def __init__(
+            self, file, file_size, compression_ratio, num_rows, exact, dtypes, sample,
+            column_stats):
+        self.file = file
+        self.file_size = file_size
+        self.compression_ratio = compression_ratio
+        self.decompressed_size = int(file_size * compression_ratio)
+        self.num_rows = num_rows
+        self.exact = exact
+        self.dtypes = dtypes
+        self.sample = sample
+        self.column_stats = column_stats
+        self.row_width = sum(
+            get_dtype_size(dtypes[c], column_stats.get(c)) for c in sample.columns)
+        self.table_sizes = {}
+        self.primary_key = None
+        self.index_sizes = {}
+        self.durations = {}
+
+    def __repr__(self):
+        return 'ImportEstimate({!r}, num_rows={}, table_sizes={})'.format(
+            self.file, self.num_rows, self.table_sizes)
+
+    @property
+    def duration(self):
+        """Estimated number of seconds taken by the entire import."""
+        return sum(self.durations.values())
+
+    def format(self):
+        """Describe the estimates in a few lines of text (e.g. to print a plan)."""
+        lines = [
+            "File: {} ({}, compression ratio {:.1f})".format(
+                self.file, format_bytes(self.file_size), self.compression_ratio),
+            "Decompressed size: {}".format(format_bytes(self.decompressed_size)),
+            "Rows: {}{:,} ({:.0f} bytes per row)".format(
+                '' if self.exact else '~', self.num_rows, self.row_width),
+            "Table size:",
+        ]
+        lines += [
+            "  {:<24}{:>12}".format(engine, format_bytes(size))
+            for engine, size in self.table_sizes.items()
+        ]
+        if self.index_sizes:
+            lines.append("Indexes:")
+            lines += [
+                "  {:<24}{:>12}".format(name, format_bytes(size))
+                for name, size in self.index_sizes.items()
+            ]
+        lines.append("Load time: {}".format(format_duration(self.duration)))
+        lines += [
+            "  {:<24}{:>12}".format(stage, format_duration(seconds))
+            for stage, seconds in self.durations.items()
+        ]
+        return '\n'.join(lines)
+
+
+def estimate_import(
+        file, dtypes=None, extra_dtypes=None, index_commands=None, primary_key=None,
+        optimize_dtypes=False, extra_substitutions=None, engines=None, throughput=None,
+        sample_size=SAMPLE_SIZE, **csv_opts):
+    """Estimate the size of the table that `file` would be loaded into, and the load time.
+
+    Parameters
+    ----------
+    file : str
+        Input file, optionally compressed (``.gz``, ``.bz2`` or ``.xz``).
+    dtypes : dict | None
+        Column types. Inferred from the sample by default.
+    extra_dtypes : dict | None
+        Column types which override the inferred ones.
+    index_commands : list | None
+        Indexes to create (see :meth:`odbo.table.MySQLTable.create_indexes`).
+        If both `index_commands` and `primary_key` are None, use the indexes proposed
+        for the sample (see :meth:`odbo.table.MySQLTable.auto_index`).
+    optimize_dtypes : bool
+        Whether to use the narrowest column types which fit the sample
+        (see :func:`odbo.schema.optimize_schema`).
+    extra_substitutions : list | None
+        ``sed`` expressions applied to the file before it is loaded. The meta-information
+        lines of VCF files are removed as well.
+    engines : dict | None
+        Functions estimating the size of the table, by engine. Defaults to :data:`ENGINES`.
+    throughput : dict | None
+        Throughput of every stage, in bytes per second. Defaults to the throughput recorded
+        during earlier imports (see :func:`get_throughput`).
+    csv_opts : dict
+        Options used to parse the file (see :meth:`odbo.MySQLConnection.import_file`).
+
+    Returns
+    -------
+    estimate : ImportEstimate
+    """
+    engines = engines if engines is not None else ENGINES
+    throughput = {**get_throughput(), **(throughput or {})}
+    data, compressed_size, eof = sample_file(file, sample_size)
+    formatted_data = _format_sample(
+        data, csv_opts.get('sep', '\t'), get_sed_substitutions(file, extra_substitutions))
+    df, header_size = _parse_sample(formatted_data, **csv_opts)
+    # Lines removed by the formatter (e.g. VCF meta-information) are counted as the header
+    header_size += len(data) - len(formatted_data)
+    if dtypes is None:
+        dtypes = get_df_dtypes(df)
+    if optimize_dtypes:
+        dtypes, _, _ = optimize_schema([df], dtypes)
+    if extra_dtypes:
+        dtypes = {**dtypes, **extra_dtypes}
+    file_size = op.getsize(file)
+    compression_ratio = len(data) / compressed_size if compressed_size else 1.0
+    if eof:
+        num_rows = len(df)
+    else:
+        bytes_per_row = (len(data) - header_size) / max(len(df), 1)
+        num_rows = int((file_size * compression_ratio - header_size) / bytes_per_row)
+    estimate = ImportEstimate(
+        file, file_size, compression_ratio, num_rows, eof, dtypes, df, get_column_stats([df]))
+    estimate.table_sizes = {name: int(engine(estimate)) for name, engine in engines.items()}
+    if index_commands is None and primary_key is None:
+        primary_key, index_commands = _propose_indexes(df, dtypes)
+    estimate.primary_key = primary_key
+    estimate.index_sizes = _estimate_index_sizes(estimate, index_commands or [], primary_key)
+    estimate.durations = _estimate_durations(estimate, throughput)
+    return estimate
+
+
+def sample_file(file, sample_size=SAMPLE_SIZE, chunksize=4096):
+    """Decompress at least `sample_size` bytes from the start of `file`.
+
+    Returns
+    -------
+    data : bytes
+        Decompressed data, up to the end of the last complete line.
+    compressed_size : int
+        Number of bytes of `file` which were decompressed into `data`. Decompressors which
+        work on blocks (e.g. ``bzip2``) hold on to input until a block is complete,
+        so only the input read until the last block of output is counted.
+    eof : bool
+        Whether the entire file was read.
+    """
+    extension = op.splitext(file)[-1]
+    decompressor = _DECOMPRESSORS[extension]() if extension in _DECOMPRESSORS else None
+    blocks = []
+    data_size = 0
+    num_read = 0
+    compressed_size = 0
+    eof = False
+    with open(file, 'rb') as ifh:
+        while data_size < sample_size:
+            block = ifh.read(chunksize)
+            if not block:
+                eof = True
+                break
+            num_read += len(block)
+            if decompressor is not None:
+                block = decompressor.decompress(block)
+            if block:
+                blocks.append(block)
+                data_size += len(block)
+                compressed_size = num_read
+    data = b''.join(blocks)
+    if not eof:
+        data = data[:data.rfind(b'\n') + 1]
+    return data, compressed_size, eof
+
+
+def get_throughput(filename=None):
+    """Return the throughput of every stage: the median of the recorded measurements,
+    or the default in :data:`THROUGHPUT`.
+    """
+    throughput = dict(THROUGHPUT)
+    measurements = _read_measurements(filename)
+    throughput.update({
+        stage: statistics.median(rates) for stage, rates in measurements.items() if rates
+    })
+    return throughput
+
+
+def record_throughput(stage, num_bytes, seconds, filename=None, min_seconds=1.0):
+    """Record that stage `stage` processed `num_bytes` bytes in `seconds` seconds.
+
+    Measurements shorter than `min_seconds` are ignored, since they are dominated by
+    fixed overheads. Only the last :data:`MAX_MEASUREMENTS` measurements are kept.
+    """
+    if seconds < min_seconds or not num_bytes:
+        return
+    filename = filename if filename is not None else THROUGHPUT_FILE
+    measurements = _read_measurements(filename)
+    rates = measurements.setdefault(stage, [])
+    rates.append(num_bytes / seconds)
+    del rates[:-MAX_MEASUREMENTS]
+    try:
+        os.makedirs(op.dirname(filename), exist_ok=True)
+        fd, tmp_filename = tempfile.mkstemp(dir=op.dirname(filename))
+        with os.fdopen(fd, 'w') as ofh:
+            json.dump(measurements, ofh, indent=2, sort_keys=True)
+        os.replace(tmp_filename, filename)
+    except OSError as e:
+        logger.warning("Could not record throughput: {!r}".format(e))
+
+
+class ThroughputTimer:
+    """Context manager which records the throughput of `stage` when it exits without errors.
+
+    `num_bytes` can be a function, called once the stage is finished.
+    """
+
+    def __init__(self, stage, num_bytes, filename=None):
+        self.stage = stage
+        self.num_bytes = num_bytes
+        self.filename = filename
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            num_bytes = self.num_bytes() if callable(self.num_bytes) else self.num_bytes
+            record_throughput(
+                self.stage, num_bytes, time.monotonic() - self.start, self.filename)
+
+
+def _read_measurements(filename=None):
+    filename = filename if filename is not None else THROUGHPUT_FILE
+    try:
+        with open(filename) as ifh:
+            return json.load(ifh)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _format_sample(data, sep, extra_substitutions):
+    """Apply `extra_substitutions` to sampled `data`, as the formatter would."""
+    sed_command = get_sed_command(sep, None, extra_substitutions)
+    if not sed_command:
+        return data
+    with Command(
+            sed_command, shell=True, stdin=subprocess.PIPE, stdout=subprocess.PIPE) as command:
+        formatted_data, _ = command.process.communicate(data)
+        if command.process.returncode:
+            raise subprocess.CalledProcessError(command.process.returncode, sed_command)
+    return formatted_data
+
+
+def _parse_sample(data, **csv_opts):
+    """Parse sampled `data`, returning the rows and the size of the header."""
+    csv_opts = {k: v for k, v in csv_opts.items() if k != 'nrows'}
+    df = pd.read_csv(io.BytesIO(data), low_memory=False, **csv_opts)
+    df.columns = format_columns(df.columns)
+    header_lines = csv_opts.get('skiprows', 0) + (csv_opts.get('names') is None)
+    header_size = 0
+    for _ in range(header_lines):
+        header_size = data.find(b'\n', header_size) + 1
+    return df, header_size
+
+
+# === Engines ===
+
+def estimate_myisam_size(estimate):
+    """MyISAM rows in the dynamic format: a header, a bitmap of nulls and the values."""
+    num_nullable = sum(s.num_nulls > 0 for s in estimate.column_stats.values())
+    row_size = 3 + math.ceil(num_nullable / 8) + estimate.row_width
+    return estimate.num_rows * max(row_size, 20)
+
+
+def estimate_packed_myisam_size(estimate):
+    """MyISAM rows packed by ``myisampack``, which Huffman-codes every column separately."""
+    df = estimate.sample
+    if df.empty:
+        return 0
+    packed_size = 0
+    for column in df.columns:
+        values = '\n'.join(df[column].astype(str)).encode('utf-8')
+        compressor = zlib.compressobj(9, zlib.DEFLATED, -zlib.MAX_WBITS, 9, zlib.Z_HUFFMAN_ONLY)
+        packed_size += len(compressor.compress(values) + compressor.flush())
+    return estimate.num_rows * (packed_size / len(df) + 1)
+
+
+def estimate_innodb_compressed_size(estimate):
+    """InnoDB pages compressed with zlib (``ROW_FORMAT=COMPRESSED``)."""
+    df = estimate.sample
+    data = df.to_csv(sep='\t', index=False, header=False).encode('utf-8')
+    ratio = len(zlib.compress(data, 6)) / len(data) if data else 1
+    page_size = (
+        estimate.num_rows * (estimate.row_width + INNODB_ROW_OVERHEAD) / INNODB_FILL_FACTOR)
+    return page_size * max(ratio, INNODB_MIN_COMPRESSION)
+
+
+#: Functions estimating the size of the data, by storage engine
+ENGINES = {
+    'MyISAM': estimate_myisam_size,
+    'MyISAM (packed)': estimate_packed_myisam_size,
+    'InnoDB (compressed)': estimate_innodb_compressed_size,
+}
+
+
+# === Indexes and durations ===
+
+def _propose_indexes(df, dtypes):
+    columns = [c for c in df.columns if _is_indexable(dtypes.get(c))]
+    cardinality = pd.DataFrame({
+        'num_rows': [len(df)] * len(columns),
+        'num_nulls': [int(df[c].isnull().sum()) for c in columns],
+        'num_distinct': [df[c].nunique() for c in columns],
+    }, index=columns, columns=['num_rows', 'num_nulls', 'num_distinct'])
+    return _choose_indexes(cardinality, dtypes, MIN_INDEX_SELECTIVITY, MAX_AUTO_INDEXES)
+
+
+def _get_key_size(estimate, column):
+    dtype = estimate.dtypes.get(column)
+    stats = estimate.column_stats.get(column)
+    if isinstance(dtype, sa.String) and not isinstance(dtype, sa.Enum):
+        return min(stats.avg_length if stats is not None else 0, MAX_INDEX_KEY_LENGTH) + 1
+    return get_dtype_size(dtype, stats)
+
+
+def _estimate_index_sizes(estimate, index_commands, primary_key):
+    indexes = []
+    if primary_key is not None:
+        indexes.append(
+            ('PRIMARY', [primary_key] if isinstance(primary_key, str) else list(primary_key)))
+    for column, _ in index_commands:
+        columns = [column] if isinstance(column, str) else list(column)
+        indexes.append(('_'.join(columns), columns))
+    return {
+        name: int(
+            estimate.num_rows *
+            (sum(_get_key_size(estimate, c) for c in columns) + MYISAM_POINTER_SIZE) /
+            INDEX_FILL_FACTOR)
+        for name, columns in indexes
+    }
+
+
+def _estimate_durations(estimate, throughput):
+    durations = {}
+    if estimate.compression_ratio != 1.0:
+        durations['decompress'] = estimate.decompressed_size / throughput['decompress']
+    durations['load'] = estimate.decompressed_size / throughput['load']
+    if estimate.index_sizes:
+        durations['index'] = sum(estimate.index_sizes.values()) / throughput['index']
+    return durations
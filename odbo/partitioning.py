@@ -0,0 +1,183 @@
+"""Split MySQL tables into partitions, and assign rows to the partitions they belong to.
+
+Every partition of a partitioned MyISAM table is stored in its own ``.MYD`` / ``.MYI`` files,
+so partitions can be loaded in parallel and compressed independently, and queries which
+filter on the partitioning column only read the relevant partitions (partition pruning).
+
+Examples
+--------
+>>> partitioning = Partitioning('LIST', 'chrom', {'p1': ['1'], 'p2': ['2'], 'pXY': ['X', 'Y']})
+>>> print(partitioning.get_sql())
+PARTITION BY LIST COLUMNS(`chrom`) (
+  PARTITION p1 VALUES IN ('1'),
+  PARTITION p2 VALUES IN ('2'),
+  PARTITION pXY VALUES IN ('X', 'Y')
+)
+>>> list(partitioning.assign(pd.Series(['2', 'Y', '1'])))
+['p2', 'pXY', 'p1']
+"""
+import numpy as np
+import pandas as pd
+
+#: Supported partitioning methods
+PARTITIONING_METHODS = ['RANGE', 'LIST', 'HASH', 'KEY']
+
+
+class Partitioning:
+    """Partitioning scheme of a MySQL table.
+
+    Parameters
+    ----------
+    method : str
+        One of 'RANGE', 'LIST', 'HASH' or 'KEY'.
+    column : str
+        Partitioning column. ``HASH`` partitioning requires an integer column.
+    partitions : dict | int
+        For ``RANGE``, a mapping of partition names to (exclusive) upper bounds,
+        in increasing order, where None stands for ``MAXVALUE``.
+        For ``LIST``, a mapping of partition names to lists of values.
+        For ``HASH`` and ``KEY``, the number of partitions.
+    """
+
+    def __init__(self, method, column, partitions):
+        method = method.upper()
+        if method not in PARTITIONING_METHODS:
+            raise ValueError(
+                "Partitioning method must be one of {}, not '{}'!"
+                .format(PARTITIONING_METHODS, method))
+        if (method in ['HASH', 'KEY']) != isinstance(partitions, int):
+            raise ValueError(
+                "'{}' partitioning requires {}!".format(
+                    method,
+                    'the number of partitions' if method in ['HASH', 'KEY'] else
+                    'a dictionary of partitions'))
+        self.method = method
+        self.column = column
+        self.partitions = partitions
+
+    def __repr__(self):
+        return "Partitioning({!r}, {!r}, {!r})".format(self.method, self.column, self.partitions)
+
+    @property
+    def names(self):
+        """Partition names (``HASH`` and ``KEY`` partitions are named p0, p1, ...)."""
+        if isinstance(self.partitions, int):
+            return ['p{}'.format(i) for i in range(self.partitions)]
+        return list(self.partitions)
+
+    @property
+    def is_routable(self):
+        """Whether rows can be assigned to partitions outside of the database.
+
+        ``KEY`` partitioning uses a hash function internal to MySQL.
+        """
+        return self.method != 'KEY'
+
+    def get_sql(self):
+        """Return the ``PARTITION BY`` clause of this partitioning scheme.
+
+        Examples
+        --------
+        >>> print(Partitioning('HASH', 'pos', 4).get_sql())
+        PARTITION BY HASH(`pos`) PARTITIONS 4
+        >>> print(Partitioning('RANGE', 'pos', {'p0': 1000, 'p1': None}).get_sql())
+        PARTITION BY RANGE COLUMNS(`pos`) (
+          PARTITION p0 VALUES LESS THAN (1000),
+          PARTITION p1 VALUES LESS THAN (MAXVALUE)
+        )
+        """
+        if self.method in ['HASH', 'KEY']:
+            return 'PARTITION BY {}(`{}`) PARTITIONS {}'.format(
+                self.method, self.column, self.partitions)
+        if self.method == 'RANGE':
+            definitions = [
+                'PARTITION {} VALUES LESS THAN ({})'.format(
+                    name, 'MAXVALUE' if bound is None else _format_value(bound))
+                for name, bound in self.partitions.items()
+            ]
+        else:
+            definitions = [
+                'PARTITION {} VALUES IN ({})'.format(
+                    name, ', '.join(_format_value(v) for v in values))
+                for name, values in self.partitions.items()
+            ]
+        return 'PARTITION BY {} COLUMNS(`{}`) (\n  {}\n)'.format(
+            self.method, self.column, ',\n  '.join(definitions))
+
+    def assign(self, values):
+        """Return the name of the partition that every value in `values` belongs to.
+
+        Parameters
+        ----------
+        values : Series
+            Values of the partitioning column, as strings or as numbers.
+
+        Returns
+        -------
+        names : Series
+            Partition names, with the same index as `values`.
+
+        Raises
+        ------
+        ValueError
+            If some of the values do not belong to any partition.
+        """
+        if not self.is_routable:
+            raise ValueError("Rows cannot be assigned to '{}' partitions!".format(self.method))
+        get_names = {
+            'RANGE': self._assign_range,
+            'LIST': self._assign_list,
+            'HASH': self._assign_hash,
+        }[self.method]
+        names = get_names(values)
+        if names.isnull().any():
+            raise ValueError(
+                "Values {} do not belong to any partition!"
+                .format(list(values[names.isnull()].unique()[:10])))
+        return names
+
+    def _assign_list(self, values):
+        lookup = {
+            (None if v is None else str(v)): name
+            for name, partition_values in self.partitions.items()
+            for v in partition_values
+        }
+        names = values.map(lambda v: lookup.get(None if pd.isnull(v) else str(v)))
+        return names.astype(object)
+
+    def _assign_range(self, values):
+        names = self.names
+        bounds = [b for b in self.partitions.values() if b is not None]
+        is_numeric = all(isinstance(b, (int, float)) for b in bounds)
+        if is_numeric:
+            values = pd.to_numeric(values)
+        notnull = values.notnull()
+        idxs = np.zeros(len(values), dtype=int)
+        idxs[notnull.values] = np.searchsorted(
+            np.array(bounds, dtype=None if is_numeric else object),
+            values[notnull].values, side='right')
+        # MySQL sorts NULL before any other value
+        return pd.Series(
+            [names[i] if i < len(names) else None for i in idxs],
+            index=values.index, dtype=object)
+
+    def _assign_hash(self, values):
+        # MySQL uses ``ABS(MOD(value, num_partitions))``, and puts NULL into the first partition
+        values = pd.to_numeric(values).fillna(0).astype(np.int64)
+        idxs = np.abs(np.fmod(values.values, self.partitions))
+        return pd.Series(np.array(self.names, dtype=object)[idxs], index=values.index)
+
+
+def _format_value(value):
+    """
+    Examples
+    --------
+    >>> _format_value(10), _format_value("O'Brien"), _format_value(None)
+    ('10', "'O''Brien'", 'NULL')
+    """
+    if value is None:
+        return 'NULL'
+    elif isinstance(value, (int, float)):
+        return str(value)
+    else:
+        return "'{}'".format(str(value).replace("'", "''"))
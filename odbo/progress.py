@@ -0,0 +1,263 @@
+"""Report the progress of long-running imports, with throughput and estimated time left.
+
+Progress is measured in bytes: input bytes consumed while decompressing and formatting
+a file, bytes streamed to the database while loading it, and bytes read by ``myisampack``
+and ``myisamchk`` while compressing a table.
+
+Callbacks receive a :class:`Progress` object, at most every `min_interval` seconds,
+from whichever thread is doing the work, so they should return quickly (e.g. use
+``loop.call_soon_threadsafe`` to hand the progress over to an ``asyncio`` event loop).
+
+Examples
+--------
+>>> def callback(progress):
+...     print(progress.stage, progress.done, progress.fraction, progress.finished)
+>>> progress = Progress('load', total=10, callback=callback, min_interval=0)
+>>> chunks = list(iter_progress([b'abcd', b'efghij'], progress))
+load 4 0.4 False
+load 10 1.0 False
+load 10 1.0 True
+"""
+import logging
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+#: Minimum number of seconds between two progress reports
+MIN_INTERVAL = 1.0
+
+
+class Progress:
+    """Progress of one stage (e.g. 'format' or 'load') of a long-running operation.
+
+    Parameters
+    ----------
+    stage : str
+        Name of the stage.
+    total : int | None
+        Total number of bytes, if known.
+    callback : callable | None
+        Function called with this object whenever progress is made,
+        at most every `min_interval` seconds, and once more when the stage is finished.
+    """
+
+    def __init__(self, stage, total=None, callback=None, min_interval=MIN_INTERVAL):
+        self.stage = stage
+        self.total = total
+        self.callback = callback
+        self.min_interval = min_interval
+        self.done = 0
+        self.finished = False
+        self.start_time = time.monotonic()
+        self._last_report_time = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return 'Progress({})'.format(format_progress(self))
+
+    @property
+    def elapsed(self):
+        """Number of seconds since the start of the stage."""
+        return time.monotonic() - self.start_time
+
+    @property
+    def rate(self):
+        """Number of bytes processed per second."""
+        elapsed = self.elapsed
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def fraction(self):
+        """Fraction of the work which is done, or None if the total is not known."""
+        if not self.total:
+            return 1.0 if self.finished else None
+        return min(self.done / self.total, 1.0)
+
+    @property
+    def eta(self):
+        """Estimated number of seconds left, or None if it can not be estimated."""
+        if self.finished:
+            return 0.0
+        rate = self.rate
+        if not self.total or not rate:
+            return None
+        return max(self.total - self.done, 0) / rate
+
+    def update(self, num_bytes):
+        """Add `num_bytes` to the number of bytes done."""
+        with self._lock:
+            self.done += num_bytes
+        self._report()
+
+    def set(self, done):
+        """Set the number of bytes done (e.g. when sampling the progress of a subprocess)."""
+        with self._lock:
+            self.done = max(self.done, done)
+        self._report()
+
+    def finish(self):
+        """Mark the stage as finished, and report it."""
+        self.finished = True
+        self._report(force=True)
+
+    def _report(self, force=False):
+        if self.callback is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if (not force and self._last_report_time is not None and
+                    now - self._last_report_time < self.min_interval):
+                return
+            self._last_report_time = now
+        try:
+            self.callback(self)
+        except Exception:
+            # Never let progress reporting break an import
+            logger.exception("Progress callback failed!")
+
+
+def make_progress(stage, total=None, callback=None):
+    """Return a :class:`Progress` reporting to `callback`, or None if `callback` is None."""
+    if callback is None:
+        return None
+    return Progress(stage, total=total, callback=callback)
+
+
+def iter_progress(chunks, progress):
+    """Yield blocks of bytes from `chunks`, counting them in `progress`."""
+    for chunk in chunks:
+        yield chunk
+        progress.update(len(chunk))
+    progress.finish()
+
+
+class ProgressMonitor:
+    """Sample the progress of work done elsewhere (e.g. in a subprocess) in a background thread.
+
+    Parameters
+    ----------
+    get_done : callable
+        Function which returns the number of bytes done so far, or None if unknown.
+    """
+
+    def __init__(self, progress, get_done, interval=MIN_INTERVAL):
+        self.progress = progress
+        self.get_done = get_done
+        self.interval = interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self.progress
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stopped.set()
+        self._thread.join()
+        if exc_type is None:
+            if self.progress.total is not None:
+                self.progress.set(self.progress.total)
+            self.progress.finish()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            done = self.get_done()
+            if done is not None:
+                self.progress.set(done)
+
+
+def get_process_bytes_read(pid):
+    """Return the number of bytes read by process `pid` so far, or None if not available.
+
+    Uses ``/proc/<pid>/io``, which is Linux-specific.
+    """
+    try:
+        with open('/proc/{}/io'.format(pid)) as ifh:
+            for line in ifh:
+                if line.startswith('rchar:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class ProgressBar:
+    """Progress callback which draws a progress bar on a terminal.
+
+    Examples
+    --------
+    >>> import io
+    >>> fh = io.StringIO()
+    >>> progress = Progress('load', total=2 * 1024 ** 2, callback=ProgressBar(fh, width=10))
+    >>> progress.done = 1024 ** 2
+    >>> progress.callback(progress)
+    >>> fh.getvalue().split('%')[0]
+    '\\rload [#####     ]  50.0'
+    """
+
+    def __init__(self, file=None, width=30):
+        self.file = file if file is not None else sys.stderr
+        self.width = width
+
+    def __call__(self, progress):
+        fraction = progress.fraction
+        if fraction is None:
+            bar = ''
+        else:
+            num_filled = int(round(fraction * self.width))
+            bar = ' [{}{}]'.format('#' * num_filled, ' ' * (self.width - num_filled))
+        self.file.write('\r{}{} {}'.format(progress.stage, bar, format_progress(progress, False)))
+        if progress.finished:
+            self.file.write('\n')
+        self.file.flush()
+
+
+def format_progress(progress, with_stage=True):
+    """
+    Examples
+    --------
+    >>> progress = Progress('format', total=4 * 1024 ** 3)
+    >>> progress.done = 1024 ** 3
+    >>> format_progress(progress).split(',')[0]
+    'format:  25.0% 1.0 GB / 4.0 GB'
+    """
+    fraction = progress.fraction
+    eta = progress.eta
+    return '{}{}{} / {}, {}/s, ETA {}'.format(
+        progress.stage + ': ' if with_stage else '',
+        '{:5.1f}% '.format(fraction * 100) if fraction is not None else '',
+        format_bytes(progress.done),
+        format_bytes(progress.total) if progress.total is not None else '?',
+        format_bytes(progress.rate),
+        format_duration(eta) if eta is not None else '?')
+
+
+def format_bytes(num_bytes):
+    """
+    Examples
+    --------
+    >>> format_bytes(512), format_bytes(1536), format_bytes(3 * 1024 ** 3)
+    ('512 B', '1.5 KB', '3.0 GB')
+    """
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if num_bytes < 1024:
+            break
+        num_bytes /= 1024
+    else:
+        unit = 'TB'
+    return '{:.0f} {}'.format(num_bytes, unit) if unit == 'B' else '{:.1f} {}'.format(
+        num_bytes, unit)
+
+
+def format_duration(seconds):
+    """
+    Examples
+    --------
+    >>> format_duration(3725.2)
+    '1:02:05'
+    """
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return '{}:{:02d}:{:02d}'.format(hours, minutes, seconds)
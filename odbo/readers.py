@@ -0,0 +1,222 @@
+"""Read fixed-width and Excel (``.xlsx``) files in chunks of rows.
+
+Converting such files into CSV with pandas first means holding the entire file in memory.
+Instead, the readers in this module yield one DataFrame per `chunksize` rows, which can be
+streamed into the database as tab-separated blocks
+(see :meth:`odbo.MySQLConnection.import_df_chunks`).
+
+Examples
+--------
+>>> import io
+>>> ifh = io.BytesIO(b'''chrom  pos   ref
+... 1      100   A
+... X      20000 CT
+... ''')
+>>> colspecs, dfs = read_fwf(ifh)
+>>> colspecs
+[(0, 5), (7, 12), (13, None)]
+>>> next(dfs)
+  chrom    pos ref
+0     1    100   A
+1     X  20000  CT
+"""
+import itertools
+import logging
+import os.path as op
+from contextlib import ExitStack
+
+import pandas as pd
+
+from kmtools.df_tools import format_columns
+
+logger = logging.getLogger(__name__)
+
+#: Number of rows in every chunk
+CHUNKSIZE = 100000
+
+#: Number of lines used to infer the columns of fixed-width files
+INFER_NROWS = 1000
+
+#: Extensions of the files read by this module, which are not part of table names
+EXTENSIONS = ['.fwf', '.xlsx', '.xlsm']
+
+
+def infer_colspecs(lines):
+    """Infer the columns of fixed-width `lines`, as runs of positions which are not blank
+    in any of the lines.
+
+    The last column extends to the end of every line.
+
+    Examples
+    --------
+    >>> infer_colspecs(['id name', '1  abc', '10 de'])
+    [(0, 2), (3, None)]
+    """
+    filled = []
+    for line in lines:
+        if len(line) > len(filled):
+            filled.extend([False] * (len(line) - len(filled)))
+        for i, c in enumerate(line):
+            if not c.isspace():
+                filled[i] = True
+    colspecs = []
+    start = None
+    for i, is_filled in enumerate(filled + [False]):
+        if is_filled and start is None:
+            start = i
+        elif not is_filled and start is not None:
+            colspecs.append((start, i))
+            start = None
+    if colspecs:
+        colspecs[-1] = (colspecs[-1][0], None)
+    return colspecs
+
+
+def read_fwf(
+        file, colspecs='infer', names=None, skiprows=0, na_values=None,
+        infer_nrows=INFER_NROWS, chunksize=CHUNKSIZE):
+    """Read fixed-width file `file`, `chunksize` lines at a time.
+
+    Parameters
+    ----------
+    file : str | file object
+        Fixed-width file, optionally compressed (``.gz``, ``.bz2`` or ``.xz``),
+        or a binary file object.
+    colspecs : list | str
+        ``(start, end)`` offsets of every column (``end`` can be None for the last column),
+        or ``'infer'`` to infer them from the first `infer_nrows` lines
+        (see :func:`infer_colspecs`). Columns are inferred only once, so every chunk
+        is split in the same way.
+    names : list | None
+        Column names. If None, column names are read from the first line
+        (after `skiprows`).
+    skiprows : int
+        Number of lines to skip at the start of the file.
+    na_values : list | None
+        Values which should be read as nulls, on top of the defaults of :func:`pandas.read_csv`.
+
+    Returns
+    -------
+    colspecs : list
+    dfs : iterator of DataFrames
+        Formatted column names.
+    """
+    from kmtools import system_tools
+
+    stack = ExitStack()
+    if isinstance(file, str):
+        ifh = stack.enter_context(system_tools.open_compressed(file, 'rb'))
+    else:
+        ifh = file
+    try:
+        for _ in range(skiprows):
+            ifh.readline()
+        if colspecs == 'infer':
+            # Compressed files can be rewound as well, by decompressing them from the start
+            start = ifh.tell()
+            colspecs = infer_colspecs([
+                line.decode('utf-8').rstrip('\r\n')
+                for line in itertools.islice(ifh, infer_nrows)
+            ])
+            ifh.seek(start)
+            logger.debug("Inferred fixed-width columns: {}".format(colspecs))
+        dfs = pd.read_fwf(
+            ifh, colspecs=colspecs, names=names, header=0 if names is None else None,
+            na_values=na_values, chunksize=chunksize)
+    except Exception:
+        stack.close()
+        raise
+    return colspecs, _iter_closing(stack, _iter_formatted(dfs))
+
+
+def read_xlsx(file, sheet_name=None, skiprows=0, chunksize=CHUNKSIZE):
+    """Read worksheet `sheet_name` of Excel file `file`, `chunksize` rows at a time.
+
+    The workbook is opened in read-only mode (using ``openpyxl``), which reads rows as
+    they are needed instead of loading the entire worksheet. Formulas are read as the
+    values that were last calculated by Excel.
+
+    Parameters
+    ----------
+    sheet_name : str | None
+        Name of the worksheet. Defaults to the active worksheet.
+    skiprows : int
+        Number of rows to skip before the header row.
+
+    Returns
+    -------
+    columns : list
+        Formatted column names.
+    dfs : iterator of DataFrames
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        worksheet = workbook[sheet_name] if sheet_name is not None else workbook.active
+        rows = worksheet.iter_rows(values_only=True)
+        for _ in range(skiprows):
+            next(rows, None)
+        header = list(next(rows, None) or [])
+        # The dimensions of a worksheet may include empty cells after the last column
+        while header and header[-1] is None:
+            header.pop()
+        if not header:
+            raise ValueError("Worksheet '{}' of '{}' is empty!".format(worksheet.title, file))
+        columns = format_columns([
+            str(name) if name is not None else 'Unnamed: {}'.format(i)
+            for i, name in enumerate(header)
+        ])
+    except Exception:
+        workbook.close()
+        raise
+    stack = ExitStack()
+    stack.callback(workbook.close)
+    return columns, _iter_closing(stack, _iter_xlsx_frames(rows, columns, chunksize))
+
+
+def strip_extension(file):
+    """Remove the extensions of files read by this module from `file` (e.g. to name tables).
+
+    Examples
+    --------
+    >>> strip_extension('/data/GeneAnnotations.xlsx')
+    '/data/GeneAnnotations'
+    >>> strip_extension('/data/annotations.fwf.gz')
+    '/data/annotations'
+    """
+    basename, extension = op.splitext(file)
+    if extension.lower() in ['.gz', '.bz2', '.xz']:
+        basename, extension = op.splitext(basename)
+    return basename if extension.lower() in EXTENSIONS else file
+
+
+def _iter_xlsx_frames(rows, columns, chunksize):
+    num_columns = len(columns)
+    offset = 0
+    while True:
+        chunk = list(itertools.islice(rows, chunksize))
+        if not chunk:
+            return
+        records = [
+            tuple(row[:num_columns]) + (None, ) * (num_columns - len(row))
+            for row in chunk
+            if any(value is not None for value in row)
+        ]
+        if not records:
+            continue
+        df = pd.DataFrame.from_records(records, columns=columns).infer_objects()
+        df.index = pd.RangeIndex(offset, offset + len(df))
+        offset += len(df)
+        yield df
+
+
+def _iter_formatted(dfs):
+    for df in dfs:
+        df.columns = format_columns(df.columns)
+        yield df
+
+
+def _iter_closing(stack, dfs):
+    with stack:
+        yield from dfs
@@ -0,0 +1,509 @@
+"""Choose the narrowest column types which can hold the data.
+
+Column types inferred by :func:`kmtools.df_tools.get_df_dtypes` are deliberately generous
+(``INTEGER``, ``DOUBLE``, ``VARCHAR(255)``, ``MEDIUMTEXT``). Narrower columns mean smaller
+rows, which load faster, need smaller key caches, and are faster to scan.
+
+Examples
+--------
+>>> import pandas as pd
+>>> df = pd.DataFrame({'chrom': ['1', '2', 'X'] * 100, 'pos': range(300)})
+>>> dtypes, not_null, report = optimize_schema([df])
+>>> dtypes['chrom'], dtypes['pos']
+(ENUM('1', '2', 'X'), SMALLINT(unsigned=True))
+>>> sorted(not_null)
+['chrom', 'pos']
+"""
+import logging
+import re
+
+import pandas as pd
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+logger = logging.getLogger(__name__)
+
+#: Maximum number of distinct values in a column that is stored as ``ENUM``
+MAX_ENUM_VALUES = 255
+
+#: Integer types, from narrowest to widest, with their size in bytes
+INTEGER_TYPES = [
+    (mysql.TINYINT, 1),
+    (mysql.SMALLINT, 2),
+    (mysql.MEDIUMINT, 3),
+    (mysql.INTEGER, 4),
+    (mysql.BIGINT, 8),
+]
+
+#: Text types, from narrowest to widest, with the maximum length of the data and the number
+#: of bytes used to store that length
+TEXT_TYPES = [
+    (mysql.TEXT, 2 ** 16 - 1, 2),
+    (mysql.MEDIUMTEXT, 2 ** 24 - 1, 3),
+    (mysql.LONGTEXT, 2 ** 32 - 1, 4),
+]
+
+#: Other fixed-size types, with their size in bytes
+FIXED_SIZE_TYPES = [
+    (mysql.BOOLEAN, 1),
+    (mysql.FLOAT, 4),
+    (mysql.DATE, 3),
+    (mysql.DATETIME, 5),
+]
+
+#: Maximum length of a number or a date written out as a string
+NUMBER_LENGTH = 24
+BOOLEAN_LENGTH = len('False')
+DATE_LENGTH = len('YYYY-MM-DD')
+DATETIME_LENGTH = len('YYYY-MM-DD HH:MM:SS')
+
+DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+DATETIME_RE = re.compile(r'^\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}$')
+
+
+class ColumnStats:
+    """Statistics of a single column, accumulated one chunk of data at a time.
+
+    Attributes
+    ----------
+    kind : str
+        One of 'empty' (only nulls so far), 'bool', 'int', 'float', 'str' or 'mixed'.
+    distinct : set | None
+        Distinct values in the column, or None if there are more than `max_distinct`.
+    """
+
+    def __init__(self, max_distinct=MAX_ENUM_VALUES):
+        self.max_distinct = max_distinct
+        self.kind = 'empty'
+        self.count = 0
+        self.num_nulls = 0
+        self.min = None
+        self.max = None
+        self.is_integral = True
+        self.min_length = None
+        self.max_length = None
+        self.total_length = 0
+        self.is_date = True
+        self.is_datetime = True
+        self.distinct = set()
+
+    def __repr__(self):
+        return (
+            "ColumnStats(kind={!r}, count={}, num_nulls={}, min={!r}, max={!r}, max_length={})"
+            .format(self.kind, self.count, self.num_nulls, self.min, self.max, self.max_length))
+
+    def update(self, series):
+        """Update statistics with the values in `series`."""
+        # e.g. booleans with nulls are stored as objects
+        values = series.dropna().infer_objects()
+        self.num_nulls += len(series) - len(values)
+        if not len(values):
+            return
+        self.count += len(values)
+        self._update_kind(_get_kind(values))
+        if self.kind in ['int', 'float']:
+            self._update_numeric(values)
+        elif self.kind == 'str':
+            self._update_str(values.astype(str))
+        if self.distinct is not None and self.kind != 'float':
+            self.distinct.update(values.unique())
+            if len(self.distinct) > self.max_distinct:
+                self.distinct = None
+
+    def _update_kind(self, kind):
+        if self.kind == 'empty' or self.kind == kind:
+            self.kind = kind
+        elif {self.kind, kind} == {'int', 'float'}:
+            self.kind = 'float'
+        else:
+            self.kind = 'mixed'
+
+    def _update_numeric(self, values):
+        min_, max_ = values.min(), values.max()
+        self.min = min_ if self.min is None else min(self.min, min_)
+        self.max = max_ if self.max is None else max(self.max, max_)
+        if self.is_integral and values.dtype.kind == 'f':
+            self.is_integral = bool((values % 1 == 0).all())
+
+    def _update_str(self, values):
+        lengths = values.str.len()
+        min_length, max_length = int(lengths.min()), int(lengths.max())
+        self.min_length = (
+            min_length if self.min_length is None else min(self.min_length, min_length))
+        self.max_length = (
+            max_length if self.max_length is None else max(self.max_length, max_length))
+        self.total_length += int(lengths.sum())
+        if self.is_date:
+            self.is_date = bool(values.str.match(DATE_RE).all())
+        if self.is_datetime:
+            self.is_datetime = bool(values.str.match(DATETIME_RE).all())
+
+    @property
+    def avg_length(self):
+        return self.total_length / self.count if self.count else 0
+
+
+def _get_kind(values):
+    if values.dtype.kind == 'b':
+        return 'bool'
+    elif values.dtype.kind in 'iu':
+        return 'int'
+    elif values.dtype.kind == 'f':
+        return 'float'
+    elif values.dtype.kind == 'O' and all(isinstance(v, str) for v in values.iloc[:100]):
+        return 'str'
+    else:
+        return 'mixed'
+
+
+def get_column_stats(dfs, max_distinct=MAX_ENUM_VALUES):
+    """Accumulate statistics for every column in an iterable of DataFrames.
+
+    Parameters
+    ----------
+    dfs : iterable of DataFrames
+        Chunks of data (e.g. from ``pd.read_csv(..., chunksize=...)``).
+
+    Returns
+    -------
+    stats : dict
+        Mapping of column names to :class:`ColumnStats`.
+    """
+    stats = {}
+    for df in dfs:
+        for column in df.columns:
+            if column not in stats:
+                stats[column] = ColumnStats(max_distinct=max_distinct)
+            stats[column].update(df[column])
+    return stats
+
+
+def get_optimal_dtype(stats, max_enum_values=MAX_ENUM_VALUES):
+    """Return the narrowest column type which can hold the data described by `stats`.
+
+    Returns None if there is not enough information to choose a column type.
+    """
+    if stats.kind == 'bool':
+        return mysql.BOOLEAN()
+    elif stats.kind == 'int' or (stats.kind == 'float' and stats.is_integral):
+        return _get_integer_dtype(int(stats.min), int(stats.max))
+    elif stats.kind == 'float':
+        return mysql.DOUBLE()
+    elif stats.kind == 'str':
+        return _get_string_dtype(stats, max_enum_values)
+    else:
+        return None
+
+
+def _get_integer_dtype(min_, max_):
+    """
+    Examples
+    --------
+    >>> _get_integer_dtype(0, 255)
+    TINYINT(unsigned=True)
+    >>> _get_integer_dtype(-1, 255)
+    SMALLINT()
+    """
+    for dtype, num_bytes in INTEGER_TYPES:
+        num_bits = 8 * num_bytes
+        if min_ >= 0 and max_ < 2 ** num_bits:
+            return dtype(unsigned=True)
+        elif -2 ** (num_bits - 1) <= min_ and max_ < 2 ** (num_bits - 1):
+            return dtype()
+    raise ValueError("Integers between {} and {} do not fit into BIGINT!".format(min_, max_))
+
+
+def _get_string_dtype(stats, max_enum_values):
+    if stats.is_datetime:
+        return mysql.DATETIME()
+    elif stats.is_date:
+        return mysql.DATE()
+    # Only worth it if values repeat
+    elif (stats.distinct is not None and
+            len(stats.distinct) <= max_enum_values and
+            len(stats.distinct) * 2 <= stats.count):
+        return mysql.ENUM(*sorted(stats.distinct))
+    elif stats.min_length == stats.max_length and stats.max_length <= 255:
+        return mysql.CHAR(stats.max_length)
+    elif stats.max_length <= 255:
+        return mysql.VARCHAR(stats.max_length)
+    for dtype, max_length, _ in TEXT_TYPES:
+        if stats.max_length <= max_length:
+            return dtype()
+    raise ValueError("Strings of length {} do not fit into LONGTEXT!".format(stats.max_length))
+
+
+def get_dtype_size(dtype, stats=None):
+    """Estimate the number of bytes that a value of type `dtype` takes up in a MyISAM row.
+
+    Parameters
+    ----------
+    stats : ColumnStats | None
+        Statistics used to estimate the average length of variable-length strings.
+
+    Examples
+    --------
+    >>> get_dtype_size(mysql.MEDIUMINT())
+    3
+    >>> get_dtype_size(mysql.ENUM('a', 'b'))
+    1
+    """
+    avg_length = stats.avg_length if stats is not None else 0
+    for fixed_dtype, num_bytes in INTEGER_TYPES + FIXED_SIZE_TYPES:
+        if type(dtype) is fixed_dtype:
+            return num_bytes
+    for text_dtype, _, num_length_bytes in TEXT_TYPES:
+        if type(dtype) is text_dtype:
+            return avg_length + num_length_bytes
+    if isinstance(dtype, mysql.ENUM):
+        return 1 if len(dtype.enums) < 256 else 2
+    elif isinstance(dtype, mysql.CHAR):
+        return dtype.length
+    elif isinstance(dtype, mysql.VARCHAR):
+        return avg_length + (1 if dtype.length <= 255 else 2)
+    else:
+        return 8
+
+
+def get_schema_report(stats, dtypes, optimized_dtypes):
+    """Compare the estimated row size of `dtypes` and `optimized_dtypes`, column by column.
+
+    Returns
+    -------
+    report : DataFrame
+        DataFrame with ``dtype``, ``optimized_dtype``, ``bytes``, ``optimized_bytes``
+        and ``bytes_saved`` columns, indexed by column name.
+    """
+    columns = [c for c in optimized_dtypes if c in dtypes]
+    report = pd.DataFrame({
+        'dtype': [str(dtypes[c]) for c in columns],
+        'optimized_dtype': [str(optimized_dtypes[c]) for c in columns],
+        'bytes': [get_dtype_size(dtypes[c], stats.get(c)) for c in columns],
+        'optimized_bytes': [get_dtype_size(optimized_dtypes[c], stats.get(c)) for c in columns],
+    }, index=columns, columns=['dtype', 'optimized_dtype', 'bytes', 'optimized_bytes'])
+    report['bytes_saved'] = report['bytes'] - report['optimized_bytes']
+    return report
+
+
+def optimize_schema(dfs, dtypes=None, max_enum_values=MAX_ENUM_VALUES):
+    """Choose the narrowest column types for the data in `dfs`.
+
+    Parameters
+    ----------
+    dfs : iterable of DataFrames
+        Chunks of data, covering the *entire* dataset, since ``NOT NULL`` constraints and
+        integer ranges must hold for every row.
+    dtypes : dict | None
+        Column types to fall back on, for columns where no better type can be chosen.
+
+    Returns
+    -------
+    dtypes : dict
+        The optimized column types.
+    not_null : list
+        Columns which do not contain nulls.
+    report : DataFrame
+        Estimated number of bytes saved per row, for every column.
+    """
+    dtypes = dict(dtypes) if dtypes is not None else {}
+    stats = get_column_stats(dfs, max_distinct=max_enum_values)
+    optimized_dtypes = dict(dtypes)
+    for column, column_stats in stats.items():
+        dtype = get_optimal_dtype(column_stats, max_enum_values)
+        if dtype is not None:
+            optimized_dtypes[column] = dtype
+    not_null = [c for c, s in stats.items() if s.count and not s.num_nulls]
+    report = get_schema_report(stats, dtypes, optimized_dtypes)
+    logger.info(
+        "Estimated savings: {:,.1f} bytes per row".format(report['bytes_saved'].sum()))
+    return optimized_dtypes, not_null, report
+
+
+def get_widened_dtypes(dtypes, df, max_distinct=MAX_ENUM_VALUES):
+    """Find columns of `df` whose values do not fit into their column types in `dtypes`.
+
+    Returns
+    -------
+    widened_dtypes : dict
+        Mapping of those columns to column types which can hold both the values of `df`
+        and the values allowed by `dtypes`.
+
+    Examples
+    --------
+    >>> dtypes = {'id': mysql.TINYINT(unsigned=True), 'name': mysql.VARCHAR(4)}
+    >>> get_widened_dtypes(dtypes, pd.DataFrame({'id': [1, 2], 'name': ['a', None]}))
+    {}
+    >>> get_widened_dtypes(dtypes, pd.DataFrame({'id': [1, 256], 'name': ['a', 'bcdef']}))
+    {'id': SMALLINT(), 'name': VARCHAR(length=5)}
+    """
+    widened_dtypes = {}
+    for column in df.columns:
+        stats = ColumnStats(max_distinct=max_distinct)
+        stats.update(df[column])
+        if not fits_dtype(dtypes[column], stats):
+            widened_dtypes[column] = widen_dtype(dtypes[column], get_required_dtype(stats))
+    return widened_dtypes
+
+
+def fits_dtype(dtype, stats):
+    """Check whether the data described by `stats` can be stored in a column of type `dtype`.
+
+    Examples
+    --------
+    >>> stats = ColumnStats()
+    >>> stats.update(pd.Series([-1, 100]))
+    >>> fits_dtype(mysql.TINYINT(), stats), fits_dtype(mysql.TINYINT(unsigned=True), stats)
+    (True, False)
+    """
+    if isinstance(dtype, type):
+        dtype = dtype()
+    if stats.kind == 'empty':
+        return True
+    elif isinstance(dtype, sa.Enum):
+        return (
+            stats.kind == 'str' and
+            stats.distinct is not None and
+            stats.distinct <= set(dtype.enums))
+    elif isinstance(dtype, sa.String):
+        return stats.kind != 'mixed' and _get_data_length(stats) <= _get_dtype_length(dtype)
+    elif isinstance(dtype, (sa.Boolean, sa.Integer)):
+        return _fits_integer_dtype(dtype, stats)
+    elif isinstance(dtype, sa.Numeric):
+        return stats.kind in ['bool', 'int', 'float']
+    elif isinstance(dtype, (sa.Date, sa.DateTime)):
+        # Timestamps are 'mixed'
+        return (
+            stats.kind == 'mixed' or
+            (stats.kind == 'str' and
+             (stats.is_date or (stats.is_datetime and isinstance(dtype, sa.DateTime)))))
+    return True
+
+
+def _fits_integer_dtype(dtype, stats):
+    if stats.kind == 'bool':
+        return True
+    elif stats.kind == 'int' or (stats.kind == 'float' and stats.is_integral):
+        min_, max_ = _get_integer_range(dtype)
+        return min_ <= stats.min and stats.max <= max_
+    return False
+
+
+def get_required_dtype(stats):
+    """Return a (generous) column type which can hold the data described by `stats`.
+
+    Unlike :func:`get_optimal_dtype`, strings are never stored as ``ENUM``, ``CHAR``
+    or dates, so that the column type can hold similar data from other chunks.
+    """
+    if stats.kind == 'bool':
+        return mysql.BOOLEAN()
+    elif stats.kind == 'int' or (stats.kind == 'float' and stats.is_integral):
+        # Signed, so that it can be combined with other signed types
+        return _get_integer_dtype(min(int(stats.min), -1), int(stats.max))
+    elif stats.kind == 'float':
+        return mysql.DOUBLE()
+    elif stats.kind == 'str':
+        return _get_varchar_dtype(stats.max_length)
+    else:
+        return mysql.MEDIUMTEXT()
+
+
+def widen_dtype(dtype, other):
+    """Return the narrowest column type which can hold values of both `dtype` and `other`.
+
+    Examples
+    --------
+    >>> widen_dtype(mysql.INTEGER(), mysql.INTEGER(unsigned=True))
+    BIGINT()
+    >>> widen_dtype(mysql.INTEGER(), mysql.DOUBLE())
+    DOUBLE(asdecimal=True)
+    >>> widen_dtype(mysql.VARCHAR(255), mysql.DOUBLE())
+    VARCHAR(length=255)
+    >>> widen_dtype(mysql.VARCHAR(255), mysql.VARCHAR(256))
+    TEXT()
+    """
+    if isinstance(dtype, type):
+        dtype = dtype()
+    if isinstance(other, type):
+        other = other()
+    kinds = {_get_dtype_kind(dtype), _get_dtype_kind(other)}
+    if kinds <= {'int'}:
+        min_, max_ = zip(_get_integer_range(dtype), _get_integer_range(other))
+        return _get_integer_dtype(min(min_), max(max_))
+    elif kinds <= {'int', 'float'}:
+        return mysql.DOUBLE()
+    else:
+        return _get_varchar_dtype(max(_get_dtype_length(dtype), _get_dtype_length(other)))
+
+
+def _get_dtype_kind(dtype):
+    if isinstance(dtype, (sa.Boolean, sa.Integer)):
+        return 'int'
+    elif isinstance(dtype, sa.Numeric):
+        return 'float'
+    else:
+        return 'str'
+
+
+def _get_integer_range(dtype):
+    """
+    Examples
+    --------
+    >>> _get_integer_range(mysql.TINYINT()), _get_integer_range(mysql.TINYINT(unsigned=True))
+    ((-128, 127), (0, 255))
+    """
+    if isinstance(dtype, sa.Boolean):
+        return 0, 1
+    num_bytes = next((n for t, n in INTEGER_TYPES if type(dtype) is t), None)
+    if num_bytes is None:
+        num_bytes = (
+            8 if isinstance(dtype, sa.BigInteger) else
+            2 if isinstance(dtype, sa.SmallInteger) else
+            4)
+    num_bits = 8 * num_bytes
+    if getattr(dtype, 'unsigned', False):
+        return 0, 2 ** num_bits - 1
+    return -2 ** (num_bits - 1), 2 ** (num_bits - 1) - 1
+
+
+def _get_varchar_dtype(length):
+    """Return ``VARCHAR(length)``, or the narrowest ``TEXT`` type for long strings."""
+    if length <= 255:
+        return mysql.VARCHAR(max(length, 1))
+    for dtype, max_length, _ in TEXT_TYPES:
+        if length <= max_length:
+            return dtype()
+    raise ValueError("Strings of length {} do not fit into LONGTEXT!".format(length))
+
+
+def _get_data_length(stats):
+    """Maximum length of the data described by `stats`, written out as strings."""
+    if stats.kind == 'str':
+        return stats.max_length
+    elif stats.kind == 'bool':
+        return BOOLEAN_LENGTH
+    elif stats.kind == 'int':
+        return max(len(str(stats.min)), len(str(stats.max)))
+    else:
+        return NUMBER_LENGTH
+
+
+def _get_dtype_length(dtype):
+    """Maximum length of a value of type `dtype`, written out as a string."""
+    if isinstance(dtype, sa.Enum):
+        return max((len(v) for v in dtype.enums), default=0)
+    elif isinstance(dtype, sa.String):
+        if dtype.length is not None:
+            return dtype.length
+        return next(
+            (max_length for t, max_length, _ in TEXT_TYPES if type(dtype) is t),
+            TEXT_TYPES[-1][1])
+    elif isinstance(dtype, sa.Boolean):
+        return BOOLEAN_LENGTH
+    elif isinstance(dtype, sa.Integer):
+        return max(len(str(v)) for v in _get_integer_range(dtype))
+    elif isinstance(dtype, sa.DateTime):
+        return DATETIME_LENGTH
+    elif isinstance(dtype, sa.Date):
+        return DATE_LENGTH
+    else:
+        return NUMBER_LENGTH
@@ -0,0 +1,146 @@
+"""Copy the files of MyISAM tables between servers, with a manifest of their checksums.
+
+A MyISAM table, especially one packed with ``myisampack``, is a self-contained set of files
+(``.frm`` or ``.sdi``, ``.MYD``, ``.MYI``, and ``.par`` for partitioned tables in MySQL 5.x).
+Copying those files into the data directory of another server is much faster than
+parsing and loading the data again.
+
+Examples
+--------
+>>> import tempfile
+>>> datadir, snapshot_dir = tempfile.mkdtemp(), tempfile.mkdtemp()
+>>> for filename in ['variants.frm', 'variants.MYD', 'variants.MYI', 'variants_2.MYD']:
+...     with open(op.join(datadir, filename), 'wb') as ofh:
+...         _ = ofh.write(filename.encode())
+>>> sorted(get_table_files(datadir, 'variants'))
+['variants.MYD', 'variants.MYI', 'variants.frm']
+>>> manifest = copy_files(datadir, snapshot_dir, get_table_files(datadir, 'variants'))
+>>> manifest['variants.MYD']['size']
+12
+>>> verify_files(snapshot_dir, manifest)
+"""
+import hashlib
+import json
+import logging
+import os
+import os.path as op
+import shutil
+import time
+
+logger = logging.getLogger(__name__)
+
+#: Name of the file which describes a snapshot
+MANIFEST_FILENAME = 'manifest.json'
+
+#: Version of the manifest format
+MANIFEST_VERSION = 1
+
+#: Extensions of the files which make up a MyISAM table
+MYISAM_EXTENSIONS = ['.frm', '.sdi', '.par', '.MYD', '.MYI']
+
+
+class SnapshotError(Exception):
+    """A snapshot is incomplete, or its files do not match their checksums."""
+
+
+def get_table_files(datadir, tablename):
+    """Return the names of the files of MyISAM table `tablename` in `datadir`.
+
+    Partitions are stored in files named ``{tablename}#P#{partition}``. In MySQL 8,
+    ``.sdi`` files are named ``{tablename}_{id}.sdi``.
+    """
+    table_files = []
+    for filename in os.listdir(datadir):
+        name, extension = op.splitext(filename)
+        if extension not in MYISAM_EXTENSIONS:
+            continue
+        if (name == tablename or name.startswith(tablename + '#P#') or
+                (extension == '.sdi' and name.rpartition('_')[0] == tablename)):
+            table_files.append(filename)
+    return table_files
+
+
+def copy_files(src_dir, dst_dir, filenames, link=False, checksum=True):
+    """Copy (or hard link) `filenames` from `src_dir` to `dst_dir`.
+
+    Parameters
+    ----------
+    link : bool
+        Whether to create hard links instead of copies (both directories must be on the
+        same file system, and the files must not be modified afterwards).
+    checksum : bool
+        Whether to compute the SHA-256 checksum of every file.
+
+    Returns
+    -------
+    manifest : dict
+        Size (and checksum) of every file.
+    """
+    manifest = {}
+    for filename in sorted(filenames):
+        src, dst = op.join(src_dir, filename), op.join(dst_dir, filename)
+        logger.debug("{} '{}' to '{}'...".format('Linking' if link else 'Copying', src, dst))
+        if link:
+            os.link(src, dst)
+        else:
+            shutil.copyfile(src, dst)
+        manifest[filename] = {'size': op.getsize(dst)}
+        if checksum:
+            manifest[filename]['sha256'] = get_checksum(dst)
+    return manifest
+
+
+def verify_files(directory, manifest):
+    """Make sure that the files in `directory` match their sizes and checksums in `manifest`.
+
+    Raises
+    ------
+    SnapshotError
+        If any of the files is missing or different.
+    """
+    for filename, info in sorted(manifest.items()):
+        path = op.join(directory, filename)
+        if not op.isfile(path):
+            raise SnapshotError("File '{}' is missing!".format(path))
+        if op.getsize(path) != info['size']:
+            raise SnapshotError(
+                "File '{}' has {} bytes, but should have {} bytes!"
+                .format(path, op.getsize(path), info['size']))
+        if 'sha256' in info and get_checksum(path) != info['sha256']:
+            raise SnapshotError("Checksum of file '{}' does not match!".format(path))
+
+
+def write_manifest(snapshot_dir, tablename, files, **info):
+    """Write the manifest of a snapshot of table `tablename`, consisting of `files`."""
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'tablename': tablename,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'files': files,
+        **info
+    }
+    with open(op.join(snapshot_dir, MANIFEST_FILENAME), 'w') as ofh:
+        json.dump(manifest, ofh, indent=2, sort_keys=True)
+    return manifest
+
+
+def read_manifest(snapshot_dir):
+    """Read the manifest of the snapshot in `snapshot_dir`."""
+    path = op.join(snapshot_dir, MANIFEST_FILENAME)
+    if not op.isfile(path):
+        raise SnapshotError("'{}' does not contain a snapshot manifest!".format(snapshot_dir))
+    with open(path) as ifh:
+        manifest = json.load(ifh)
+    if manifest.get('version') != MANIFEST_VERSION:
+        raise SnapshotError(
+            "Unsupported snapshot manifest version: {!r}".format(manifest.get('version')))
+    return manifest
+
+
+def get_checksum(filename, chunksize=1024 * 1024):
+    """Return the SHA-256 checksum of `filename`."""
+    sha256 = hashlib.sha256()
+    with open(filename, 'rb') as ifh:
+        for data in iter(lambda: ifh.read(chunksize), b''):
+            sha256.update(data)
+    return sha256.hexdigest()
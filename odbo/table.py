@@ -1,20 +1,202 @@
 import logging
 import os
 import os.path as op
-import shlex
-import string
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 
 import pandas as pd
+import sqlalchemy as sa
 
 from kmtools.db_tools import parse_connection_string
-from kmtools.system_tools import iter_stdout, start_subprocess
+from odbo.cache import CACHE_SIZE, QueryCache, get_cache_key
+from odbo.commands import CancellationToken, Command, iter_command_output
+from odbo.ddl import _iter_index_names, get_index_clauses, read_table_layout
+from odbo.dtypes import get_arrow_schema, get_numpy_dtypes
+from odbo.engines import fetch_column, fetch_value
+from odbo.progress import ProgressMonitor, get_process_bytes_read, make_progress
+from odbo.snapshot import copy_files, get_table_files, write_manifest
 
 logger = logging.getLogger(__name__)
 
+#: Minimum ratio of distinct values to rows for a column to be indexed automatically
+MIN_INDEX_SELECTIVITY = 0.01
+
+#: Maximum number of secondary indexes created automatically
+MAX_AUTO_INDEXES = 16
+
+#: Longest string column which is indexed automatically (767 bytes in ``utf8mb4``)
+MAX_INDEX_KEY_LENGTH = 191
+
 
 class _Table:
-    pass
+
+    def _iter_chunks(self, chunksize):
+        """Read the table `chunksize` rows at a time, using a server-side cursor if possible."""
+        with self.engine.connect() as connection:
+            connection = connection.execution_options(stream_results=True)
+            for df in pd.read_sql_table(self.name, connection, chunksize=chunksize):
+                yield df
+
+    def _get_column_stats(self, columns=None, distinct=False, sample_size=None):
+        """Count the nulls and measure the longest string in every column of the table.
+
+        Parameters
+        ----------
+        columns : list | None
+            Columns to describe. Defaults to all columns.
+        distinct : bool
+            Whether to also count the distinct values in every column.
+        sample_size : int | None
+            Only look at the first `sample_size` rows of the table.
+
+        Returns
+        -------
+        num_rows : int
+        stats : DataFrame
+            DataFrame with ``num_nulls``, ``max_length`` (and ``num_distinct``) columns,
+            indexed by column name.
+        """
+        if columns is None:
+            columns = list(self.df.columns)
+        table = sa.table(self.name, *[sa.column(c) for c in self.df.columns])
+        if sample_size is not None:
+            table = sa.select([table]).limit(sample_size).alias('sample')
+        string_columns = [
+            c for c in columns if isinstance(self.dtypes.get(c), sa.String)
+        ]
+        aggregates = (
+            [sa.func.count().label('num_rows')] +
+            [sa.func.count(table.c[c]) for c in columns] +
+            [sa.func.max(sa.func.length(table.c[c])) for c in string_columns]
+        )
+        if distinct:
+            aggregates += [sa.func.count(sa.distinct(table.c[c])) for c in columns]
+        row = list(self.engine.execute(sa.select(aggregates)).fetchone())
+        num_rows = row[0]
+        num_values = row[1:len(columns) + 1]
+        max_lengths = dict(
+            zip(string_columns, row[len(columns) + 1:len(columns) + len(string_columns) + 1]))
+        stats = pd.DataFrame({
+            'num_nulls': [num_rows - n for n in num_values],
+            'max_length': [max_lengths.get(c) for c in columns],
+        }, index=columns, columns=['num_nulls', 'max_length'])
+        if distinct:
+            stats['num_distinct'] = row[len(columns) + len(string_columns) + 1:]
+        return num_rows, stats
+
+    def get_cardinality(self, columns=None, sample_size=None, column_stats=None):
+        """Count the rows, nulls and distinct values in every column, in a single query.
+
+        Parameters
+        ----------
+        columns : list | None
+            Columns to describe. Defaults to all columns.
+        sample_size : int | None
+            Only look at the first `sample_size` rows of the table.
+        column_stats : dict | None
+            Mapping of column names to :class:`odbo.schema.ColumnStats`, gathered while
+            the data was being loaded. Columns whose distinct values are already known
+            are not queried again.
+
+        Returns
+        -------
+        cardinality : DataFrame
+            DataFrame with ``num_rows``, ``num_nulls`` and ``num_distinct`` columns,
+            indexed by column name.
+        """
+        if columns is None:
+            columns = list(self.df.columns)
+        column_stats = column_stats if column_stats is not None else {}
+        known_stats = {
+            c: column_stats[c] for c in columns
+            if c in column_stats and column_stats[c].distinct is not None
+        }
+        num_rows, stats = self._get_column_stats(
+            columns=[c for c in columns if c not in known_stats],
+            distinct=True, sample_size=sample_size)
+        rows = []
+        for column in columns:
+            if column in known_stats:
+                s = known_stats[column]
+                rows.append((s.count + s.num_nulls, s.num_nulls, len(s.distinct)))
+            else:
+                rows.append((
+                    num_rows, stats.at[column, 'num_nulls'], stats.at[column, 'num_distinct']))
+        return pd.DataFrame(rows, index=columns, columns=['num_rows', 'num_nulls', 'num_distinct'])
+
+    def propose_indexes(
+            self, min_selectivity=MIN_INDEX_SELECTIVITY, max_indexes=MAX_AUTO_INDEXES,
+            sample_size=None, column_stats=None, primary_key=True):
+        """Propose a primary key and secondary indexes based on the cardinality of every column.
+
+        Parameters
+        ----------
+        min_selectivity : float
+            Minimum ratio of distinct values to rows for a column to be worth indexing.
+        max_indexes : int
+            Maximum number of secondary indexes to propose.
+        sample_size : int | None
+            Estimate cardinality from the first `sample_size` rows instead of the entire
+            table. Uniqueness is then only a guess, and creating a unique index may fail.
+        column_stats : dict | None
+            Statistics gathered while the data was being loaded
+            (see :meth:`get_cardinality`).
+        primary_key : bool
+            Whether to propose a primary key.
+
+        Returns
+        -------
+        primary_key : str | None
+            Unique, non-null column which can serve as the primary key.
+        index_commands : list
+            ``(column, unique)`` tuples accepted by :meth:`create_indexes`,
+            from the most to the least selective column.
+        """
+        columns = [c for c in self.df.columns if _is_indexable(self.dtypes.get(c))]
+        cardinality = self.get_cardinality(
+            columns, sample_size=sample_size, column_stats=column_stats)
+        return _choose_indexes(
+            cardinality, self.dtypes, min_selectivity, max_indexes, primary_key=primary_key)
+
+    def to_hdf5(self, filename, key=None, chunksize=100000, complib='blosc', complevel=9):
+        """Export the table into a chunked, compressed HDF5 file (using PyTables).
+
+        The data is stored in the ``table`` format, with every column as a data column,
+        so that individual columns and blocks of rows can be read without loading the
+        entire table.
+
+        Parameters
+        ----------
+        key : str | None
+            Name of the group in which to store the table. If None, use the table name.
+        """
+        key = key if key is not None else self.name
+        _, stats = self._get_column_stats()
+        dtypes = get_numpy_dtypes(
+            {c: self.dtypes.get(c) for c in self.df.columns},
+            nullable=stats.index[stats['num_nulls'] > 0])
+        min_itemsize = {c: int(n) for c, n in stats['max_length'].dropna().items() if n}
+        with pd.HDFStore(filename, mode='a', complib=complib, complevel=complevel) as store:
+            if key in store:
+                store.remove(key)
+            offset = 0
+            for df in self._iter_chunks(chunksize):
+                df.index = pd.RangeIndex(offset, offset + len(df))
+                offset += len(df)
+                store.append(
+                    key, df.astype(dtypes), format='table', data_columns=True,
+                    min_itemsize=min_itemsize, index=False)
+        return filename
+
+    def to_parquet(self, filename, chunksize=100000, compression='snappy'):
+        """Export the table into a Parquet file, writing one row group per chunk."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = get_arrow_schema(self.dtypes, list(self.df.columns))
+        with pq.ParquetWriter(filename, schema, compression=compression) as writer:
+            for df in self._iter_chunks(chunksize):
+                writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+        return filename
 
 
 # === MySQL / MariaDB ===
@@ -37,25 +219,70 @@ SELECT DISTINCT INDEX_NAME FROM information_schema.statistics
 WHERE table_schema = '{db_schema}'
 AND table_name = '{tablename}';
 """.format(db_schema=db_params['db_schema'], tablename=self.name)
-        existing_indexes = set(pd.read_sql_query(sql_query, self.engine)['INDEX_NAME'])
+        existing_indexes = set(fetch_column(self.engine, sql_query))
         return existing_indexes
 
-    def create_indexes(self, index_commands):
-        existing_indexes = self.get_indexes()
-        valid_indexes = [c for c in string.ascii_uppercase if c not in existing_indexes]
-        for index_name, index_command in zip(valid_indexes, index_commands):
-            columns, unique = index_command
-            if not isinstance(columns, (list, tuple)):
-                columns = [columns]
-            sql_command = (
-                "create {unique} index {index_name} on {tablename} ({columns});"
-                .format(
-                    unique='unique' if unique else '',
-                    index_name=index_name,
-                    tablename=self.name,
-                    columns=", ".join(columns))
-            )
+    def create_indexes(self, index_commands, primary_key=None):
+        """Create indexes (and a primary key) with a single ``ALTER TABLE`` statement.
+
+        MyISAM rebuilds every index of the table whenever an index is added, so adding
+        all indexes at once means that the data is only sorted once. Indexes which the table
+        already has (e.g. when it was loaded again) are skipped (see :mod:`odbo.ddl`).
+
+        Parameters
+        ----------
+        index_commands : list
+            ``(columns, unique)`` tuples, where `columns` is a column name or a list of
+            column names.
+        primary_key : str | list | None
+            Column(s) of the primary key.
+        """
+        db_params = parse_connection_string(self.connection_string)
+        layout = read_table_layout(self.engine, db_params['db_schema'], self.name)
+        clauses = get_index_clauses(layout, index_commands, primary_key)
+        if clauses:
+            sql_command = 'ALTER TABLE {tablename}\n{clauses};'.format(
+                tablename=self.name, clauses=',\n'.join(clauses))
+            logger.debug("sql_command: '{}'".format(sql_command))
             self.engine.execute(sql_command)
+        # Statistics may be stale even if the indexes exist (e.g. after a reload)
+        self.analyze()
+
+    def auto_index(
+            self, min_selectivity=MIN_INDEX_SELECTIVITY, max_indexes=MAX_AUTO_INDEXES,
+            sample_size=None, column_stats=None, create=True):
+        """Index the table based on the cardinality of its columns.
+
+        A unique, non-null column (preferably an integer) becomes the primary key,
+        unless the table already has one. Every other column with at least
+        `min_selectivity` distinct values per row gets a (unique, if possible) index.
+
+        Parameters
+        ----------
+        create : bool
+            Whether to create the indexes, or only propose them.
+
+        See :meth:`propose_indexes` for the other parameters.
+
+        Returns
+        -------
+        primary_key : str | None
+        index_commands : list
+            ``(column, unique)`` tuples accepted by :meth:`create_indexes`.
+        """
+        has_primary_key = 'PRIMARY' in self.get_indexes()
+        primary_key, index_commands = self.propose_indexes(
+            min_selectivity=min_selectivity, max_indexes=max_indexes,
+            sample_size=sample_size, column_stats=column_stats,
+            primary_key=not has_primary_key)
+        logger.info("Proposed primary key: {}, indexes: {}".format(primary_key, index_commands))
+        if create:
+            self.create_indexes(index_commands, primary_key=primary_key)
+        return primary_key, index_commands
+
+    def analyze(self):
+        """Update the key distribution statistics used by the query optimizer."""
+        self.engine.execute('ANALYZE TABLE {};'.format(self.name))
 
     def add_idx_column(self, column_name='idx', auto_increment=1):
         sql_command = """\
@@ -64,44 +291,132 @@ AUTO_INCREMENT = {auto_increment},
 ADD COLUMN {column_name} BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY FIRST
 """.format(table_name=self.name, column_name=column_name, auto_increment=auto_increment)
         self.engine.execute(sql_command)
-        max_id = pd.read_sql_query(
-            "SELECT MAX({column_name}) from {table_name}".format(
-                table_name=self.name, column_name=column_name),
+        max_id = fetch_value(
             self.engine,
-        )
-        return int(max_id.values)
+            "SELECT MAX({column_name}) from {table_name}".format(
+                table_name=self.name, column_name=column_name))
+        return int(max_id)
+
+    def get_partitions(self):
+        """Return the partitions of the table, with the number of rows in each partition.
+
+        Returns an empty DataFrame if the table is not partitioned.
+        """
+        db_params = parse_connection_string(self.connection_string)
+        sql_query = """\
+SELECT PARTITION_NAME AS partition_name, TABLE_ROWS AS num_rows
+FROM information_schema.partitions
+WHERE table_schema = '{db_schema}'
+AND table_name = '{tablename}'
+AND PARTITION_NAME IS NOT NULL
+ORDER BY PARTITION_ORDINAL_POSITION;
+""".format(db_schema=db_params['db_schema'], tablename=self.name)
+        return pd.read_sql_query(sql_query, self.engine)
+
+    def get_version(self):
+        """Return a tuple which changes whenever the contents of the table change.
+
+        The tuple consists of the ``CREATE_TIME``, ``UPDATE_TIME``, ``CHECKSUM`` and
+        ``DATA_LENGTH`` of the table in ``information_schema.tables``. Returns None unless
+        the table is a packed (read-only) MyISAM table: ``UPDATE_TIME`` only has a resolution
+        of one second, so changes to other tables can go unnoticed. Packed tables only change
+        by being loaded again, which changes their ``CREATE_TIME``.
+
+        MySQL 8 caches these statistics (for ``information_schema_stats_expiry`` seconds),
+        so the cache is bypassed for this lookup.
+        """
+        db_params = parse_connection_string(self.connection_string)
+        with self.engine.connect() as connection:
+            expiry = connection.execute(
+                "SHOW SESSION VARIABLES LIKE 'information_schema_stats_expiry'").first()
+            if expiry is not None:
+                connection.execute('SET SESSION information_schema_stats_expiry = 0')
+            try:
+                row = connection.execute(
+                    sa.text("SELECT ENGINE, ROW_FORMAT, CREATE_TIME, UPDATE_TIME, CHECKSUM, "
+                            "DATA_LENGTH FROM information_schema.tables "
+                            "WHERE table_schema = :db_schema AND table_name = :tablename"),
+                    db_schema=db_params['db_schema'], tablename=self.name).first()
+            finally:
+                if expiry is not None:
+                    connection.execute(
+                        'SET SESSION information_schema_stats_expiry = {}'.format(expiry[1]))
+        if row is None or (row[0], row[1]) != ('MyISAM', 'Compressed') or row[3] is None:
+            return None
+        return tuple(str(value) for value in row[2:])
+
+    def query(self, sql_query, cache=True, cache_dir=None, max_cache_size=CACHE_SIZE):
+        """Run `sql_query` (which should only read from this table), caching the results.
+
+        Results are stored in Parquet files, under a key which includes the version of the
+        table (see :meth:`get_version`), so they are reused until the table changes.
+        A cached query only requires a lookup in ``information_schema.tables``.
+        Only queries against packed tables are cached.
+
+        Parameters
+        ----------
+        cache : bool
+            Whether to use the query cache.
+        cache_dir : str | None
+            Directory of the query cache. Defaults to :data:`odbo.cache.CACHE_DIR`.
+        max_cache_size : int
+            Maximum size of the query cache, in bytes. The least recently used results
+            are evicted first.
+
+        Returns
+        -------
+        df : DataFrame
+        """
+        version = self.get_version() if cache else None
+        if version is None:
+            return pd.read_sql_query(sql_query, self.engine)
+        db_params = parse_connection_string(self.connection_string)
+        key = get_cache_key(
+            sql_query, version, db_url=db_params['db_url'], db_port=db_params['db_port'],
+            db_schema=db_params['db_schema'], tablename=self.name)
+        query_cache = QueryCache(cache_dir, max_size=max_cache_size)
+        df = query_cache.get(key)
+        if df is None:
+            df = pd.read_sql_query(sql_query, self.engine)
+            query_cache.put(key, df)
+        return df
+
+    def compress(self, partition=None, progress_callback=None, timeout=None, cancel=None):
+        """Compress the table (or a single `partition` of the table) using ``myisampack``.
+
+        If given, `progress_callback` is called with an :class:`odbo.progress.Progress` object
+        while the table is being compressed ('compress') and its indexes are being recreated
+        ('index'). Progress is estimated from the number of bytes read by ``myisampack``
+        and ``myisamchk`` (Linux only).
 
-    def compress(self):
+        ``myisampack`` and ``myisamchk`` are killed if compressing the table takes longer than
+        `timeout` seconds, or once `cancel` is cancelled (see :mod:`odbo.commands`).
+        Their temporary files are removed. The table itself is only replaced once
+        ``myisampack`` has finished, but its indexes have to be recreated
+        (``myisamchk -rq``) if ``myisamchk`` is stopped.
+        """
         db_params = parse_connection_string(self.connection_string)
-        db_file = op.abspath(op.join(self.datadir, db_params['db_schema'], self.name + '.MYD'))
-        index_file = op.abspath(op.join(self.datadir, db_params['db_schema'], self.name + '.MYI'))
+        filename = self.name if partition is None else '{}#P#{}'.format(self.name, partition)
+        db_file = op.abspath(op.join(self.datadir, db_params['db_schema'], filename + '.MYD'))
+        index_file = op.abspath(op.join(self.datadir, db_params['db_schema'], filename + '.MYI'))
+        # Data file written by ``myisampack`` and ``myisamchk`` before it replaces the table
+        tmp_file = op.splitext(db_file)[0] + '.TMD'
+        cancel = CancellationToken(timeout, parent=cancel)
         file_size_before = op.getsize(db_file) / (1024 ** 2)
         # Flush table
         self.engine.execute('flush tables;')
-        # Compress table
+        # Compress table (``myisampack`` reads the data file twice)
         system_command = "myisampack --no-defaults '{}'".format(index_file)
-        logger.debug("system_command: '{}'".format(system_command))
-        p1 = subprocess.run(
-            shlex.split(system_command), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-            universal_newlines=True)
-        if p1.stdout.strip():
-            logger.debug(p1.stdout.strip())
-        if p1.stderr.strip():
-            logger.error(p1.stderr.strip())
-        if p1.returncode:
-            raise Exception("Failed to compress table (returncode = {})".format(p1.returncode))
+        progress = make_progress('compress', 2 * op.getsize(db_file), progress_callback)
+        returncode = _run_myisam_command(system_command, progress, cancel, [tmp_file])
+        if returncode:
+            raise Exception("Failed to compress table (returncode = {})".format(returncode))
         # Recreate indexes
         system_command = "myisamchk -rq '{}'".format(index_file)
-        logger.debug("system_command: '{}'".format(system_command))
-        p2 = subprocess.run(
-            shlex.split(system_command), stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-            universal_newlines=True)
-        if p2.stdout.strip():
-            logger.debug(p2.stdout.strip())
-        if p2.stderr.strip():
-            logger.error(p2.stderr.strip())
-        if p2.returncode:
-            raise Exception("Failed to recreate indexes (returncode = {})".format(p2.returncode))
+        progress = make_progress('index', op.getsize(db_file), progress_callback)
+        returncode = _run_myisam_command(system_command, progress, cancel, [tmp_file])
+        if returncode:
+            raise Exception("Failed to recreate indexes (returncode = {})".format(returncode))
         file_size_after = op.getsize(db_file) / (1024 ** 2)
         logger.info(
             "File size before: {:,.2f} MB".format(file_size_before))
@@ -111,6 +426,65 @@ ADD COLUMN {column_name} BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY FIRST
             "File size savings: {:,.2f} MB ({:.2f} %)"
             .format(file_size_after, file_size_after / file_size_before * 100))
 
+    def compress_partitions(self, num_workers=4, timeout=None, cancel=None):
+        """Compress every partition of the table independently, in parallel.
+
+        Partitions which are still being compressed after `timeout` seconds, or once `cancel`
+        is cancelled, are stopped (see :meth:`compress`).
+        """
+        partitions = list(self.get_partitions()['partition_name'])
+        cancel = CancellationToken(timeout, parent=cancel)
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            list(executor.map(
+                lambda partition: self.compress(partition, cancel=cancel), partitions))
+        self.engine.execute('flush tables;')
+
+    def export_snapshot(self, snapshot_dir, link=False, checksum=True):
+        """Copy the files of the table into `snapshot_dir`, with a manifest of their checksums.
+
+        The snapshot can be attached to another server using
+        :meth:`odbo.MySQLConnection.import_snapshot`. The table must use the MyISAM storage
+        engine (ideally packed, see :meth:`compress`), and is locked for writing while its
+        files are copied.
+
+        Parameters
+        ----------
+        link : bool
+            Whether to hard link the files instead of copying them (`snapshot_dir` must be
+            on the same file system as the data directory of the server).
+        checksum : bool
+            Whether to record the SHA-256 checksum of every file.
+
+        Returns
+        -------
+        manifest : dict
+            Contents of the snapshot manifest.
+        """
+        if self.datadir is None:
+            raise ValueError("Exporting a snapshot requires the data directory of the server!")
+        db_params = parse_connection_string(self.connection_string)
+        table_dir = op.join(self.datadir, db_params['db_schema'])
+        db_engine, row_format = self.engine.execute(
+            sa.text("SELECT ENGINE, ROW_FORMAT FROM information_schema.tables "
+                    "WHERE table_schema = :db_schema AND table_name = :tablename"),
+            db_schema=db_params['db_schema'], tablename=self.name).first()
+        if db_engine != 'MyISAM':
+            raise ValueError(
+                "Only MyISAM tables can be exported as snapshots, not '{}' tables!"
+                .format(db_engine))
+        os.makedirs(snapshot_dir, exist_ok=True)
+        with self.engine.connect() as connection:
+            connection.execute('FLUSH TABLES `{}` WITH READ LOCK;'.format(self.name))
+            try:
+                files = copy_files(
+                    table_dir, snapshot_dir, get_table_files(table_dir, self.name), link,
+                    checksum)
+            finally:
+                connection.execute('UNLOCK TABLES;')
+        return write_manifest(
+            snapshot_dir, self.name, files, row_format=row_format,
+            server_version=fetch_value(self.engine, 'SELECT VERSION()'))
+
     def compress_all(self):
         """Compress all MyISAM files in a given directory."""
         data_files = [
@@ -121,12 +495,210 @@ ADD COLUMN {column_name} BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY FIRST
         data_files_str = " ".join("'{}'".format(op.abspath(f)) for f in data_files)
         # Compress files
         system_command = "myisampack --no-defaults '{}'".format(data_files_str)
-        # allowed_returncodes=[0, 2]
-        p = start_subprocess(system_command)
-        for line in iter_stdout(p):
+        for line in iter_command_output(system_command, allowed_returncodes=(0, 2)):
             logger.debug(line)
         # Re-create index
         system_command = "myisamchk -rq '{}'".format(data_files_str)
-        p = start_subprocess(system_command)
-        for line in iter_stdout(p):
+        for line in iter_command_output(system_command):
             logger.debug(line)
+
+
+def _run_myisam_command(system_command, progress=None, cancel=None, cleanup=()):
+    """Run `system_command`, logging its output, and sampling its `progress` if given.
+
+    The command is stopped once `cancel` is cancelled, and `cleanup` files are removed if it
+    is stopped or fails.
+    """
+    logger.debug("system_command: '{}'".format(system_command))
+    command = Command(
+        system_command, cancel=cancel, cleanup=cleanup, stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE, universal_newlines=True)
+    with command:
+        process = command.process
+        if progress is None:
+            stdout, stderr = process.communicate()
+        else:
+            with ProgressMonitor(progress, lambda: get_process_bytes_read(process.pid)):
+                stdout, stderr = process.communicate()
+    if process.returncode:
+        command.clean_up()
+    if stdout.strip():
+        logger.debug(stdout.strip())
+    if stderr.strip():
+        logger.error(stderr.strip())
+    return process.returncode
+
+
+# === PostgreSQL ===
+
+class PostgresTable(_Table):
+
+    def __init__(self, name, df, dtypes, tempfile, connection_string, engine, datadir):
+        self.name = name
+        self.df = df
+        self.dtypes = dtypes
+        self.tempfile = tempfile
+        self.connection_string = connection_string
+        self.engine = engine
+        self.datadir = datadir
+
+    def get_indexes(self):
+        sql_query = """\
+SELECT indexname FROM pg_indexes
+WHERE schemaname = current_schema()
+AND tablename = '{tablename}';
+""".format(tablename=self.name)
+        existing_indexes = set(fetch_column(self.engine, sql_query))
+        return existing_indexes
+
+    def create_indexes(self, index_commands):
+        # Index names have to be unique within a PostgreSQL schema
+        existing_indexes = self.get_indexes()
+        valid_indexes = (
+            index_name for index_name in (
+                '{}_{}'.format(self.name, n.lower()) for n in _iter_index_names())
+            if index_name not in existing_indexes
+        )
+        for index_name, index_command in zip(valid_indexes, index_commands):
+            columns, unique = index_command
+            if not isinstance(columns, (list, tuple)):
+                columns = [columns]
+            sql_command = (
+                'create {unique} index "{index_name}" on "{tablename}" ({columns});'
+                .format(
+                    unique='unique' if unique else '',
+                    index_name=index_name,
+                    tablename=self.name,
+                    columns=", ".join(columns))
+            )
+            self.engine.execute(sql_command)
+        self.analyze()
+
+    def add_idx_column(self, column_name='idx', auto_increment=1):
+        sql_command = """\
+ALTER TABLE "{table_name}"
+ADD COLUMN {column_name} BIGINT GENERATED BY DEFAULT AS IDENTITY (START WITH {auto_increment})
+PRIMARY KEY
+""".format(table_name=self.name, column_name=column_name, auto_increment=auto_increment)
+        self.engine.execute(sql_command)
+        max_id = fetch_value(
+            self.engine,
+            'SELECT MAX({column_name}) from "{table_name}"'.format(
+                table_name=self.name, column_name=column_name))
+        return int(max_id)
+
+    def analyze(self):
+        """Update the planner statistics of the table."""
+        self.engine.execute('ANALYZE "{}";'.format(self.name))
+
+
+# === SQLite ===
+
+class SQLiteTable(_Table):
+
+    def __init__(self, name, df, dtypes, tempfile, connection_string, engine, datadir):
+        self.name = name
+        self.df = df
+        self.dtypes = dtypes
+        self.tempfile = tempfile
+        self.connection_string = connection_string
+        self.engine = engine
+        self.datadir = datadir
+
+    def get_indexes(self):
+        sql_query = """\
+SELECT name FROM sqlite_master
+WHERE type = 'index'
+AND tbl_name = '{tablename}';
+""".format(tablename=self.name)
+        existing_indexes = set(fetch_column(self.engine, sql_query))
+        return existing_indexes
+
+    def create_indexes(self, index_commands):
+        # Index names have to be unique within an SQLite database
+        existing_indexes = self.get_indexes()
+        valid_indexes = (
+            index_name for index_name in (
+                '{}_{}'.format(self.name, n.lower()) for n in _iter_index_names())
+            if index_name not in existing_indexes
+        )
+        for index_name, index_command in zip(valid_indexes, index_commands):
+            columns, unique = index_command
+            if not isinstance(columns, (list, tuple)):
+                columns = [columns]
+            sql_command = (
+                'create {unique} index "{index_name}" on "{tablename}" ({columns});'
+                .format(
+                    unique='unique' if unique else '',
+                    index_name=index_name,
+                    tablename=self.name,
+                    columns=", ".join(columns))
+            )
+            self.engine.execute(sql_command)
+
+    def analyze(self):
+        """Gather the query planner statistics of the table and its indexes."""
+        self.engine.execute('ANALYZE "{}";'.format(self.name))
+
+
+# === Index selection ===
+
+def _is_indexable(dtype):
+    """Whether a column of type `dtype` can (and should) be indexed without a prefix length.
+
+    Floating point and boolean columns are rarely looked up by value, and ``TEXT`` columns
+    can only be indexed by prefix.
+
+    Examples
+    --------
+    >>> _is_indexable(sa.Integer())
+    True
+    >>> _is_indexable(sa.VARCHAR(255))
+    False
+    >>> _is_indexable(sa.Float())
+    False
+    """
+    if isinstance(dtype, type):
+        dtype = dtype()
+    if dtype is None:
+        return True
+    elif isinstance(dtype, (sa.Boolean, sa.Float, sa.Text)):
+        return False
+    elif isinstance(dtype, sa.String):
+        return dtype.length is not None and dtype.length <= MAX_INDEX_KEY_LENGTH
+    return True
+
+
+def _choose_indexes(cardinality, dtypes, min_selectivity, max_indexes, primary_key=True):
+    """Choose a primary key and secondary indexes from column cardinalities.
+
+    Examples
+    --------
+    >>> cardinality = pd.DataFrame({
+    ...     'num_rows': [100, 100, 100, 100],
+    ...     'num_nulls': [0, 0, 5, 0],
+    ...     'num_distinct': [100, 100, 60, 2],
+    ... }, index=['gene_name', 'gene_id', 'score', 'strand'])
+    >>> dtypes = {'gene_name': sa.VARCHAR(16), 'gene_id': sa.Integer(), 'score': sa.Integer()}
+    >>> _choose_indexes(cardinality, dtypes, min_selectivity=0.1, max_indexes=16)
+    ('gene_id', [('gene_name', True), ('score', False)])
+    >>> _choose_indexes(cardinality, dtypes, 0.1, 16, primary_key=False)
+    (None, [('gene_name', True), ('gene_id', True), ('score', False)])
+    """
+    num_values = cardinality['num_rows'] - cardinality['num_nulls']
+    unique = (cardinality['num_distinct'] == num_values) & (num_values > 0)
+    selectivity = cardinality['num_distinct'] / cardinality['num_rows'].clip(lower=1)
+    pk_column = None
+    if primary_key:
+        # Prefer short integer keys, in column order
+        pk_candidates = [
+            c for c in cardinality.index if unique[c] and not cardinality.at[c, 'num_nulls']
+        ]
+        pk_candidates.sort(key=lambda c: not isinstance(dtypes.get(c), sa.Integer))
+        pk_column = pk_candidates[0] if pk_candidates else None
+    columns = [
+        c for c in selectivity.sort_values(ascending=False, kind='mergesort').index
+        if c != pk_column and selectivity[c] >= min_selectivity
+    ]
+    index_commands = [(c, bool(unique[c])) for c in columns[:max_indexes]]
+    return pk_column, index_commands
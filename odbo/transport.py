@@ -0,0 +1,114 @@
+"""Run commands on the host which stores the data, and stream their output back.
+
+Decompressing and formatting a file next to the data means that only the formatted data
+crosses the network, once, on its way to the database server.
+
+Examples
+--------
+>>> transport = get_transport(LocalTransport())
+>>> b''.join(transport.iter_output("printf 'a\\tb\\n1\\t2\\n'"))
+b'a\\tb\\n1\\t2\\n'
+>>> get_transport('storage.example.com')
+SSHTransport('storage.example.com')
+"""
+import logging
+import shlex
+import subprocess
+import tempfile
+
+from odbo._format_file_python import iter_line_blocks
+from odbo.commands import Command
+
+logger = logging.getLogger(__name__)
+
+#: Number of bytes to read from the output of a command at a time
+CHUNKSIZE = 64 * 1024 * 1024
+
+
+class Transport:
+    """Run shell commands somewhere, streaming back their output.
+
+    Subclasses implement :meth:`get_args`.
+    """
+
+    def get_args(self, command):
+        """Return the arguments of a process which runs shell pipeline `command`."""
+        raise NotImplementedError
+
+    def iter_output(self, command, chunksize=CHUNKSIZE, cancel=None):
+        """Run shell pipeline `command`, yielding blocks of complete lines from its stdout.
+
+        The command is killed if `cancel` (a :class:`odbo.commands.CancellationToken`)
+        is cancelled, or if the caller stops reading its output.
+
+        Raises
+        ------
+        subprocess.CalledProcessError
+            If any command in the pipeline fails.
+        odbo.commands.CancelledError
+            If the command is stopped by `cancel`.
+        """
+        # Fail if any part of the pipeline fails, not only the last command
+        command = 'set -o pipefail; ' + command
+        logger.debug("Running command {!r} using {!r}...".format(command, self))
+        with tempfile.TemporaryFile() as stderr:
+            with Command(
+                    self.get_args(command), cancel=cancel, stdout=subprocess.PIPE,
+                    stderr=stderr) as running:
+                with running.process.stdout:
+                    yield from iter_line_blocks(running.process.stdout, chunksize)
+            if running.process.returncode:
+                stderr.seek(0)
+                raise subprocess.CalledProcessError(
+                    running.process.returncode, command,
+                    stderr=stderr.read().decode('utf-8', 'replace'))
+
+
+class LocalTransport(Transport):
+    """Run commands on this host (e.g. when the data is on a local disk, or in tests)."""
+
+    def __repr__(self):
+        return 'LocalTransport()'
+
+    def get_args(self, command):
+        return ['bash', '-c', command]
+
+
+class SSHTransport(Transport):
+    """Run commands on `host` over SSH.
+
+    Parameters
+    ----------
+    host : str
+        Host name, optionally with a user name (``user@host``).
+    ssh_options : list
+        Additional options to pass to ``ssh``.
+    """
+
+    def __init__(self, host, ssh_options=('-o', 'BatchMode=yes')):
+        self.host = host
+        self.ssh_options = list(ssh_options)
+
+    def __repr__(self):
+        return 'SSHTransport({!r})'.format(self.host)
+
+    def get_args(self, command):
+        return ['ssh'] + self.ssh_options + [self.host, 'bash -c ' + shlex.quote(command)]
+
+
+def get_transport(storage_host):
+    """Return the transport for `storage_host`.
+
+    Parameters
+    ----------
+    storage_host : str | Transport | None
+        A host name to connect to over SSH, or a :class:`Transport`.
+
+    Returns
+    -------
+    transport : Transport | None
+        None if `storage_host` is None.
+    """
+    if storage_host is None or isinstance(storage_host, Transport):
+        return storage_host
+    return SSHTransport(storage_host)
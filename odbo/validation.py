@@ -0,0 +1,332 @@
+"""Check that data loaded into the database matches the file that it was loaded from.
+
+``LOAD DATA`` does not fail when values are truncated or cannot be converted to the type of
+their column: it stores whatever it can and reports a warning. A few cheap checks after every
+load catch such problems before anybody queries the data:
+
+- the number of rows in the table is compared with the number of lines in the input file;
+- warnings reported by ``LOAD DATA`` are parsed and counted per column;
+- a random sample of lines from the input file is looked up in the table.
+
+Examples
+--------
+>>> output = '''@@session.warning_count
+... 2
+... Level\\tCode\\tMessage
+... Warning\\t1265\\tData truncated for column 'ref' at row 3
+... Warning\\t1264\\tOut of range value for column 'pos' at row 7
+... '''
+>>> load_warnings = LoadWarnings.parse(output)
+>>> load_warnings.count, load_warnings.by_column
+(2, Counter({'ref': 1, 'pos': 1}))
+"""
+import logging
+import os
+import random
+import re
+from collections import Counter, namedtuple
+
+import pandas as pd
+import sqlalchemy as sa
+
+logger = logging.getLogger(__name__)
+
+#: Number of lines of the input file which are looked up in the table
+SAMPLE_SIZE = 10
+
+#: Relative tolerance used when comparing floating point values
+FLOAT_TOLERANCE = 1e-6
+
+LoadWarning = namedtuple('LoadWarning', ['level', 'code', 'message', 'column', 'row'])
+LoadWarning.__doc__ = "A row of ``SHOW WARNINGS``, with the column and row that it refers to."
+
+_WARNING_RE = re.compile(r'^(Note|Warning|Error)\t(\d+)\t(.*)$')
+_WARNING_COLUMN_RE = re.compile(r"column '([^']*)'")
+_WARNING_ROW_RE = re.compile(r'\b[Rr]ow (\d+)\b')
+
+
+class LoadValidationError(Exception):
+    """Data loaded into the database does not match its input file."""
+
+    def __init__(self, report):
+        super().__init__(report.summary())
+        self.report = report
+
+
+class LoadWarnings:
+    """Warnings reported while loading data, e.g. by ``SHOW WARNINGS`` after ``LOAD DATA``.
+
+    Attributes
+    ----------
+    count : int
+        Total number of warnings, which can be larger than the number of warnings listed
+        (MySQL keeps at most ``max_error_count`` of them).
+    warnings : list
+        :class:`LoadWarning` objects.
+    """
+
+    def __init__(self, count=0, warnings=None):
+        self.count = count
+        self.warnings = list(warnings) if warnings else []
+
+    def __repr__(self):
+        return 'LoadWarnings(count={}, by_column={!r})'.format(self.count, dict(self.by_column))
+
+    @classmethod
+    def parse(cls, output):
+        """Parse the output of ``SHOW COUNT(*) WARNINGS; SHOW WARNINGS;`` in batch mode."""
+        count = None
+        warnings = []
+        lines = output.splitlines()
+        for i, line in enumerate(lines):
+            if line.endswith('warning_count') and i + 1 < len(lines):
+                count = int(lines[i + 1])
+                continue
+            match = _WARNING_RE.match(line)
+            if match:
+                level, code, message = match.groups()
+                column = _WARNING_COLUMN_RE.search(message)
+                row = _WARNING_ROW_RE.search(message)
+                warnings.append(LoadWarning(
+                    level, int(code), message, column.group(1) if column else None,
+                    int(row.group(1)) if row else None))
+        return cls(len(warnings) if count is None else count, warnings)
+
+    @classmethod
+    def merge(cls, load_warnings):
+        """Combine several :class:`LoadWarnings` (e.g. one for every partition) into one."""
+        load_warnings = [lw for lw in load_warnings if lw is not None]
+        return cls(
+            sum(lw.count for lw in load_warnings),
+            [w for lw in load_warnings for w in lw.warnings])
+
+    @property
+    def by_column(self):
+        """Number of listed warnings (not notes) for every column (None for whole rows)."""
+        return Counter(w.column for w in self.warnings if w.level != 'Note')
+
+    @property
+    def num_notes(self):
+        return sum(w.level == 'Note' for w in self.warnings)
+
+
+class LoadReport:
+    """Results of the checks made after loading `filename` into `tablename`.
+
+    Attributes
+    ----------
+    expected_rows : int | None
+        Number of data lines in the input file.
+    num_rows : int | None
+        Number of rows in the table.
+    load_warnings : LoadWarnings
+    sample : DataFrame
+        Lines of the input file which were looked up in the table.
+    mismatches : DataFrame
+        Lines of the input file which were not found in the table.
+    """
+
+    def __init__(
+            self, tablename, filename=None, expected_rows=None, num_rows=None,
+            load_warnings=None, sample=None, mismatches=None):
+        self.tablename = tablename
+        self.filename = filename
+        self.expected_rows = expected_rows
+        self.num_rows = num_rows
+        self.load_warnings = load_warnings if load_warnings is not None else LoadWarnings()
+        self.sample = sample
+        self.mismatches = mismatches
+
+    def __repr__(self):
+        return 'LoadReport({})'.format(self.summary())
+
+    @property
+    def ok(self):
+        """Whether all checks passed."""
+        return (
+            self.expected_rows == self.num_rows and
+            self.load_warnings.count == self.load_warnings.num_notes and
+            (self.mismatches is None or self.mismatches.empty))
+
+    def summary(self):
+        """
+        Examples
+        --------
+        >>> LoadReport('variants', expected_rows=10, num_rows=9).summary()
+        "'variants': 9 rows (expected 10), 0 warnings"
+        """
+        text = "'{}': {} rows".format(self.tablename, self.num_rows)
+        if self.expected_rows != self.num_rows:
+            text += " (expected {})".format(self.expected_rows)
+        text += ", {} warnings".format(self.load_warnings.count - self.load_warnings.num_notes)
+        if self.load_warnings.by_column:
+            text += " ({})".format(', '.join(
+                '{}: {}'.format(column if column is not None else '<row>', count)
+                for column, count in self.load_warnings.by_column.most_common()))
+        if self.sample is not None:
+            text += ", {} of {} sampled lines not found".format(
+                len(self.mismatches), len(self.sample))
+        return text
+
+    def check(self):
+        """Raise :class:`LoadValidationError` if any of the checks failed."""
+        if not self.ok:
+            raise LoadValidationError(self)
+        logger.info("Load validated: {}".format(self.summary()))
+
+
+def count_lines(filename, skiprows=0, chunksize=1024 * 1024, sep='\t', quotechar=None):
+    """Count the records in `filename`, not including the first `skiprows` lines.
+
+    A last line without a trailing newline is counted as well.
+    See :func:`iter_count_lines` for `sep` and `quotechar`.
+    """
+    counter = Counter()
+    with open(filename, 'rb') as ifh:
+        for _ in iter_count_lines(
+                iter(lambda: ifh.read(chunksize), b''), counter, sep, quotechar):
+            pass
+    return max(counter['lines'] - skiprows, 0)
+
+
+def iter_count_lines(chunks, counter, sep='\t', quotechar=None):
+    r"""Yield `chunks` of a file, adding the number of records to ``counter['lines']``.
+
+    If `quotechar` is given, newlines within quoted fields (fields which start with
+    `quotechar`, as written with ``QUOTE_MINIMAL``) do not end a record.
+
+    Examples
+    --------
+    >>> counter = Counter()
+    >>> data = b''.join(iter_count_lines([b'a\t"b\n', b'c"\n1\t2\n'], counter, '\t', '"'))
+    >>> counter['lines']
+    2
+    """
+    quote = quotechar.encode() if quotechar else None
+    in_quotes = False  # whether the unfinished line starts within a quoted field
+    pending = b''
+    for chunk in chunks:
+        if quote is None or not (in_quotes or quote in pending or quote in chunk):
+            counter['lines'] += chunk.count(b'\n')
+            idx = chunk.rfind(b'\n')
+            pending = pending + chunk if idx < 0 else chunk[idx + 1:]
+        else:
+            lines = (pending + chunk).split(b'\n')
+            pending = lines.pop()
+            for line in lines:
+                in_quotes = _ends_in_quotes(line, in_quotes, sep.encode(), quote)
+                counter['lines'] += not in_quotes
+        yield chunk
+    counter['lines'] += bool(pending) or in_quotes
+
+
+def _ends_in_quotes(line, in_quotes, sep, quote):
+    r"""Return whether `line` ends within a quoted field (`in_quotes`: whether it starts in one).
+
+    Examples
+    --------
+    >>> _ends_in_quotes(b'a\t"b', False, b'\t', b'"')
+    True
+    >>> _ends_in_quotes(b'c"\t1', True, b'\t', b'"')
+    False
+    >>> _ends_in_quotes(b'a"b\t"c""d"', False, b'\t', b'"')
+    False
+    """
+    i = 0
+    while True:
+        if in_quotes:
+            i = line.find(quote, i)
+            if i < 0:
+                return True
+            i += 1
+            if line[i:i + 1] == quote:
+                # An escaped quote
+                i += 1
+                continue
+            in_quotes = False
+        elif line[i:i + 1] == quote:
+            in_quotes = True
+            i += 1
+            continue
+        i = line.find(sep, i)
+        if i < 0:
+            return False
+        i += 1
+
+
+def sample_lines(filename, sample_size=SAMPLE_SIZE, skiprows=0, seed=None):
+    """Pick up to `sample_size` random lines from `filename`, without reading all of it.
+
+    Lines are found by seeking to random offsets, so longer lines are more likely
+    to be picked.
+
+    Returns
+    -------
+    lines : list of bytes
+    """
+    file_size = os.path.getsize(filename)
+    rng = random.Random(seed)
+    lines = set()
+    with open(filename, 'rb') as ifh:
+        for _ in range(skiprows):
+            ifh.readline()
+        data_start = ifh.tell()
+        if data_start >= file_size:
+            return []
+        for _ in range(sample_size * 2):
+            ifh.seek(rng.randrange(data_start, file_size))
+            if ifh.tell() > data_start:
+                ifh.seek(ifh.tell() - 1)
+                ifh.readline()  # skip to the start of the next line
+            line = ifh.readline().rstrip(b'\r\n')
+            if line:
+                lines.add(line + b'\n')
+            if len(lines) >= sample_size:
+                break
+    return sorted(lines)
+
+
+def find_rows(engine, tablename, df, dtypes):
+    """Find which rows of `df` are in table `tablename`, using a single scan of the table.
+
+    Values can be strings, which the database converts to the types of their columns.
+    Nulls match nulls, and floating point values are compared with a relative tolerance of
+    :data:`FLOAT_TOLERANCE`.
+
+    Returns
+    -------
+    found : list of bool
+    """
+    if df.empty:
+        return []
+    table = sa.table(tablename, *[sa.column(c) for c in df.columns])
+    matches = [
+        sa.func.sum(sa.case([(sa.and_(*[
+            _get_match_condition(table.c[column], value, dtypes.get(column))
+            for column, value in zip(df.columns, row)
+        ]), 1)], else_=0))
+        for row in df.itertuples(index=False)
+    ]
+    with engine.connect() as connection:
+        counts = connection.execute(sa.select(matches).select_from(table)).first()
+    return [bool(count) for count in counts]
+
+
+def _get_match_condition(column, value, dtype):
+    """
+    Examples
+    --------
+    >>> from sqlalchemy.dialects import mysql
+    >>> print(_get_match_condition(sa.column('a'), '0.5', mysql.DOUBLE()))
+    abs(a - :a_1) <= :abs_1
+    """
+    if pd.isnull(value):
+        return column.is_(None)
+    if hasattr(value, 'item'):
+        value = value.item()  # numpy scalar
+    if isinstance(dtype, sa.Boolean) and value in ['True', 'False']:
+        value = value == 'True'
+    elif isinstance(dtype, sa.Float):
+        value = float(value)
+        return sa.func.abs(column - value) <= FLOAT_TOLERANCE * abs(value)
+    return column == value
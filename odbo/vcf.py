@@ -0,0 +1,258 @@
+"""Read VCF files in chunks of rows, with INFO fields stored in typed columns.
+
+The ``##`` meta-information lines are read once, from the start of the (decompressed) file,
+and data lines are parsed from the byte offset where the header ends. The ``##INFO`` lines
+declare the type of every INFO field, so fields can be stored in columns of their own
+(which can be indexed), instead of in one text column which has to be searched with ``LIKE``.
+
+Examples
+--------
+>>> import io
+>>> ifh = io.BytesIO(b'''##fileformat=VCFv4.2
+... ##INFO=<ID=DP,Number=1,Type=Integer,Description="Total depth">
+... ##INFO=<ID=DB,Number=0,Type=Flag,Description="dbSNP membership, build 129">
+... #CHROM\\tPOS\\tID\\tREF\\tALT\\tQUAL\\tFILTER\\tINFO
+... 1\\t100\\trs1\\tA\\tG\\t50\\tPASS\\tDP=10;DB
+... X\\t200\\t.\\tC\\tT,G\\t.\\tq10\\t.
+... ''')
+>>> header = read_vcf_header(ifh)
+>>> header.info_fields['DB']
+VCFField(id='DB', number='0', type='Flag', description='dbSNP membership, build 129')
+>>> df = next(iter_vcf_frames(ifh, header, info_fields=True))
+>>> df[['chrom', 'pos', 'id', 'alt', 'qual', 'dp', 'db']]
+  chrom  pos   id  alt  qual    dp     db
+0     1  100  rs1    G  50.0    10   True
+1     X  200  NaN  T,G   NaN  <NA>  False
+"""
+import csv
+import logging
+import re
+from collections import OrderedDict, namedtuple
+from contextlib import ExitStack
+
+import pandas as pd
+from sqlalchemy.dialects import mysql
+
+from kmtools.df_tools import format_columns, get_df_dtypes
+
+logger = logging.getLogger(__name__)
+
+#: Number of data lines in every chunk
+CHUNKSIZE = 100000
+
+#: Column types of INFO fields with a single value, as declared in the ``##INFO`` header.
+#: The VCF specification restricts ``Integer`` values to 32-bit signed integers.
+INFO_DTYPES = {
+    'Integer': mysql.INTEGER(),
+    'Float': mysql.DOUBLE(asdecimal=True),
+    'Flag': mysql.BOOLEAN(),
+}
+
+VCFField = namedtuple('VCFField', ['id', 'number', 'type', 'description'])
+VCFField.__doc__ = "Declaration of an INFO field, from a ``##INFO=<...>`` header line."
+
+_META_RE = re.compile(r'^##(\w+)=<(.*)>$')
+_META_ITEM_RE = re.compile(r'(\w+)=("(?:[^"\\]|\\.)*"|[^,]*)')
+
+
+class VCFHeader:
+    """Meta-information and column names of a VCF file.
+
+    Attributes
+    ----------
+    meta : list
+        The ``##`` lines of the header, without the leading ``##``.
+    info_fields : OrderedDict
+        :class:`VCFField` declarations of the INFO fields, by ID.
+    columns : list
+        Column names, from the ``#CHROM`` line (without the ``#``).
+    offset : int
+        Number of (decompressed) bytes in the header, including the ``#CHROM`` line.
+    """
+
+    def __init__(self, meta, info_fields, columns, offset):
+        self.meta = meta
+        self.info_fields = info_fields
+        self.columns = columns
+        self.offset = offset
+
+    def __repr__(self):
+        return "VCFHeader(columns={!r}, info_fields={!r})".format(
+            self.columns, list(self.info_fields))
+
+
+def read_vcf_header(ifh):
+    """Read the header of a VCF file from binary file object `ifh`.
+
+    `ifh` is left at the start of the first data line.
+    """
+    meta = []
+    info_fields = OrderedDict()
+    offset = 0
+    for line in ifh:
+        offset += len(line)
+        line = line.decode('utf-8').rstrip('\r\n')
+        if not line.startswith('##'):
+            break
+        meta.append(line[2:])
+        match = _META_RE.match(line)
+        if match and match.group(1) == 'INFO':
+            field = _parse_info_declaration(match.group(2))
+            info_fields[field.id] = field
+    else:
+        line = ''
+    if not line.startswith('#CHROM'):
+        raise ValueError("VCF file does not have a '#CHROM' header line!")
+    return VCFHeader(meta, info_fields, line[1:].split('\t'), offset)
+
+
+def iter_vcf_frames(ifh, header, info_fields=None, keep_info=False, chunksize=CHUNKSIZE):
+    """Parse the data lines of a VCF file, `chunksize` lines at a time.
+
+    Parameters
+    ----------
+    ifh : file object
+        Binary file object, at the start of the first data line (see :func:`read_vcf_header`).
+    header : VCFHeader
+        Header of the file.
+    info_fields : list | bool | None
+        IDs of the INFO fields which should be stored in columns of their own,
+        or True for all fields declared in the header.
+        Fields with a single value are converted to the type declared in the header,
+        and flags to booleans. Fields with several values are kept as strings.
+    keep_info : bool
+        Whether to keep the INFO column when `info_fields` are stored in columns of their own.
+
+    Yields
+    ------
+    df : DataFrame
+        Formatted column names. Missing values (``.``) are stored as nulls.
+    """
+    fields = _get_info_fields(header, info_fields)
+    columns = format_columns(header.columns)
+    # Line breaks within fields are not allowed, so the parser does not need quoting
+    dfs = pd.read_csv(
+        ifh, sep='\t', header=None, names=columns, dtype=str, na_values=['.'],
+        keep_default_na=False, quoting=csv.QUOTE_NONE, chunksize=chunksize)
+    for df in dfs:
+        df['pos'] = df['pos'].astype('int64')
+        df['qual'] = pd.to_numeric(df['qual']).astype(float)
+        if fields:
+            info = pd.DataFrame.from_records(
+                [_parse_info(value) for value in df['info']],
+                columns=[f.id for f in fields], index=df.index)
+            for field, column in _get_field_columns(fields, columns):
+                df[column] = _convert_info_values(info[field.id], field)
+            if not keep_info:
+                del df['info']
+        yield df
+
+
+def read_vcf(file, info_fields=None, keep_info=False, chunksize=CHUNKSIZE):
+    """Read the header of VCF file `file`, and iterate over its data in chunks.
+
+    `file` can be compressed (``.gz``, ``.bz2`` or ``.xz``).
+    See :func:`iter_vcf_frames` for a description of the parameters.
+
+    Returns
+    -------
+    header : VCFHeader
+    dfs : iterator of DataFrames
+    """
+    from kmtools import system_tools
+
+    stack = ExitStack()
+    ifh = stack.enter_context(system_tools.open_compressed(file, 'rb'))
+    try:
+        header = read_vcf_header(ifh)
+        _get_info_fields(header, info_fields)
+    except Exception:
+        stack.close()
+        raise
+    dfs = iter_vcf_frames(ifh, header, info_fields, keep_info, chunksize)
+    return header, _iter_closing(stack, dfs)
+
+
+def get_vcf_dtypes(header, df):
+    """Return column types for VCF data `df`, using the types of INFO fields declared in `header`.
+
+    Types of the other columns are inferred from `df`.
+    """
+    columns = format_columns(header.columns)
+    field_dtypes = {
+        column: INFO_DTYPES[field.type]
+        for field, column in _get_field_columns(header.info_fields.values(), columns)
+        if column in df.columns and field.type in INFO_DTYPES and
+        (field.number == '1' or field.type == 'Flag')
+    }
+    # Nullable integer columns are not supported by `get_df_dtypes`
+    dtypes = get_df_dtypes(df.astype({c: float for c in field_dtypes if df[c].dtype == 'Int64'}))
+    dtypes.update(field_dtypes)
+    return dtypes
+
+
+def _iter_closing(stack, dfs):
+    with stack:
+        yield from dfs
+
+
+def _parse_info_declaration(text):
+    """
+    Examples
+    --------
+    >>> _parse_info_declaration('ID=AF,Number=A,Type=Float,Description="Allele frequency"')
+    VCFField(id='AF', number='A', type='Float', description='Allele frequency')
+    """
+    items = {key: value for key, value in _META_ITEM_RE.findall(text)}
+    description = items.get('Description', '')
+    if description.startswith('"'):
+        description = re.sub(r'\\(.)', r'\1', description[1:-1])
+    return VCFField(items['ID'], items.get('Number', '.'), items.get('Type', 'String'),
+                    description)
+
+
+def _get_info_fields(header, info_fields):
+    if not info_fields:
+        return []
+    if info_fields is True:
+        return list(header.info_fields.values())
+    missing_fields = [f for f in info_fields if f not in header.info_fields]
+    if missing_fields:
+        raise ValueError(
+            "INFO fields {} are not declared in the VCF header!".format(missing_fields))
+    return [header.info_fields[f] for f in info_fields]
+
+
+def _get_field_columns(fields, columns):
+    """Pair INFO `fields` with the names of their columns, which must not clash with `columns`."""
+    fields = list(fields)
+    field_columns = format_columns([f.id for f in fields])
+    return [(f, 'info_' + c if c in columns else c) for f, c in zip(fields, field_columns)]
+
+
+def _parse_info(info):
+    """
+    Examples
+    --------
+    >>> _parse_info('DP=10;AF=0.5,0.25;DB')
+    {'DP': '10', 'AF': '0.5,0.25', 'DB': True}
+    """
+    if not isinstance(info, str):
+        return {}
+    fields = {}
+    for item in info.split(';'):
+        key, sep, value = item.partition('=')
+        fields[key] = value if sep else True
+    return fields
+
+
+def _convert_info_values(values, field):
+    if field.type == 'Flag':
+        return values.notnull()
+    values = values.where(values != '.')
+    if field.number != '1' or field.type not in ['Integer', 'Float']:
+        return values
+    values = pd.to_numeric(values)
+    if field.type == 'Integer':
+        values = values.astype('Int64')
+    return values
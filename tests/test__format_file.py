@@ -1,6 +1,7 @@
 import logging
 import os
 import os.path as op
+import pickle
 import tempfile
 import time
 
@@ -21,6 +22,21 @@ def test_csv_line_formatter():
     assert expected == actual, (expected, actual)
 
 
+def test_iter_decompress():
+    """Make sure that `iter_decompress` yields blocks of complete lines."""
+    data = b"a,b\n,1\nNS,2\nx,\n"
+    tf, infile = tempfile.mkstemp()
+    with open(infile, 'wb') as ofh:
+        ofh.write(data)
+
+    chunks = list(odbo._format_file_python.iter_decompress(
+        infile, sep=',', na_values=['', 'NS'], chunksize=5))
+    assert all(chunk.endswith(b"\n") for chunk in chunks)
+    assert b''.join(chunks) == b"a,b\n\\N,1\n\\N,2\nx,\\N\n"
+
+    os.remove(infile)
+
+
 @pytest.mark.parametrize("_format_file", [odbo._format_file_bash, odbo._format_file_python])
 def test__format_file(_format_file):
     """Make sure that `_format_file` correctly converts null values to '\\N'."""
@@ -39,3 +55,48 @@ def test__format_file(_format_file):
     assert (df1.fillna(0) == df2.fillna(0)).all().all()
 
     os.remove(outfile)
+
+
+@pytest.mark.parametrize("chunksize", [1, 16, 1024])
+def test_format_uncompressed(chunksize):
+    """Make sure that `format_uncompressed` produces the same output as `iter_decompress`."""
+    data = (
+        b"a,b,c\nx,y,z\n1,2,3\n" * 10 +
+        b",NS,\nx,1,NS\nNS,x,2\n" +
+        b"4,5,6\n" * 10 +
+        b"7,,8")
+    tf, infile = tempfile.mkstemp()
+    with open(infile, 'wb') as ofh:
+        ofh.write(data)
+    tf, outfile = tempfile.mkstemp()
+
+    na_values = ['', 'NS']
+    odbo._format_file_python.format_uncompressed(
+        infile, outfile, sep=',', na_values=na_values, chunksize=chunksize)
+    expected = b''.join(
+        odbo._format_file_python.iter_decompress(infile, sep=',', na_values=na_values))
+    with open(outfile, 'rb') as ifh:
+        assert ifh.read() == expected
+
+    os.remove(infile)
+    os.remove(outfile)
+
+
+def test_csv_line_formatter_cache():
+    """Make sure that formatters are reused, and can be sent to worker processes."""
+    extra_substitutions = [odbo._format_file_python.VCF_HEADER_SUBSTITUTION]
+    formatter = odbo._format_file_python.get_csv_line_formatter(
+        '\t', ['', 'NA'], extra_substitutions)
+    assert formatter is odbo._format_file_python.get_csv_line_formatter(
+        '\t', ('', 'NA'), tuple(extra_substitutions))
+    formatter2 = pickle.loads(pickle.dumps(formatter))
+    assert formatter2 is formatter
+    assert formatter2(b"##meta\na\tNA\t\n") == b"a\t\\N\t\\N\n"
+
+
+def test_sed_command_cache():
+    """Make sure that commands are reused, and are built for unhashable parameters."""
+    sed_command = odbo._format_file_bash.get_sed_command('\t', ['NA'], ['/^##/d'])
+    assert sed_command is odbo._format_file_bash.get_sed_command('\t', ('NA', ), ('/^##/d', ))
+    sed_command = odbo._format_file_bash.get_sed_command('\t', ['NA'], [['/^##/d']])
+    assert sed_command.startswith('sed -e ') and 'NA' in sed_command
@@ -0,0 +1,19 @@
+import os.path as op
+from concurrent.futures import ProcessPoolExecutor
+
+from odbo.batch import _prepare_file
+
+
+def test_prepare_file(tmpdir):
+    """Make sure that files can be prepared in worker processes."""
+    input_file = op.join(str(tmpdir), 'genes.tsv')
+    with open(input_file, 'wt') as ofh:
+        ofh.write('Gene ID\tName\n1\tTP53\n2\tBRCA2\n')
+    csv_opts = {'sep': '\t', 'na_values': []}
+    with ProcessPoolExecutor(1) as executor:
+        future = executor.submit(_prepare_file, input_file, None, None, None, True, csv_opts)
+        outfile, df, dtypes, not_null = future.result()
+    assert outfile == input_file
+    assert list(df.columns) == ['gene_id', 'name']
+    assert repr(dtypes['gene_id']) == 'TINYINT(unsigned=True)'
+    assert sorted(not_null) == ['gene_id', 'name']
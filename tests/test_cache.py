@@ -0,0 +1,31 @@
+import os
+import tempfile
+import time
+
+import pandas as pd
+
+from odbo.cache import QueryCache, get_cache_key
+
+
+def test_query_cache_eviction():
+    cache = QueryCache(tempfile.mkdtemp(), max_size=10 ** 9)
+    df = pd.DataFrame({'a': range(1000), 'b': ['x{}'.format(i) for i in range(1000)]})
+    keys = [get_cache_key('SELECT {}'.format(i), version=(1, )) for i in range(3)]
+    for key in keys:
+        assert cache.put(key, df)
+        time.sleep(0.01)
+    entry_size = os.path.getsize(cache._get_path(keys[0]))
+    # Reading results marks them as recently used
+    assert cache.get(keys[0]) is not None
+    assert cache.evict(max_size=entry_size * 2) == [keys[1]]
+    assert cache.get(keys[1]) is None
+    assert (cache.get(keys[2]).values == df.values).all()
+    assert sorted(cache.clear()) == sorted([keys[0], keys[2]])
+
+
+def test_query_cache_unsupported():
+    cache = QueryCache(tempfile.mkdtemp())
+    key = get_cache_key('SELECT 1', version=(1, ))
+    assert not cache.put(key, pd.DataFrame({'a': [1, 'a']}))
+    assert cache.get(key) is None
+    assert os.listdir(cache.cache_dir) == []
@@ -0,0 +1,101 @@
+import gzip
+import os.path as op
+import pickle
+import subprocess
+import tempfile
+import threading
+import time
+
+import pytest
+
+from odbo._format_file_bash import decompress
+from odbo.commands import (
+    CancellationToken, CancelledError, Command, DeadlineExceededError, iter_command_output,
+    run_command)
+from odbo.progress import Progress
+
+
+def _is_running(pid):
+    try:
+        with open('/proc/{}/stat'.format(pid)) as ifh:
+            # Killed processes can linger as zombies until they are reaped
+            return ifh.read().rpartition(')')[-1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+def test_cancellation_token():
+    parent = CancellationToken(timeout=60)
+    token = CancellationToken(timeout=3600, parent=parent)
+    # The earlier deadline wins
+    assert token.deadline == parent.deadline and token.timeout == 60
+    assert not token.cancelled
+    parent.cancel()
+    assert token.cancelled and not token.timed_out
+    with pytest.raises(CancelledError):
+        token.check()
+    # Only the deadline reaches other processes
+    token = pickle.loads(pickle.dumps(token))
+    assert not token.cancelled and token.remaining > 0
+    with pytest.raises(DeadlineExceededError):
+        CancellationToken(timeout=0).check()
+
+
+def test_run_command_kills_process_group():
+    """Make sure that every command of a pipeline is killed, not only the shell."""
+    tempdir = tempfile.mkdtemp()
+    pid_file = op.join(tempdir, 'pid')
+    partial_file = op.join(tempdir, 'partial.tmp')
+    start = time.time()
+    with pytest.raises(DeadlineExceededError):
+        run_command(
+            "sleep 30 & echo $! > '{}'; echo data > '{}'; wait".format(pid_file, partial_file),
+            timeout=0.5, cleanup=[partial_file])
+    assert time.time() - start < 10
+    with open(pid_file) as ifh:
+        pid = int(ifh.read())
+    time.sleep(0.1)
+    assert not _is_running(pid)
+    assert not op.exists(partial_file)
+
+
+def test_run_command_errors():
+    tempdir = tempfile.mkdtemp()
+    partial_file = op.join(tempdir, 'partial.tmp')
+    with pytest.raises(subprocess.CalledProcessError):
+        run_command("echo data > '{}'; exit 3".format(partial_file), cleanup=[partial_file])
+    assert not op.exists(partial_file)
+    assert run_command('exit 3', allowed_returncodes=[3]) == ('', '', 3)
+
+
+def test_command_cancel_from_another_thread():
+    token = CancellationToken()
+    threading.Timer(0.2, token.cancel).start()
+    with pytest.raises(CancelledError) as excinfo:
+        with Command(['sleep', '30'], cancel=token) as command:
+            command.process.wait()
+    assert not isinstance(excinfo.value, DeadlineExceededError)
+    assert command.process.returncode is not None
+
+
+def test_iter_command_output():
+    assert list(iter_command_output("printf 'a\\n\\nb\\n'")) == ['a', 'b']
+    lines = iter_command_output("sh -c 'echo a; sleep 30'")
+    assert next(lines) == 'a'
+    # The command is killed when nobody reads the rest of its output
+    lines.close()
+
+
+def test_decompress_cancelled():
+    """Make sure that the partly decompressed file is removed."""
+    tempdir = tempfile.mkdtemp()
+    infile = op.join(tempdir, 'data.tsv.gz')
+    with gzip.open(infile, 'wt') as ofh:
+        for i in range(10000):
+            ofh.write('{}\tNA\n'.format(i))
+    token = CancellationToken()
+    token.cancel()
+    progress = Progress('format', total=op.getsize(infile))
+    with pytest.raises(CancelledError):
+        decompress(infile, na_values=['NA'], progress=progress, cancel=token)
+    assert not op.exists(infile + '.tmp')
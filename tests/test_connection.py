@@ -1,3 +1,5 @@
+import functools
+import gzip
 import logging
 import os
 import os.path as op
@@ -5,13 +7,17 @@ import shlex
 import shutil
 import subprocess
 import tempfile
+import time
 
 import pandas as pd
 import psutil
 import pytest
+import sqlalchemy as sa
 
 import odbo
 from odbo import get_tablename
+from odbo._format_file_python import iter_decompress
+from odbo.connection import _get_file_import_dtypes, _get_file_segments, _write_segment
 
 logger = logging.getLogger(__name__)
 
@@ -95,3 +101,559 @@ class TestMySQL:
             if c in df.columns:
                 df[c] = pd.to_numeric(df[c])
         assert (df.fillna(0) == df2.fillna(0)).all().all()
+
+    def test_auto_index(self):
+        df = pd.DataFrame({
+            'gene_name': ['g{}'.format(i) for i in range(100)],
+            'gene_id': range(100),
+            'strand': ['+', '-'] * 50,
+        })
+        table = self.db.import_df(df, 'auto_index_me')
+        index_commands = [('strand', False)] * 30
+        table.create_indexes(index_commands)
+        assert len(table.get_indexes()) == 30
+        primary_key, index_commands = table.auto_index(min_selectivity=0.1)
+        assert primary_key == 'gene_id'
+        assert index_commands == [('gene_name', True)]
+        assert {'PRIMARY', 'AE'} <= table.get_indexes()
+
+    def test_import_file_partitioned(self):
+        df = pd.DataFrame({
+            'chrom': ['1', '2', 'X'] * 100,
+            'pos': range(300),
+        })
+        input_file = op.join(self.tempdir, 'variants.tsv')
+        df.to_csv(input_file, sep='\t', index=False)
+        partitioning = odbo.Partitioning('LIST', 'chrom', {'p1': ['1'], 'p2': ['2'], 'pX': ['X']})
+        table = self.db.import_file(input_file, partitioning=partitioning, num_workers=3)
+        df2 = pd.read_sql_table(table.name, self.db.engine)
+        assert len(df2) == 300
+        assert (df2.sort_values('pos').values == df.values).all()
+        partitions = table.get_partitions()
+        assert list(partitions['partition_name']) == ['p1', 'p2', 'pX']
+
+    def test_import_file_resume(self, monkeypatch):
+        df = pd.DataFrame({'id': range(1000), 'value': ['v{}'.format(i) for i in range(1000)]})
+        input_file = op.join(self.tempdir, 'resumable.tsv')
+        df.to_csv(input_file, sep='\t', index=False)
+        # Fail in the middle of the import
+        _load_segment = odbo.MySQLConnection._load_segment
+
+        def load_segment(self, tsv_filepath, tablename, segment, *args):
+            if segment == 3:
+                raise RuntimeError("Lost connection!")
+            return _load_segment(self, tsv_filepath, tablename, segment, *args)
+
+        # Partly copied segments cannot be undone in MyISAM tables
+        with pytest.raises(ValueError):
+            self.db.import_file(input_file, segment_size=1000)
+        db = odbo.MySQLConnection(
+            connection_string=self.db.connection_string,
+            shared_folder=self.db.shared_folder,
+            storage_host=None,
+            db_engine='InnoDB',
+        )
+        monkeypatch.setattr(odbo.MySQLConnection, '_load_segment', load_segment)
+        with pytest.raises(RuntimeError):
+            db.import_file(input_file, segment_size=1000)
+        progress = db.get_load_progress('resumable')
+        assert list(progress['segment']) == [0, 1, 2]
+        rows_before = progress['num_rows'].cumsum() - progress['num_rows']
+        assert (progress['rows_before'] == rows_before).all()
+        assert not [f for f in os.listdir(self.tempdir) if f.endswith('.segment')]
+        # Resume
+        monkeypatch.setattr(odbo.MySQLConnection, '_load_segment', _load_segment)
+        table = db.import_file(input_file, segment_size=1000)
+        df2 = pd.read_sql_table(table.name, db.engine)
+        assert (df2.sort_values('id').values == df.values).all()
+        assert db.get_load_progress('resumable').empty
+
+    def test_import_df_streaming(self):
+        df = pd.DataFrame({'id': range(1000), 'value': ['v{}'.format(i) for i in range(1000)]})
+        df.loc[::7, 'value'] = None
+        table = self.db.import_df(df, 'streamed', chunksize=64, num_workers=3, max_pending=2)
+        assert table.tempfile is None
+        assert not [f for f in os.listdir(self.db.shared_folder) if f.startswith('streamed')]
+        df2 = pd.read_sql_table(table.name, self.db.engine)
+        assert (df2.sort_values('id').fillna(0).values == df.fillna(0).values).all()
+
+    def test_import_file_storage_host(self):
+        df = pd.DataFrame({'id': range(100), 'value': ['v{}'.format(i) for i in range(100)]})
+        df.loc[::3, 'value'] = '.'
+        input_file = op.join(self.tempdir, 'remote.tsv.gz')
+        df.to_csv(input_file, sep='\t', index=False)
+        db = odbo.MySQLConnection(
+            connection_string=self.db.connection_string,
+            shared_folder=self.db.shared_folder,
+            storage_host=odbo.LocalTransport(),
+            db_engine='MyISAM',
+        )
+        table = db.import_file(input_file)
+        assert table.tempfile is None
+        df2 = pd.read_sql_table(table.name, self.db.engine)
+        assert df2['value'].isnull().sum() == 34
+        assert (df2.sort_values('id')['id'].values == df['id'].values).all()
+
+    def test_import_file_storage_host_widening(self):
+        df = pd.DataFrame({'id': range(100), 'value': range(100)})
+        df['value'] = df['value'].astype(object)
+        df.loc[90, 'value'] = 'abcdefghij' * 10
+        input_file = op.join(self.tempdir, 'remote_widening.tsv')
+        df.to_csv(input_file, sep='\t', index=False)
+        transport = odbo.LocalTransport()
+        transport.iter_output = functools.partial(transport.iter_output, chunksize=64)
+        db = odbo.MySQLConnection(
+            connection_string=self.db.connection_string,
+            shared_folder=self.db.shared_folder,
+            storage_host=transport,
+            db_engine='MyISAM',
+        )
+        table = db.import_file(input_file, validate=True)
+        df2 = pd.read_sql_table(table.name, self.db.engine)
+        assert (df2.sort_values('id')['value'].values == df['value'].astype(str).values).all()
+
+    def test_snapshot(self):
+        db = odbo.MySQLConnection(
+            connection_string=self.db.connection_string,
+            shared_folder=self.db.shared_folder,
+            storage_host=None,
+            datadir=self.mysqld.datadir,
+            db_engine='MyISAM',
+        )
+        df = pd.DataFrame({'id': range(100), 'value': ['v{}'.format(i) for i in range(100)]})
+        table = db.import_df(df, 'packed')
+        table.compress()
+        snapshot_dir = op.join(self.tempdir, 'packed_snapshot')
+        manifest = table.export_snapshot(snapshot_dir)
+        assert manifest['row_format'] == 'Compressed'
+        table2 = db.import_snapshot(snapshot_dir, 'packed_copy')
+        assert list(table2.dtypes) == ['id', 'value']
+        df2 = pd.read_sql_table('packed_copy', db.engine)
+        assert (df2.sort_values('id').values == df.values).all()
+        with pytest.raises(ValueError):
+            db.import_snapshot(snapshot_dir, 'packed_copy', if_exists='fail')
+
+    def test_query_cache(self, monkeypatch):
+        df = pd.DataFrame({'id': range(100), 'value': ['v{}'.format(i % 3) for i in range(100)]})
+        table = self.db.import_df(df, 'cached')
+        cache_dir = op.join(self.tempdir, 'query_cache')
+        sql_query = 'SELECT value, COUNT(*) AS n FROM cached GROUP BY value ORDER BY value'
+        # Tables which can still change are not cached
+        assert list(table.query(sql_query, cache_dir=cache_dir)['n']) == [34, 33, 33]
+        assert not op.isdir(cache_dir) or not os.listdir(cache_dir)
+        table.compress()
+        df1 = table.query(sql_query, cache_dir=cache_dir)
+        assert list(df1['n']) == [34, 33, 33]
+        assert len(os.listdir(cache_dir)) == 1
+        # A repeated query does not run on the server
+        monkeypatch.setattr(pd, 'read_sql_query', None)
+        df2 = table.query(sql_query, cache_dir=cache_dir)
+        assert (df1.values == df2.values).all()
+        monkeypatch.undo()
+        # Results are not reused once the table is loaded again
+        # (creation times only have a resolution of one second)
+        time.sleep(1)
+        df['value'] = 'v0'
+        table = self.db.import_df(df, 'cached')
+        table.compress()
+        assert list(table.query(sql_query, cache_dir=cache_dir)['n']) == [100]
+
+    def test_dictionary_columns(self):
+        df = pd.DataFrame({
+            'id': range(100),
+            'gene_name': [['BRCA1', 'TP53', 'KRAS'][i % 3] for i in range(100)],
+        })
+        df.loc[::10, 'gene_name'] = None
+        input_file = op.join(self.tempdir, 'encoded.tsv')
+        df.to_csv(input_file, sep='\t', index=False, na_rep='\\N')
+        table = self.db.import_file(input_file, dictionary_columns=True, validate=True)
+        assert repr(table.dtypes['gene_name']) == 'SMALLINT(unsigned=True)'
+        lookup_df = pd.read_sql_table('encoded__gene_name', self.db.engine)
+        assert sorted(lookup_df['value']) == ['BRCA1', 'KRAS', 'TP53']
+        df2 = pd.read_sql_query('SELECT * FROM encoded__view ORDER BY id', self.db.engine)
+        assert (df2.fillna('').values == df.fillna('').values).all()
+        # Dataframes can be encoded as well
+        self.db.import_df(df, 'encoded_df', dictionary_columns=['gene_name'])
+        df3 = pd.read_sql_query('SELECT * FROM encoded_df__view ORDER BY id', self.db.engine)
+        assert (df3.fillna('').values == df.fillna('').values).all()
+
+    def test_load_plan(self):
+        genes = pd.DataFrame({'gene_id': range(10), 'name': ['g{}'.format(i) for i in range(10)]})
+        genes_file = op.join(self.tempdir, 'plan_genes.tsv')
+        genes.to_csv(genes_file, sep='\t', index=False)
+        self.db.import_df(genes[:2], 'plan_genes')
+        plan = odbo.LoadPlan(self.db)
+        plan.add(genes_file, primary_key='gene_id')
+        plan.add(genes_file, 'plan_names', index_commands=[('name', True)])
+        tables = plan.run(num_processes=2, num_threads=2)
+        assert sorted(tables) == ['plan_genes', 'plan_names']
+        assert self.db._count_rows('plan_genes') == 10
+        assert len(tables['plan_names'].get_indexes()) == 1
+        # Nothing is published if any of the files fails to load
+        plan = odbo.LoadPlan(self.db)
+        plan.add(genes_file, 'plan_genes_2')
+        plan.add(op.join(self.tempdir, 'missing.tsv'), 'plan_genes')
+        with pytest.raises(Exception):
+            plan.run()
+        assert self.db._count_rows('plan_genes') == 10
+        assert 'plan_genes_2' not in sa.inspect(self.db.engine).get_table_names()
+
+    def test_import_file_dry_run(self):
+        df = pd.DataFrame({'id': range(1000), 'value': ['v{}'.format(i) for i in range(1000)]})
+        input_file = op.join(self.tempdir, 'dry_run.tsv')
+        df.to_csv(input_file, sep='\t', index=False)
+        estimate = self.db.import_file(input_file, dry_run=True)
+        assert estimate.exact and estimate.num_rows == 1000
+        assert set(estimate.table_sizes) == set(odbo.estimate.ENGINES)
+        assert 'dry_run' not in sa.inspect(self.db.engine).get_table_names()
+
+    def test_import_file_cancelled(self):
+        df = pd.DataFrame({'id': range(1000), 'value': ['v{}'.format(i) for i in range(1000)]})
+        input_file = op.join(self.tempdir, 'cancelled.tsv')
+        df.to_csv(input_file, sep='\t', index=False)
+        token = odbo.CancellationToken()
+        token.cancel()
+        with pytest.raises(odbo.commands.CancelledError):
+            self.db.import_file(input_file, progress_callback=lambda p: None, cancel=token)
+        assert 'cancelled' not in sa.inspect(self.db.engine).get_table_names()
+        # The same file can be loaded once nothing stops the import
+        table = self.db.import_file(input_file, timeout=600)
+        assert self.db._count_rows(table.name) == 1000
+
+    def test_reload_keeps_layout(self):
+        df = pd.DataFrame({'id': range(100), 'value': ['v{}'.format(i) for i in range(100)]})
+        table = self.db.import_df(df, 'reloaded')
+        table.create_indexes([('value', True)], primary_key='id')
+        table = self.db.import_df(df[:10], 'reloaded')
+        assert self.db._count_rows('reloaded') == 10
+        assert table.get_indexes() == {'PRIMARY', 'A'}
+        # Indexes which the table already has are not created twice
+        table.create_indexes([('value', True)], primary_key='id')
+        assert table.get_indexes() == {'PRIMARY', 'A'}
+        # Columns which do not fit the new data are changed in place
+        df['value'] = df['value'] * 100
+        self.db.import_df(df, 'reloaded')
+        df2 = pd.read_sql_query('SELECT * FROM reloaded ORDER BY id', self.db.engine)
+        assert (df2.values == df.values).all()
+        assert table.get_indexes() == {'PRIMARY', 'A'}
+
+    def test_import_file_validate(self):
+        df = pd.DataFrame({'id': range(100), 'value': ['v{}'.format(i) for i in range(100)]})
+        input_file = op.join(self.tempdir, 'validated.tsv')
+        df.to_csv(input_file, sep='\t', index=False)
+        self.db.import_file(input_file, validate=True)
+        # Values which do not fit into their columns are truncated, with warnings
+        with pytest.raises(odbo.validation.LoadValidationError) as excinfo:
+            self.db.import_file(
+                input_file, extra_dtypes={'value': sa.types.String(2)}, validate=True,
+                sample_size=100)
+        report = excinfo.value.report
+        assert report.num_rows == report.expected_rows == 100
+        assert report.load_warnings.by_column['value'] > 0
+        assert not report.mismatches.empty
+
+    def test_import_df_chunks(self):
+        dfs = [
+            pd.DataFrame({'id': [1, 2], 'value': ['a', 'b']}),
+            pd.DataFrame({'value': ['c', None], 'id': [3, 4]}),
+            pd.DataFrame({'id': [2 ** 40, 6], 'value': ['x' * 300, 'y']}),
+        ]
+        table = self.db.import_df_chunks(iter(dfs), 'chunked', num_workers=2, max_pending=1)
+        assert str(table.dtypes['id']) == 'BIGINT'
+        df = pd.concat(dfs, sort=False)[['id', 'value']]
+        df2 = pd.read_sql_table(table.name, self.db.engine)
+        assert (df2.sort_values('id').fillna(0).values == df.fillna(0).values).all()
+
+
+@pytest.mark.skipif(shutil.which('pg_ctl') is None, reason="PostgreSQL is not installed.")
+class TestPostgres:
+
+    @classmethod
+    def setup_class(cls):
+        cls.tempdir = tempfile.mkdtemp()
+        datadir = op.join(cls.tempdir, 'postgres_db')
+        # Start PostgreSQL
+        postgres = odbo.PostgresDaemon(
+            datadir=datadir,
+            db_socket=cls.tempdir,
+        )
+        postgres.install_db()
+        postgres.start()
+        # Save state
+        cls.postgres = postgres
+
+    @classmethod
+    def teardown_class(cls):
+        cls.postgres.stop()
+        assert not cls.postgres._is_running
+        shutil.rmtree(cls.tempdir)
+
+    def setup_method(self, method):
+        db_schema = 'testing'
+        shared_folder = op.join(self.tempdir, 'share')
+        connection_string = self.postgres.get_connection_string(db_schema)
+        logger.debug("connection_string: {}".format(connection_string))
+        self.db = odbo.PostgresConnection(
+            connection_string=connection_string,
+            shared_folder=shared_folder,
+            storage_host=None,
+            echo=False,
+        )
+
+    def test_import_df(self):
+        df = pd.DataFrame([[1, 'aaa'], [2, 'bbb'], [3, None]], columns=['id', 'value'])
+        self.db.import_df(df, 'xoxo', chunksize=2)
+        df2 = pd.read_sql_table('xoxo', self.db.engine)
+        assert (df.fillna(0) == df2.fillna(0)).all().all()
+
+    def test_import_df_chunks(self):
+        dfs = [
+            pd.DataFrame({'id': [1, 2], 'value': ['a', 'b']}),
+            pd.DataFrame({'id': [3.5, None], 'value': ['c', None]}),
+        ]
+        table = self.db.import_df_chunks(iter(dfs), 'chunked')
+        assert str(table.dtypes['id']) == 'DOUBLE'
+        df2 = pd.read_sql_table(table.name, self.db.engine)
+        assert list(df2['id'].fillna(0)) == [1, 2, 3.5, 0]
+
+    def test_import_vcf(self):
+        vcf_file = op.join(self.tempdir, 'variants.vcf.gz')
+        with gzip.open(vcf_file, 'wt') as ofh:
+            ofh.write(
+                '##INFO=<ID=DP,Number=1,Type=Integer,Description="Depth">\n'
+                '##INFO=<ID=DB,Number=0,Type=Flag,Description="dbSNP">\n'
+                '#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n' +
+                '1\t100\trs1\tA\tG\t50\tPASS\tDP=10;DB\n' * 3 +
+                '1\t200\t.\tC\tT\t.\tPASS\tDP=3000000000\n')
+        table = self.db.import_vcf(vcf_file, chunksize=2)
+        assert str(table.dtypes['dp']) == 'BIGINT'
+        df = pd.read_sql_table(table.name, self.db.engine)
+        assert list(df['dp']) == [10, 10, 10, 3000000000]
+        assert list(df['db']) == [True, True, True, False]
+
+    def test_import_fwf(self):
+        fwf_file = op.join(self.tempdir, 'annotations.fwf.gz')
+        with gzip.open(fwf_file, 'wt') as ofh:
+            ofh.write('gene   start  name\n' + 'ENSG1  100    abc\n' * 3 + 'ENSG2  1.5    \n')
+        table = self.db.import_fwf(fwf_file, chunksize=2)
+        assert table.name == 'annotations'
+        df = pd.read_sql_table(table.name, self.db.engine)
+        assert list(df['start']) == [100, 100, 100, 1.5]
+        assert list(df['name'].fillna('')) == ['abc', 'abc', 'abc', '']
+
+    def test_import_file_widens_columns(self, monkeypatch):
+        """Make sure that values which do not fit into the types inferred from the first
+        block of the file do not make ``COPY`` fail.
+        """
+        monkeypatch.setattr(
+            'odbo.connection.iter_decompress', functools.partial(iter_decompress, chunksize=64))
+        input_file = op.join(self.tempdir, 'widened.tsv.gz')
+        with gzip.open(input_file, 'wt') as ofh:
+            ofh.write('id\tscore\tname\n' + '1\t2\ta\n' * 20 + '2\t2.5\tabcdef\n3\tx\tb\n')
+        table = self.db.import_file(input_file)
+        df = pd.read_sql_table(table.name, self.db.engine)
+        assert list(df['score'][-3:]) == ['2', '2.5', 'x']
+        assert list(df['name'][-3:]) == ['a', 'abcdef', 'b']
+
+    @pytest.mark.parametrize("input_file", [
+        op.join(op.abspath(op.splitext(__file__)[0]), 'CosmicCellLineProject.tsv.gz'),
+        op.join(op.abspath(op.splitext(__file__)[0]), 'CosmicNonCodingVariants.vcf.gz'),
+    ])
+    def test_import_file(self, input_file):
+        table = self.db.import_file(input_file)
+        df = pd.read_sql_table(table.name, self.db.engine)
+        df2 = pd.read_csv(op.join(op.splitext(__file__)[0], op.splitext(input_file)[0] + '.db.gz'))
+        # Hacky thing with integer columns
+        for c in ['grch', 'fathmm_score', 'patient_age']:
+            if c in df.columns:
+                df[c] = pd.to_numeric(df[c])
+        assert (df.fillna(0) == df2.fillna(0)).all().all()
+
+
+class TestSQLite:
+
+    @classmethod
+    def setup_class(cls):
+        cls.tempdir = tempfile.mkdtemp()
+
+    @classmethod
+    def teardown_class(cls):
+        shutil.rmtree(cls.tempdir)
+
+    def setup_method(self, method):
+        shared_folder = op.join(self.tempdir, 'share')
+        connection_string = 'sqlite:///' + op.join(self.tempdir, 'testing.db')
+        self.db = odbo.SQLiteConnection(
+            connection_string=connection_string,
+            shared_folder=shared_folder,
+            echo=False,
+            batchsize=10,
+        )
+
+    def test_import_df(self):
+        df = pd.DataFrame([[1, 'aaa'], [2, 'bbb'], [3, None]], columns=['id', 'value'])
+        table = self.db.import_df(df, 'xoxo', index_commands=[('id', True)])
+        df2 = pd.read_sql_table('xoxo', self.db.engine)
+        assert (df.fillna(0) == df2.fillna(0)).all().all()
+        assert table.get_indexes() == {'xoxo_a'}
+
+    def test_create_indexes_many(self):
+        df = pd.DataFrame({'id': range(10), 'strand': ['+', '-'] * 5})
+        table = self.db.import_df(df, 'many_indexes')
+        table.create_indexes([('strand', False)] * 30)
+        assert len(table.get_indexes()) == 30
+        assert {'many_indexes_z', 'many_indexes_ad'} <= table.get_indexes()
+
+    def test_import_file_generated(self):
+        df = pd.DataFrame({
+            'Gene Name': ['g{}'.format(i) for i in range(100)],
+            'Score': [i / 3 if i % 7 else None for i in range(100)],
+            'Count': [i for i in range(100)],
+        })
+        input_file = op.join(self.tempdir, 'GeneScores.tsv.gz')
+        df.to_csv(input_file, sep='\t', index=False, na_rep='NA')
+        table = self.db.import_file(input_file, na_values=['NA'])
+        assert table.name == 'gene_scores'
+        df2 = pd.read_sql_table(table.name, self.db.engine)
+        assert list(df2.columns) == ['gene_name', 'score', 'count']
+        assert (df.fillna(0).values == df2.fillna(0).values).all()
+
+    @pytest.mark.parametrize("input_file", [
+        op.join(op.abspath(op.splitext(__file__)[0]), 'CosmicCellLineProject.tsv.gz'),
+        op.join(op.abspath(op.splitext(__file__)[0]), 'CosmicNonCodingVariants.vcf.gz'),
+    ])
+    def test_import_file(self, input_file):
+        table = self.db.import_file(input_file)
+        df = pd.read_sql_table(table.name, self.db.engine)
+        df2 = pd.read_csv(op.join(op.splitext(__file__)[0], op.splitext(input_file)[0] + '.db.gz'))
+        # Hacky thing with integer columns
+        for c in ['grch', 'fathmm_score', 'patient_age']:
+            if c in df.columns:
+                df[c] = pd.to_numeric(df[c])
+        assert (df.fillna(0) == df2.fillna(0)).all().all()
+
+    def test_export(self):
+        df = pd.DataFrame(
+            [[1, 'aaa', 0.5], [2, 'bbbbbb', None], [3, None, 1.5]],
+            columns=['id', 'value', 'score'])
+        table = self.db.import_df(df, 'export_me')
+        hdf5_file = table.to_hdf5(op.join(self.tempdir, 'export_me.h5'), chunksize=2)
+        df2 = pd.read_hdf(hdf5_file, 'export_me', columns=['id', 'value'])
+        assert df2['id'].dtype == 'int64'
+        assert (df[['id', 'value']].fillna(0) == df2.fillna(0)).all().all()
+        parquet_file = table.to_parquet(op.join(self.tempdir, 'export_me.parquet'), chunksize=2)
+        df3 = pd.read_parquet(parquet_file)
+        assert (df.fillna(0) == df3.fillna(0)).all().all()
+
+    def test_propose_indexes(self):
+        df = pd.DataFrame({
+            'gene_name': ['g{}'.format(i) for i in range(100)],
+            'gene_id': range(100),
+            'strand': ['+', '-'] * 50,
+            'score': [i / 3 for i in range(100)],
+        })
+        table = self.db.import_df(df, 'index_me')
+        primary_key, index_commands = table.propose_indexes(min_selectivity=0.1)
+        assert primary_key == 'gene_id'
+        assert index_commands == [('gene_name', True)]
+        # Reuse statistics gathered during the load
+        column_stats = odbo.schema.get_column_stats([df])
+        cardinality = table.get_cardinality(column_stats=column_stats)
+        assert cardinality.loc['strand', 'num_distinct'] == 2
+        assert (cardinality['num_rows'] == 100).all()
+
+
+class TestColumnar:
+
+    @classmethod
+    def setup_class(cls):
+        cls.tempdir = tempfile.mkdtemp()
+        cls.df = pd.DataFrame({
+            'Gene Name': ['g{}'.format(i) for i in range(100)],
+            'Score': [i / 3 if i % 7 else None for i in range(100)],
+            'Count': [i for i in range(100)],
+        })
+        cls.input_file = op.join(cls.tempdir, 'GeneScores.tsv.gz')
+        cls.df.to_csv(cls.input_file, sep='\t', index=False, na_rep='NA')
+
+    @classmethod
+    def teardown_class(cls):
+        shutil.rmtree(cls.tempdir)
+
+    def test_hdf5(self):
+        db = odbo.HDF5Connection(op.join(self.tempdir, 'testing.h5'))
+        hdf5_file = db.import_file(self.input_file, na_values=['NA'])
+        df = pd.read_hdf(hdf5_file, 'gene_scores')
+        assert list(df.columns) == ['gene_name', 'score', 'count']
+        pd.testing.assert_frame_equal(
+            df, self.df.set_axis(df.columns, axis=1), check_dtype=False)
+
+    def test_hdf5_string_widths(self, monkeypatch):
+        """Make sure that strings in later blocks of the file can be longer than
+        the strings in the first block.
+        """
+        monkeypatch.setattr(
+            'odbo.connection.iter_decompress', functools.partial(iter_decompress, chunksize=64))
+        input_file = op.join(self.tempdir, 'Names.tsv.gz')
+        with gzip.open(input_file, 'wt') as ofh:
+            ofh.write('id\tname\n' + '1\tab\n' * 20 + '2\t{}\n'.format('x' * 2000))
+        db = odbo.HDF5Connection(op.join(self.tempdir, 'testing.h5'))
+        hdf5_file = db.import_file(input_file)
+        df = pd.read_hdf(hdf5_file, 'names')
+        assert df['name'].str.len().tolist() == [2] * 20 + [2000]
+        # Files with only a header have no rows to store
+        input_file = op.join(self.tempdir, 'Empty.tsv')
+        with open(input_file, 'w') as ofh:
+            ofh.write('id\tname\n')
+        db.import_file(input_file)
+
+    def test_parquet(self):
+        db = odbo.ParquetConnection(self.tempdir)
+        parquet_file = db.import_file(self.input_file, na_values=['NA'])
+        df = pd.read_parquet(parquet_file, columns=['count'])
+        assert df['count'].tolist() == self.df['Count'].tolist()
+
+    def test_parquet_multiple_blocks(self, monkeypatch):
+        """Make sure that values which do not fit into the types inferred from the first
+        block of the file do not make the import fail.
+        """
+        monkeypatch.setattr(
+            'odbo.connection.iter_decompress', functools.partial(iter_decompress, chunksize=64))
+        input_file = op.join(self.tempdir, 'Mixed.tsv.gz')
+        with gzip.open(input_file, 'wt') as ofh:
+            ofh.write('id\tcount\n' + '1\t2\n' * 20 + '2\tabc\n')
+        db = odbo.ParquetConnection(self.tempdir)
+        parquet_file = db.import_file(input_file)
+        df = pd.read_parquet(parquet_file)
+        assert df['count'].tolist() == ['2'] * 20 + ['abc']
+
+
+def test_get_file_segments():
+    with tempfile.TemporaryDirectory() as tempdir:
+        file = op.join(tempdir, 'segments.tsv')
+        with open(file, 'w') as fout:
+            fout.write('id\tvalue\n')
+            fout.writelines('{0}\tv{0}\n'.format(i) for i in range(100))
+        segments = _get_file_segments(file, segment_size=50, skiprows=1)
+        data = b''
+        for start, end in segments:
+            _write_segment(file, start, end, file + '.segment')
+            with open(file + '.segment', 'rb') as fin:
+                segment_data = fin.read()
+            assert segment_data.endswith(b'\n')
+            data += segment_data
+        with open(file, 'rb') as fin:
+            assert data == fin.read()[len(b'id\tvalue\n'):]
+
+
+def test_get_file_import_dtypes_nulls():
+    """Make sure that nulls in formatted files are not taken for strings."""
+    with tempfile.TemporaryDirectory() as tempdir:
+        file = op.join(tempdir, 'nulls.tsv')
+        with open(file, 'w') as fout:
+            fout.write('id\tcount\n')
+            fout.writelines('{0}\t{1}\n'.format(i, i % 7 if i % 10 else '\\N') for i in range(100))
+        _, dtypes, not_null = _get_file_import_dtypes(
+            file, optimize_dtypes=True, sep='\t', na_values=['', '.'])
+    assert isinstance(dtypes['count'], sa.types.Integer)
+    assert 'count' not in not_null and 'id' in not_null
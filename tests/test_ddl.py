@@ -0,0 +1,88 @@
+from sqlalchemy.dialects import mysql
+
+from odbo.ddl import (
+    TableLayout, get_alter_table_sql, get_create_table_sql, get_index_clauses,
+    normalize_column_type)
+from odbo.partitioning import Partitioning
+
+EXISTING = TableLayout(
+    [('id', 'int(11)', False), ('chrom', 'varchar(2)', True), ('pos', 'int(11)', True),
+     ('score', 'double', True)],
+    engine='InnoDB', row_format='COMPRESSED', primary_key=['id'],
+    indexes={'A': (['chrom', 'pos'], False)})
+
+
+def _get_target(dtypes, **kwargs):
+    return TableLayout.from_dtypes(list(dtypes), dtypes, mysql.dialect(), **kwargs)
+
+
+def test_create_table_sql():
+    target = _get_target(
+        {'chrom': mysql.VARCHAR(2), 'pos': mysql.INTEGER(unsigned=True)}, not_null=['pos'],
+        engine='MyISAM', index_commands=[(['chrom', 'pos'], True)],
+        partitioning=Partitioning('HASH', 'pos', 4))
+    assert get_create_table_sql('variants', target) == (
+        'CREATE TABLE `variants` (\n'
+        '  `chrom` VARCHAR(2),\n'
+        '  `pos` INTEGER UNSIGNED NOT NULL,\n'
+        '  UNIQUE INDEX `A` (`chrom`, `pos`)\n'
+        ') ENGINE=MyISAM\n'
+        'PARTITION BY HASH(`pos`) PARTITIONS 4;')
+
+
+def test_alter_table_sql_unchanged():
+    """Make sure that reloading a table with the same layout does not rebuild it."""
+    target = _get_target(
+        {'id': mysql.INTEGER(), 'chrom': mysql.VARCHAR(2), 'pos': mysql.INTEGER(),
+         'score': mysql.DOUBLE()},
+        engine='InnoDB', row_format='compressed', index_commands=[(['chrom', 'pos'], False)])
+    # Primary key columns are NOT NULL even if the data does not say so
+    assert get_alter_table_sql('variants', EXISTING, target) is None
+
+
+def test_alter_table_sql():
+    target = _get_target(
+        {'chrom': mysql.VARCHAR(2), 'id': mysql.INTEGER(), 'pos': mysql.BIGINT(),
+         'ref': mysql.VARCHAR(8)},
+        engine='MyISAM', index_commands=[('ref', False), (['chrom', 'pos'], False)])
+    assert get_alter_table_sql('variants', EXISTING, target) == (
+        'ALTER TABLE `variants`\n'
+        '  DROP COLUMN `score`,\n'
+        '  MODIFY COLUMN `chrom` VARCHAR(2) FIRST,\n'
+        '  MODIFY COLUMN `pos` BIGINT,\n'
+        '  ADD COLUMN `ref` VARCHAR(8) AFTER `pos`,\n'
+        '  ADD INDEX `B` (`ref`),\n'
+        '  ENGINE=MyISAM,\n'
+        '  ROW_FORMAT=DEFAULT;')
+
+
+def test_alter_table_partitioning():
+    partitioning = Partitioning('LIST', 'chrom', {'p1': ['1'], 'p2': ['2']})
+    target = TableLayout(EXISTING.columns, 'InnoDB', 'COMPRESSED', partitioning=partitioning)
+    assert get_alter_table_sql('variants', EXISTING, target) == (
+        'ALTER TABLE `variants`\n' + partitioning.get_sql() + ';')
+    existing = TableLayout(
+        EXISTING.columns, 'InnoDB', 'COMPRESSED', EXISTING.primary_key, EXISTING.indexes,
+        partitioning=('LIST', 'chrom', ('p1', 'p2')))
+    assert get_alter_table_sql('variants', existing, target) is None
+    assert get_alter_table_sql('variants', existing, EXISTING) == (
+        'ALTER TABLE `variants`\nREMOVE PARTITIONING;')
+
+
+def test_index_clauses():
+    assert get_index_clauses(EXISTING, [(['chrom', 'pos'], False)], primary_key='id') == []
+    assert get_index_clauses(EXISTING, [(['chrom', 'pos'], True)], primary_key='pos') == [
+        'DROP PRIMARY KEY', 'ADD PRIMARY KEY (`pos`)', 'ADD UNIQUE INDEX `B` (`chrom`, `pos`)']
+
+
+def test_normalize_column_type():
+    for dtype, column_type in [
+            (mysql.TINYINT(unsigned=True), 'tinyint(3) unsigned'),
+            (mysql.BOOLEAN(), 'tinyint(1)'),
+            (mysql.INTEGER(), 'int'),
+            (mysql.DECIMAL(10, 2), 'decimal(10,2)'),
+            (mysql.ENUM('1', 'X'), "enum('1','X')"),
+            (mysql.MEDIUMTEXT(), 'mediumtext')]:
+        assert (normalize_column_type(dtype.compile(dialect=mysql.dialect())) ==
+                normalize_column_type(column_type))
+    assert normalize_column_type("ENUM('x')") != normalize_column_type("enum('X')")
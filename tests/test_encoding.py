@@ -0,0 +1,43 @@
+import csv
+import os.path as op
+
+import pandas as pd
+from sqlalchemy.dialects import mysql
+
+from odbo.connection import _get_file_dictionary_encoder, _iter_encoded_chunks, _iter_runs
+from odbo.encoding import DictionaryEncoder
+
+
+def test_encode_chunks(tmpdir):
+    """Make sure that codes are consistent across chunks, and other values are not altered."""
+    input_file = op.join(str(tmpdir), 'mutations.tsv')
+    with open(input_file, 'wt') as ofh:
+        ofh.write('gene_name\ttissue\tscore\n')
+        for i in range(100):
+            ofh.write('{}\t{}\t{}\n'.format(
+                ['BRCA1', 'TP53', 'KRAS'][i % 3], 'lung' if i % 2 else '\\N', '0.10'))
+    dtypes = {
+        'gene_name': mysql.VARCHAR(5), 'tissue': mysql.VARCHAR(4), 'score': mysql.DOUBLE()}
+    csv_opts = {'sep': '\t', 'quotechar': '"', 'quoting': csv.QUOTE_MINIMAL}
+    encoder = _get_file_dictionary_encoder(input_file, dtypes, True, **csv_opts)
+    assert encoder.columns == ['gene_name', 'tissue']
+    assert repr(encoder.get_dtypes(dtypes)['gene_name']) == 'SMALLINT(unsigned=True)'
+    df = pd.concat(_iter_encoded_chunks(input_file, encoder, chunksize=7, **csv_opts))
+    assert list(df['gene_name'][:4]) == [1, 2, 3, 1]
+    assert df['tissue'].isnull().sum() == 50
+    assert set(df['score']) == {'0.10'}
+    assert list(encoder.get_lookup_df('gene_name')['value']) == ['BRCA1', 'TP53', 'KRAS']
+
+
+def test_encoder_max_size():
+    """Make sure that columns with more distinct values than expected widen their codes,
+    instead of failing the import.
+    """
+    encoder = DictionaryEncoder(['a'], max_size=2)
+    dfs = [pd.DataFrame({'a': ['x', 'y', 'x']}), pd.DataFrame({'a': [str(i) for i in range(300)]})]
+    code_dtypes = {'a': encoder.code_dtype}
+    runs = _iter_runs((encoder.encode(df) for df in dfs), code_dtypes, lambda df: df)
+    widened_dtypes = [widened_dtypes for widened_dtypes, run in runs if list(run)]
+    assert widened_dtypes == [{}, {'a': code_dtypes['a']}]
+    assert repr(code_dtypes['a']) == 'SMALLINT()'
+    assert repr(encoder.code_dtype) == 'SMALLINT(unsigned=True)'
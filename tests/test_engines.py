@@ -0,0 +1,39 @@
+import os.path as op
+import tempfile
+
+import pytest
+
+from odbo.engines import dispose_engines, fetch_column, get_databases, get_engine
+
+
+@pytest.fixture
+def connection_string():
+    tempdir = tempfile.mkdtemp()
+    yield 'sqlite:///' + op.join(tempdir, 'test.db')
+    dispose_engines()
+
+
+def test_get_engine(connection_string):
+    engine = get_engine(connection_string)
+    assert get_engine(connection_string) is engine
+    assert get_engine(connection_string, echo=True) is not engine
+    dispose_engines()
+    assert get_engine(connection_string) is not engine
+
+
+def test_get_engine_pool_size():
+    engine = get_engine('postgresql://user@localhost/testing', pool_size=3, max_overflow=0)
+    assert engine.pool.size() == 3
+    dispose_engines()
+
+
+def test_get_databases(connection_string):
+    engine = get_engine(connection_string)
+    engine.execute("CREATE TABLE databases (name TEXT)")
+    engine.execute("INSERT INTO databases VALUES ('a')")
+    sql_query = "SELECT name FROM databases"
+    assert get_databases(engine, sql_query) == {'a'}
+    engine.execute("INSERT INTO databases VALUES ('b')")
+    assert get_databases(engine, sql_query) == {'a'}
+    assert get_databases(engine, sql_query, refresh=True) == {'a', 'b'}
+    assert fetch_column(engine, sql_query) == ['a', 'b']
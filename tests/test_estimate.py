@@ -0,0 +1,63 @@
+import bz2
+import gzip
+import os.path as op
+import random
+
+import pytest
+
+from odbo.estimate import ENGINES, estimate_import, get_throughput, record_throughput, sample_file
+
+
+@pytest.fixture(scope='module')
+def input_file(tmpdir_factory):
+    input_file = op.join(str(tmpdir_factory.mktemp('estimate')), 'mutations.tsv.bz2')
+    rng = random.Random(0)
+    with bz2.open(input_file, 'wt') as ofh:
+        ofh.write('mutation_id\tgene_name\tscore\n')
+        for i in range(200000):
+            ofh.write('{}\tGENE{}\t{:.4f}\n'.format(i, i % 300, rng.random()))
+    return input_file
+
+
+def test_sample_file(input_file):
+    data, compressed_size, eof = sample_file(input_file, sample_size=100000)
+    assert not eof
+    assert compressed_size < op.getsize(input_file)
+    assert data.startswith(b'mutation_id\t') and data.endswith(b'\n')
+
+
+def test_estimate_import(input_file):
+    estimate = estimate_import(
+        input_file, index_commands=[('gene_name', False)], primary_key='mutation_id',
+        sample_size=500000, sep='\t')
+    assert not estimate.exact
+    assert abs(estimate.num_rows - 200000) < 5000
+    assert list(estimate.table_sizes) == list(ENGINES)
+    assert estimate.table_sizes['MyISAM (packed)'] < estimate.table_sizes['MyISAM']
+    assert list(estimate.index_sizes) == ['PRIMARY', 'gene_name']
+    assert set(estimate.durations) == {'decompress', 'load', 'index'}
+    assert 'MyISAM (packed)' in estimate.format()
+
+
+def test_estimate_import_vcf(tmpdir):
+    """Make sure that the meta-information lines of VCF files are not parsed as rows."""
+    input_file = op.join(str(tmpdir), 'variants.vcf.gz')
+    with gzip.open(input_file, 'wt') as ofh:
+        ofh.write('##fileformat=VCFv4.1\n' * 6)
+        ofh.write('#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\n')
+        for i in range(1000):
+            ofh.write('1\t{}\trs{}\tA\tG\t50\tPASS\tDP={}\n'.format(i * 10, i, i % 7))
+    estimate = estimate_import(input_file, sep='\t')
+    assert estimate.num_rows == 1000 and estimate.exact
+    assert list(estimate.sample.columns)[:2] == ['chrom', 'pos']
+    estimate = estimate_import(input_file, sample_size=10000, sep='\t')
+    assert abs(estimate.num_rows - 1000) < 50
+
+
+def test_record_throughput(tmpdir):
+    filename = op.join(str(tmpdir), 'throughput.json')
+    record_throughput('load', 100, 0.1, filename)  # too short to be meaningful
+    assert get_throughput(filename)['load'] != 1000
+    for seconds in [1, 2, 4]:
+        record_throughput('load', 4000, seconds, filename)
+    assert get_throughput(filename)['load'] == 2000
@@ -0,0 +1,35 @@
+import subprocess
+import sys
+
+import pytest
+
+import odbo
+
+HEAVY_MODULES = ['pandas', 'sqlalchemy', 'kmtools']
+
+
+def _get_loaded_modules(code):
+    """Return the heavy modules that are loaded after running `code` in a fresh interpreter."""
+    code += (
+        "\nimport sys"
+        "\nprint(' '.join(m for m in {} if m in sys.modules))".format(HEAVY_MODULES))
+    sp = subprocess.run(
+        [sys.executable, '-c', code], stdout=subprocess.PIPE, universal_newlines=True,
+        check=True)
+    return sp.stdout.split()
+
+
+@pytest.mark.parametrize("code", [
+    "import odbo",
+    "import odbo._format_file_python",
+    "import odbo.__main__",
+])
+def test_lazy_import(code):
+    assert _get_loaded_modules(code) == []
+
+
+def test_lazy_attributes():
+    assert odbo.Partitioning is odbo.partitioning.Partitioning
+    assert 'MySQLConnection' in dir(odbo)
+    with pytest.raises(AttributeError):
+        odbo.NoSuchConnection
@@ -0,0 +1,46 @@
+import os.path as op
+import tempfile
+
+import pandas as pd
+import pytest
+
+from odbo.connection import _set_default_csv_opts, _split_file
+from odbo.partitioning import Partitioning
+
+
+@pytest.mark.parametrize("partitioning, values, names", [
+    (Partitioning('LIST', 'chrom', {'p1': ['1', '2'], 'pX': ['X'], 'pN': [None]}),
+     ['X', '2', None, '1'], ['pX', 'p1', 'pN', 'p1']),
+    (Partitioning('RANGE', 'pos', {'p0': 100, 'p1': 1000, 'p2': None}),
+     ['99', '100', None, '123456'], ['p0', 'p1', 'p0', 'p2']),
+    (Partitioning('HASH', 'pos', 3),
+     ['4', '-4', None, '9'], ['p1', 'p1', 'p0', 'p0']),
+])
+def test_assign(partitioning, values, names):
+    assert list(partitioning.assign(pd.Series(values))) == names
+
+
+def test_assign_errors():
+    with pytest.raises(ValueError):
+        Partitioning('RANGE', 'pos', {'p0': 100}).assign(pd.Series(['100']))
+    with pytest.raises(ValueError):
+        Partitioning('KEY', 'chrom', 4).assign(pd.Series(['1']))
+    with pytest.raises(ValueError):
+        Partitioning('HASH', 'pos', {'p0': 100})
+
+
+def test_split_file():
+    df = pd.DataFrame({
+        'Chrom': ['1', '2', 'X'] * 10,
+        'Pos': range(30),
+        'Ref': ['A', 'C', None] * 10,
+    })
+    with tempfile.TemporaryDirectory() as tempdir:
+        file = op.join(tempdir, 'variants.tsv')
+        df.to_csv(file, sep='\t', na_rep='\\N', index=False)
+        partitioning = Partitioning('LIST', 'chrom', {'p12': ['1', '2'], 'pX': ['X']})
+        partition_files = _split_file(file, partitioning, chunksize=7, **_set_default_csv_opts({}))
+        with open(partition_files['pX']) as fin:
+            lines = fin.read().splitlines()
+    assert len(lines) == 10
+    assert lines[0] == 'X\t2\t\\N'
@@ -0,0 +1,79 @@
+import gzip
+import os
+import os.path as op
+import tempfile
+from collections import Counter
+
+import pytest
+
+from odbo._format_file_bash import decompress
+from odbo.progress import Progress, ProgressMonitor, iter_progress
+
+
+def test_iter_progress():
+    reports = []
+    progress = Progress('load', total=None, callback=reports.append, min_interval=60)
+    assert b''.join(iter_progress([b'abc', b'de'], progress)) == b'abcde'
+    # Reports are throttled, but the end of a stage is always reported
+    assert len(reports) == 2
+    assert progress.done == 5
+    assert progress.finished and progress.fraction == 1.0 and progress.eta == 0.0
+
+
+def test_callback_errors():
+    """Make sure that a failing callback does not stop the work that it reports on."""
+    def callback(progress):
+        raise RuntimeError
+
+    progress = Progress('load', total=10, callback=callback, min_interval=0)
+    assert list(iter_progress([b'abc'], progress)) == [b'abc']
+
+
+def test_progress_monitor():
+    reports = []
+    progress = Progress('compress', total=100, callback=reports.append, min_interval=0)
+    done = iter([10, None, 50])
+    with ProgressMonitor(progress, lambda: next(done, 50), interval=0.01):
+        while progress.done < 50:
+            pass
+    assert progress.done == 100
+    assert progress.finished
+    assert [p.finished for p in reports][-1]
+
+
+def test_decompress_progress():
+    data = b'a\tb\n' + b'1\t\n' * 100_000
+    tf, infile = tempfile.mkstemp(suffix='.gz')
+    with gzip.open(infile, 'wb') as ofh:
+        ofh.write(data)
+
+    reports = []
+    progress = Progress('format', total=op.getsize(infile), callback=reports.append)
+    outfile = decompress(infile, sep='\t', na_values=[''], progress=progress)
+    with open(outfile, 'rb') as ifh:
+        assert ifh.read() == data.replace(b'\t\n', b'\t\\N\n')
+    assert progress.done == op.getsize(infile)
+    assert progress.finished and reports[-1].finished
+
+    os.remove(infile)
+    os.remove(outfile)
+
+
+@pytest.mark.parametrize("with_progress", [False, True])
+def test_decompress_count_records(with_progress):
+    """Make sure that records are counted while the file is formatted."""
+    data = b'a\tb\n' + b'1\t\n' * 100_000 + b'2\t"x\ny"\n'
+    tf, infile = tempfile.mkstemp(suffix='.gz')
+    with gzip.open(infile, 'wb') as ofh:
+        ofh.write(data)
+
+    progress = Progress('format', total=op.getsize(infile)) if with_progress else None
+    counter = Counter()
+    outfile = decompress(
+        infile, sep='\t', na_values=[''], progress=progress, counter=counter, quotechar='"')
+    with open(outfile, 'rb') as ifh:
+        assert ifh.read() == data.replace(b'\t\n', b'\t\\N\n')
+    assert counter['lines'] == 100_002
+
+    os.remove(infile)
+    os.remove(outfile)
@@ -0,0 +1,65 @@
+import bz2
+import datetime
+import os.path as op
+import tempfile
+
+import pandas as pd
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+from odbo.connection import _get_df_dtypes
+from odbo.ddl import TableLayout, get_create_table_sql
+from odbo.readers import read_fwf, read_xlsx
+
+
+def test_read_fwf():
+    """Make sure that columns are inferred once, and not from every chunk."""
+    fwf_file = op.join(tempfile.mkdtemp(), 'annotations.txt.bz2')
+    with bz2.open(fwf_file, 'wt') as ofh:
+        ofh.write('# release 1\n' + 'Gene Id  Pos\n' + 'ENSG1    1\n' * 3 + 'ENSG200  10000\n')
+    colspecs, dfs = read_fwf(fwf_file, skiprows=1, infer_nrows=3, chunksize=2)
+    assert colspecs == [(0, 7), (9, None)]
+    dfs = list(dfs)
+    assert [len(df) for df in dfs] == [2, 2]
+    df = pd.concat(dfs)
+    assert list(df.columns) == ['gene_id', 'pos']
+    assert list(df['pos']) == [1, 1, 1, 10000]
+
+
+def test_read_xlsx():
+    openpyxl = pytest.importorskip('openpyxl')
+    xlsx_file = op.join(tempfile.mkdtemp(), 'genes.xlsx')
+    workbook = openpyxl.Workbook()
+    worksheet = workbook.active
+    worksheet.append(['Exported on 2018-01-01'])
+    worksheet.append(['Gene Id', 'Score', None])
+    for i in range(5):
+        worksheet.append(['ENSG{}'.format(i), i / 2 if i else None])
+    worksheet.append([])
+    workbook.save(xlsx_file)
+
+    columns, dfs = read_xlsx(xlsx_file, skiprows=1, chunksize=2)
+    assert columns == ['gene_id', 'score']
+    df = pd.concat(dfs)
+    assert list(df.index) == list(range(5))
+    assert list(df['score'].fillna(-1)) == [-1, 0.5, 1.0, 1.5, 2.0]
+
+
+def test_read_xlsx_dates():
+    """Make sure that dates read from worksheets are given a column type."""
+    openpyxl = pytest.importorskip('openpyxl')
+    xlsx_file = op.join(tempfile.mkdtemp(), 'samples.xlsx')
+    workbook = openpyxl.Workbook()
+    worksheet = workbook.active
+    worksheet.append(['Sample Id', 'Collected'])
+    worksheet.append(['S1', datetime.datetime(2018, 1, 1)])
+    worksheet.append(['S2', None])
+    workbook.save(xlsx_file)
+
+    _, dfs = read_xlsx(xlsx_file)
+    df = next(dfs)
+    dtypes = _get_df_dtypes(df)
+    assert isinstance(dtypes['collected'], sa.DateTime)
+    layout = TableLayout.from_dtypes(list(df.columns), dtypes, mysql.dialect())
+    assert '`collected` DATETIME' in get_create_table_sql('samples', layout)
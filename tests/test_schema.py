@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy.dialects import mysql
+
+from odbo import schema
+
+
+def test_get_column_stats():
+    dfs = [
+        pd.DataFrame({'a': [1, 2, None], 'b': ['x', 'yy', 'x']}),
+        pd.DataFrame({'a': [300, 4, 5], 'b': ['zzz', None, 'x']}),
+    ]
+    stats = schema.get_column_stats(dfs)
+    assert stats['a'].kind == 'float' and stats['a'].is_integral
+    assert (stats['a'].min, stats['a'].max, stats['a'].num_nulls) == (1, 300, 1)
+    assert (stats['b'].min_length, stats['b'].max_length) == (1, 3)
+    assert stats['b'].distinct == {'x', 'yy', 'zzz'}
+
+
+def test_optimize_schema():
+    n = 1000
+    df = pd.DataFrame({
+        'id': np.arange(n) + 100000,
+        'chrom': np.array(['1', '2', 'X'])[np.arange(n) % 3],
+        'score': np.where(np.arange(n) % 2, np.nan, 0.5),
+        'date': ['2017-01-{:02d}'.format(i % 28 + 1) for i in range(n)],
+        'code': ['AB{:04d}'.format(i) for i in range(n)],
+    })
+    dtypes = {
+        'id': mysql.INTEGER(),
+        'chrom': mysql.VARCHAR(32),
+        'score': mysql.DOUBLE(),
+        'date': mysql.VARCHAR(32),
+        'code': mysql.VARCHAR(32),
+    }
+    optimized_dtypes, not_null, report = schema.optimize_schema([df[:500], df[500:]], dtypes)
+    assert isinstance(optimized_dtypes['id'], mysql.MEDIUMINT)
+    assert optimized_dtypes['id'].unsigned
+    assert isinstance(optimized_dtypes['chrom'], mysql.ENUM)
+    assert isinstance(optimized_dtypes['score'], mysql.DOUBLE)
+    assert type(optimized_dtypes['date']) is mysql.DATE
+    assert isinstance(optimized_dtypes['code'], mysql.CHAR)
+    assert optimized_dtypes['code'].length == 6
+    assert set(not_null) == {'id', 'chrom', 'date', 'code'}
+    assert report.loc['id', 'bytes_saved'] == 1
+    assert (report['bytes_saved'] >= 0).all()
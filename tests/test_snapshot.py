@@ -0,0 +1,47 @@
+import os
+import os.path as op
+
+import pytest
+
+from odbo.snapshot import (
+    SnapshotError, copy_files, get_table_files, read_manifest, verify_files, write_manifest)
+
+
+@pytest.fixture
+def table_dir(tmpdir):
+    table_dir = op.join(str(tmpdir), 'testing')
+    os.makedirs(table_dir)
+    for filename in [
+            'variants.par', 'variants#P#p0.MYD', 'variants#P#p0.MYI', 'variants_123.sdi',
+            'variants2.MYD', 'genes.MYD']:
+        with open(op.join(table_dir, filename), 'wb') as ofh:
+            ofh.write(filename.encode() * 100)
+    return table_dir
+
+
+@pytest.mark.parametrize("link", [False, True])
+def test_snapshot(tmpdir, table_dir, link):
+    snapshot_dir = op.join(str(tmpdir), 'snapshot')
+    os.makedirs(snapshot_dir)
+    filenames = get_table_files(table_dir, 'variants')
+    assert sorted(filenames) == [
+        'variants#P#p0.MYD', 'variants#P#p0.MYI', 'variants.par', 'variants_123.sdi']
+    files = copy_files(table_dir, snapshot_dir, filenames, link=link)
+    write_manifest(snapshot_dir, 'variants', files, row_format='Compressed')
+    manifest = read_manifest(snapshot_dir)
+    assert manifest['tablename'] == 'variants'
+    assert manifest['files'] == files
+    verify_files(snapshot_dir, manifest['files'])
+    # Corrupt a file
+    with open(op.join(snapshot_dir, 'variants.par'), 'r+b') as fh:
+        fh.write(b'x')
+    with pytest.raises(SnapshotError):
+        verify_files(snapshot_dir, manifest['files'])
+    os.remove(op.join(snapshot_dir, 'variants.par'))
+    with pytest.raises(SnapshotError):
+        verify_files(snapshot_dir, manifest['files'])
+
+
+def test_read_manifest_missing(tmpdir):
+    with pytest.raises(SnapshotError):
+        read_manifest(str(tmpdir))
@@ -0,0 +1,48 @@
+import subprocess
+import time
+
+import pytest
+
+from odbo.commands import CancellationToken, CancelledError
+from odbo.transport import LocalTransport, SSHTransport, get_transport
+
+
+def test_iter_output():
+    """Make sure that `iter_output` yields blocks of complete lines."""
+    transport = LocalTransport()
+    chunks = list(transport.iter_output("printf 'a,b\\n1,2\\n3,4'", chunksize=5))
+    assert all(chunk.endswith(b'\n') for chunk in chunks[:-1])
+    assert b''.join(chunks) == b'a,b\n1,2\n3,4'
+
+
+def test_iter_output_errors():
+    transport = LocalTransport()
+    # The first command of a pipeline fails
+    with pytest.raises(subprocess.CalledProcessError) as excinfo:
+        list(transport.iter_output("gzip -dc /nonexistent.gz | cat"))
+    assert 'nonexistent' in excinfo.value.stderr
+
+
+def test_iter_output_close():
+    """Make sure that the command is stopped if its output is not read to the end."""
+    chunks = LocalTransport().iter_output("yes", chunksize=1024)
+    assert next(chunks).startswith(b'y\n')
+    chunks.close()
+
+
+def test_iter_output_cancel():
+    """Make sure that the command is killed once its token is cancelled."""
+    start = time.time()
+    chunks = LocalTransport().iter_output("sleep 10", cancel=CancellationToken(0.5))
+    with pytest.raises(CancelledError):
+        list(chunks)
+    assert time.time() - start < 5
+
+
+def test_get_transport():
+    transport = LocalTransport()
+    assert get_transport(None) is None
+    assert get_transport(transport) is transport
+    ssh_transport = get_transport('user@storage')
+    assert isinstance(ssh_transport, SSHTransport)
+    assert ssh_transport.get_args('cat x')[-2:] == ['user@storage', "bash -c 'cat x'"]
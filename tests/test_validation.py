@@ -0,0 +1,72 @@
+import os.path as op
+
+import pandas as pd
+import pytest
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+from odbo.validation import (
+    LoadReport, LoadValidationError, LoadWarnings, count_lines, find_rows, iter_count_lines,
+    sample_lines)
+
+SHOW_WARNINGS_OUTPUT = """\
+@@session.warning_count
+70
+Level\tCode\tMessage
+Warning\t1265\tData truncated for column 'ref' at row 3
+Warning\t1366\tIncorrect integer value: 'x' for column 'pos' at row 5
+Warning\t1262\tRow 7 was truncated; it contained more data than there were input columns
+Note\t1000\tSomething harmless
+"""
+
+
+def test_load_warnings():
+    load_warnings = LoadWarnings.parse(SHOW_WARNINGS_OUTPUT)
+    assert load_warnings.count == 70
+    assert [w.row for w in load_warnings.warnings] == [3, 5, 7, None]
+    assert load_warnings.by_column == {'ref': 1, 'pos': 1, None: 1}
+    merged = LoadWarnings.merge([load_warnings, None, LoadWarnings.parse('')])
+    assert merged.count == 70 and len(merged.warnings) == 4
+    # Notes do not fail the validation
+    notes = LoadWarnings.parse('Note\t1000\tSomething harmless\n')
+    LoadReport('t', expected_rows=1, num_rows=1, load_warnings=notes).check()
+
+
+def test_count_lines(tmpdir):
+    filename = op.join(str(tmpdir), 'data.tsv')
+    with open(filename, 'wb') as ofh:
+        ofh.write(b'a\tb\n1\t2\n3\t4')
+    assert count_lines(filename, skiprows=1, chunksize=3) == 2
+    counter = {'lines': 0}
+    assert b''.join(iter_count_lines([b'a\n1', b'\n3'], counter)) == b'a\n1\n3'
+    assert counter['lines'] == 3
+    # Newlines within quoted fields do not end a record
+    with open(filename, 'wb') as ofh:
+        ofh.write(b'a\tb\n1\t"x\ny"\n2\t"z"""\n3\t4\n')
+    assert count_lines(filename, skiprows=1, chunksize=5, sep='\t', quotechar='"') == 3
+    assert count_lines(filename, skiprows=1) == 4
+
+
+def test_sample_lines(tmpdir):
+    filename = op.join(str(tmpdir), 'data.tsv')
+    with open(filename, 'wb') as ofh:
+        ofh.write(b'header\n' + b''.join(b'%d\n' % i for i in range(100)) + b'100')
+    lines = sample_lines(filename, 20, skiprows=1, seed=0)
+    assert len(lines) == 20
+    assert all(int(line) in range(101) and line.endswith(b'\n') for line in lines)
+    assert sample_lines(filename, 1000, skiprows=102) == []
+
+
+def test_find_rows():
+    engine = sa.create_engine('sqlite://')
+    pd.DataFrame({'id': [1, 2], 'score': [0.1, None], 'name': ['a', 'b']}).to_sql(
+        'data', engine, index=False)
+    sample = pd.DataFrame({
+        'id': ['1', '2', '2'], 'score': ['0.1000000001', None, '0.2'], 'name': ['a', 'b', 'b']})
+    dtypes = {'id': mysql.INTEGER(), 'score': mysql.DOUBLE(), 'name': mysql.VARCHAR(8)}
+    assert find_rows(engine, 'data', sample, dtypes) == [True, True, False]
+    report = LoadReport(
+        'data', expected_rows=2, num_rows=2, sample=sample, mismatches=sample.iloc[2:])
+    with pytest.raises(LoadValidationError) as excinfo:
+        report.check()
+    assert '1 of 3 sampled lines not found' in str(excinfo.value)
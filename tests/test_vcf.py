@@ -0,0 +1,53 @@
+import gzip
+import os.path as op
+
+import pytest
+
+from odbo.vcf import get_vcf_dtypes, read_vcf
+
+VCF_DATA = """\
+##fileformat=VCFv4.2
+##INFO=<ID=DP,Number=1,Type=Integer,Description="Total depth">
+##INFO=<ID=AF,Number=A,Type=Float,Description="Allele frequency, per ALT allele">
+##INFO=<ID=DB,Number=0,Type=Flag,Description="dbSNP membership">
+##INFO=<ID=ID,Number=1,Type=String,Description="Clashes with the ID column">
+#CHROM\tPOS\tID\tREF\tALT\tQUAL\tFILTER\tINFO\tFORMAT\tNA12878
+1\t100\trs1\tA\tG\t50\tPASS\tDP=10;AF=0.5;DB;ID=x\tGT\t0/1
+1\t200\t.\tC\tT,G\t.\tPASS\tDP=.;AF=0.1,0.2\tGT\t1/2
+X\t300\t.\tG\tA\t30\tq10\t.\tGT\t1/1
+"""
+
+
+@pytest.fixture
+def vcf_file(tmpdir):
+    vcf_file = op.join(str(tmpdir), 'variants.vcf.gz')
+    with gzip.open(vcf_file, 'wt') as ofh:
+        ofh.write(VCF_DATA)
+    return vcf_file
+
+
+def test_read_vcf(vcf_file):
+    header, dfs = read_vcf(vcf_file, info_fields=True, chunksize=2)
+    assert header.columns[:2] == ['CHROM', 'POS']
+    assert header.offset == VCF_DATA.index('\n1\t100') + 1
+    dfs = list(dfs)
+    assert [len(df) for df in dfs] == [2, 1]
+    df = dfs[0]
+    assert list(df.columns) == [
+        'chrom', 'pos', 'id', 'ref', 'alt', 'qual', 'filter', 'format', 'na12878',
+        'dp', 'af', 'db', 'info_id']
+    assert list(df['dp'].fillna(0)) == [10, 0]
+    assert list(df['af']) == ['0.5', '0.1,0.2']
+    assert list(dfs[1]['db']) == [False]
+    dtypes = get_vcf_dtypes(header, df)
+    assert [str(dtypes[c]) for c in ['pos', 'qual', 'dp', 'db']] == [
+        'INTEGER', 'DOUBLE', 'INTEGER', 'BOOLEAN']
+
+
+def test_read_vcf_info_fields(vcf_file):
+    header, dfs = read_vcf(vcf_file, info_fields=['DP'], keep_info=True)
+    df = next(dfs)
+    assert 'info' in df.columns and df.columns[-1] == 'dp'
+    assert df['info'].isnull().sum() == 1
+    with pytest.raises(ValueError):
+        read_vcf(vcf_file, info_fields=['XX'])